@@ -0,0 +1,89 @@
+# Benchmark: coste de AudioManager.generate_assets con el sintetizador
+# antiguo (bucle muestra a muestra), el vectorizado (numpy) y la cache en disco.
+#   python bench/bench_audio.py [repeticiones]
+import os
+import sys
+import time
+import math
+import random
+import struct
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import pygame
+import main
+
+
+def legacy_make_sound(self, freq_start, freq_end, duration, vol=0.5, type="sine", fm_mod=0, decay_factor=0.9):
+    # Copia literal del make_sound original, usada como referencia
+    sample_rate = 44100
+    n_samples = int(sample_rate * duration)
+    buf = bytearray()
+    period = 2 * math.pi
+    for i in range(n_samples):
+        t = i / sample_rate
+        progress = i / n_samples
+        current_freq = freq_start + (freq_end - freq_start) * progress
+        modulator = 0
+        if fm_mod > 0: modulator = math.sin(t * fm_mod * period) * 500
+        phase = t * (current_freq + modulator) * period
+        val = 0
+        if type == "sine": val = math.sin(phase)
+        elif type == "square": val = 0.6 if math.sin(phase) > 0 else -0.6
+        elif type == "saw": val = 2.0 * (t * current_freq - math.floor(t * current_freq + 0.5)) - 1.0
+        elif type == "noise": val = random.random() * 2.0 - 1.0
+        elif type == "kick": val = math.sin(phase) * (1 - progress)
+        elif type == "plucky": val = math.sin(phase) * (1-progress)**4
+        envelope = 1.0
+        if progress < 0.05: envelope = progress * 20
+        else: envelope = (1.0 - progress) ** decay_factor
+        final_val = int(val * envelope * vol * 32767)
+        final_val = max(-32767, min(32767, final_val))
+        packed = struct.pack('<h', final_val)
+        buf.extend(packed); buf.extend(packed)
+    return pygame.mixer.Sound(bytes(buf))
+
+
+def time_generate(make_sound, reps):
+    audio = main.AUDIO
+    original = main.AudioManager.make_sound
+    main.AudioManager.make_sound = make_sound
+    try:
+        best = float("inf")
+        for _ in range(reps):
+            t0 = time.perf_counter()
+            audio.generate_assets()
+            best = min(best, time.perf_counter() - t0)
+    finally:
+        main.AudioManager.make_sound = original
+    return best
+
+
+def max_diff():
+    # Diferencia máxima entre ambos motores para los sonidos deterministas
+    worst = 0
+    for args in [(300, 600, 0.15, 0.4, "saw"), (150, 100, 0.05, 0.5, "square"), (440, 880, 0.4, 0.4, "sine"),
+                 (800, 1200, 0.4, 0.5, "square", 20), (180, 50, 0.1, 0.9, "kick", 0, 3.0),
+                 (659, 659, 0.2, 0.4, "plucky"), (55, 55, 0.2, 0.7, "saw", 1)]:
+        old = np.frombuffer(legacy_make_sound(None, *args).get_raw(), dtype=np.int16).astype(np.int32)
+        new = main.synth_pcm(*args).astype(np.int32)
+        worst = max(worst, int(np.abs(old - new).max()))
+    return worst
+
+
+if __name__ == "__main__":
+    reps = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    t_old = time_generate(legacy_make_sound, reps)
+    load, store = main.sfx_cache_load, main.sfx_cache_store
+    main.sfx_cache_load, main.sfx_cache_store = (lambda key: None), (lambda key, pcm: None)
+    t_new = time_generate(main.AudioManager.make_sound, reps)
+    main.sfx_cache_load, main.sfx_cache_store = load, store
+    main.AUDIO.generate_assets()  # asegura la cache en disco
+    t_warm = time_generate(main.AudioManager.make_sound, reps)
+    print(f"generate_assets antiguo:      {t_old * 1000:8.1f} ms")
+    print(f"generate_assets vectorizado:  {t_new * 1000:8.1f} ms  (x{t_old / t_new:.1f})")
+    print(f"generate_assets cache (mmap): {t_warm * 1000:8.1f} ms  (x{t_old / t_warm:.1f})")
+    print(f"diferencia maxima de muestra: {max_diff()} (de 32767)")
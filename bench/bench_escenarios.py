@@ -0,0 +1,215 @@
+# Escenarios de rendimiento con las clases del juego, sin ventana (driver dummy de SDL).
+# Cada escenario corre en su propio proceso para que la memoria pico y las caches no se mezclen.
+#   python bench/bench_escenarios.py [--escenarios a,b] [--frames N] [--res WxH]
+#                                    [--salida base.json] [--comparar base.json] [--tolerancia 0.10]
+# Con --comparar, sale con código 1 si algún escenario empeora más que la tolerancia.
+import os
+import sys
+import json
+import math
+import random
+import resource
+import subprocess
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("MATRIX_HEADLESS", "1")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+CALENTAMIENTO = 30
+METRICAS = (("media_ms", 1), ("p99_ms", 1), ("memoria_pico_mb", 1))  # (clave, +1 = más es peor)
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576
+
+
+# --- Escenarios: cada uno prepara el estado y devuelve la función de un frame ---
+
+def partida(main, nivel, seed=1):
+    juego = main.Partida()
+    juego.nueva_partida(seed, nivel)
+    return juego
+
+
+def frame_juego(main, juego, surf, rain, policy):
+    # Igual que un frame de JUEGO en main(): un tick de física, fondo, entidades, bola y partículas
+    v = policy(juego)
+    if v is not None: juego.lanzar(*v)
+    dt, freeze = juego.control(1.0, False, False)
+    res = juego.step(dt, freeze)
+    estado = juego.resolver(res)
+    if estado in ("TRANSITION", "BOSS_WARN"): juego.cargar_nivel(juego.nivel)
+    elif estado == "FAIL": juego.nueva_partida(juego.run_seed, juego.nivel)
+    surf.fill(main.COLORES["BG"])
+    main.GFX.draw_cyber_grid(surf, 0)
+    rain.update(surf)
+    main.dibujar_partida(surf, juego, 1.0, 1)
+    juego.parts.update()
+    juego.parts.draw(surf)
+    main.PANTALLA.blit(surf, (0, 0))
+    main.pygame.display.flip()
+
+
+def esc_nivel_grande(main):
+    juego = partida(main, 199)
+    surf = main.pygame.Surface((main.ANCHO, main.ALTO))
+    rain, policy = main.MatrixRain(), main.bot_aleatorio(7)
+    return lambda: frame_juego(main, juego, surf, rain, policy)
+
+
+def esc_jefe(main):
+    juego = partida(main, 30)
+    juego.tiros = 10 ** 6
+    surf = main.pygame.Surface((main.ANCHO, main.ALTO))
+    rain, policy = main.MatrixRain(), main.bot_aleatorio(3)
+    return lambda: frame_juego(main, juego, surf, rain, policy)
+
+
+def esc_tormenta_particulas(main):
+    pool = main.ParticlePool()
+    surf = main.pygame.Surface((main.ANCHO, main.ALTO))
+    rng = random.Random(5)
+    colores = [main.COLORES[k] for k in ("PELIGRO", "GOLD", "NEON", "BOSS", "META")]
+    def frame():
+        for _ in range(20):
+            main.spawn_parts(rng.uniform(0, main.ANCHO), rng.uniform(0, main.ALTO), rng.choice(colores), pool)
+        pool.update()
+        surf.fill(main.COLORES["BG"])
+        pool.draw(surf)
+    return frame
+
+
+def esc_apuntado(main):
+    # Arrastre continuo con la bola en reposo: una predicción de trayectoria por frame
+    juego = partida(main, 12)
+    surf = main.pygame.Surface((main.ANCHO, main.ALTO))
+    x0, y0 = juego.pelota.x, juego.pelota.y
+    n = [0]
+    def frame():
+        n[0] += 1
+        ang = math.pi * (0.1 + 0.8 * (0.5 + 0.5 * math.sin(n[0] * 0.03)))
+        pos = (x0 + math.cos(ang) * 120 * main.FACTOR, y0 + math.sin(ang) * 120 * main.FACTOR)
+        surf.fill(main.COLORES["BG"])
+        main.GFX.draw_dots(surf, juego.predecir((x0, y0), pos))
+    return frame
+
+
+def esc_menu_reposo(main):
+    surf = main.pygame.Surface((main.ANCHO, main.ALTO))
+    rain = main.MatrixRain()
+    ui = main.construir_pantallas({"BASICO": ["-"]}, {"actual": "BASICO"})
+    pool = main.ParticlePool()
+    cx = main.ANCHO // 2
+    def frame():
+        if not main.PRESENTER.begin("MENU", surf):
+            surf.fill(main.COLORES["BG"])
+            main.GFX.draw_cyber_grid(surf, 0)
+            main.PRESENTER.capture(surf, "MENU")
+        rain.update(surf)
+        main.GFX.draw_glitch_title(surf, "MATRIX DUNK", cx - 200 * main.FACTOR, 50 * main.FACTOR)
+        ui["MENU"].draw(surf)
+        main.NOTIFIER.update_draw(surf)
+        pool.draw(surf)
+        main.PRESENTER.present(surf, main.PANTALLA, (0, 0), "MENU", False)
+        main.GFX.end_frame()
+    return frame
+
+
+def esc_audio_frio(main):
+    # generate_assets completo sin la cache en disco: el coste del primer arranque
+    main.pygame.mixer.init(44100, -16, 2, 2048)
+    audio = main.AudioManager.__new__(main.AudioManager)
+    audio.sounds, audio.cache_hits = {}, 0
+    main.sfx_cache_load, main.sfx_cache_store = (lambda key: None), (lambda key, pcm: None)
+    return audio.generate_assets
+
+
+ESCENARIOS = {
+    "nivel_grande": (esc_nivel_grande, 600),
+    "jefe": (esc_jefe, 600),
+    "tormenta_particulas": (esc_tormenta_particulas, 600),
+    "apuntado": (esc_apuntado, 600),
+    "menu_reposo": (esc_menu_reposo, 600),
+    "audio_frio": (esc_audio_frio, 5),
+}
+
+
+def medir(nombre, frames):
+    import numpy as np
+    import main
+    random.seed(0); np.random.seed(0)
+    rss0 = rss_mb()
+    frame = ESCENARIOS[nombre][0](main)
+    for _ in range(min(CALENTAMIENTO, frames)): frame()
+    tiempos = np.empty(frames)
+    for i in range(frames):
+        t0 = time.perf_counter()
+        frame()
+        tiempos[i] = (time.perf_counter() - t0) * 1000
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB en Linux
+    media = float(tiempos.mean())
+    return {"frames": frames, "media_ms": round(media, 4), "p99_ms": round(float(np.percentile(tiempos, 99)), 4),
+            "fps": round(1000 / media, 1) if media else None,
+            "memoria_pico_mb": round(pico, 1), "memoria_escenario_mb": round(pico - rss0, 1)}
+
+
+def lanzar(nombre, frames, res):
+    env = dict(os.environ)
+    if res: env["MATRIX_RES"] = res
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--hijo", nombre, "--frames", str(frames)],
+                         env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"código {out.returncode}"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def comparar(actual, base, tolerancia):
+    # Lista de (escenario, métrica, base, actual, cambio relativo) que superan la tolerancia
+    regresiones = []
+    for nombre, r in actual["escenarios"].items():
+        b = base.get("escenarios", {}).get(nombre)
+        if not b or "error" in r or "error" in b: continue
+        for clave, signo in METRICAS:
+            if not b.get(clave): continue
+            cambio = (r[clave] - b[clave]) / b[clave] * signo
+            if cambio > tolerancia: regresiones.append((nombre, clave, b[clave], r[clave], cambio))
+    return regresiones
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    opt = lambda name, default: args[args.index(name) + 1] if name in args else default
+    if "--hijo" in args:
+        print(json.dumps(medir(opt("--hijo", None), int(opt("--frames", 0)))))
+        sys.exit(0)
+
+    nombres = opt("--escenarios", ",".join(ESCENARIOS)).split(",")
+    res = opt("--res", os.environ.get("MATRIX_RES", "450x900"))
+    import pygame
+    resultado = {"resolucion": res, "python": sys.version.split()[0], "pygame": pygame.version.ver, "escenarios": {}}
+    for nombre in nombres:
+        frames = int(opt("--frames", ESCENARIOS[nombre][1])) if nombre != "audio_frio" else ESCENARIOS[nombre][1]
+        r = lanzar(nombre, frames, res)
+        resultado["escenarios"][nombre] = r
+        if "error" in r: print(f"{nombre:22s} ERROR {r['error']}", file=sys.stderr)
+        else: print(f"{nombre:22s} media {r['media_ms']:8.3f} ms  p99 {r['p99_ms']:8.3f} ms  {r['fps']:9.1f} fps  "
+                    f"pico {r['memoria_pico_mb']:6.1f} MB", file=sys.stderr)
+
+    salida = opt("--salida", None)
+    if salida:
+        with open(salida, "w") as f: json.dump(resultado, f, indent=2)
+    else:
+        print(json.dumps(resultado, indent=2))
+
+    if "--comparar" in args:
+        with open(opt("--comparar", None)) as f: base = json.load(f)
+        regresiones = comparar(resultado, base, float(opt("--tolerancia", 0.10)))
+        for nombre, clave, b, a, cambio in regresiones:
+            print(f"REGRESION {nombre}.{clave}: {b} -> {a} (+{cambio * 100:.0f}%)", file=sys.stderr)
+        if base.get("resolucion") != resultado["resolucion"]:
+            print(f"aviso: la base es de {base.get('resolucion')}, esta ejecución de {resultado['resolucion']}", file=sys.stderr)
+        sys.exit(1 if regresiones else 0)
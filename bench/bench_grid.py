@@ -0,0 +1,93 @@
+# Benchmark: coste de Visuals.draw_cyber_grid trazando las líneas cada frame (original)
+# frente a la rejilla precalculada (diagonales con colorkey RLE por nivel de pulso,
+# filas horizontales por fase de scroll). El pulso se cuantiza a GRID_PULSO_PASO.
+#   MATRIX_RES=1440x2560 python bench/bench_grid.py [frames]
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("MATRIX_HEADLESS", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pygame
+import main
+
+
+def legacy_draw_cyber_grid(surf, offset_y, pulse_val):
+    # Copia literal del draw_cyber_grid original, con el scroll y el pulso como parámetros
+    ANCHO, ALTO, FACTOR = main.ANCHO, main.ALTO, main.FACTOR
+    horizon = ALTO * 0.4
+    gap = 40 * FACTOR
+    pulse = int(pulse_val * 100)
+    grid_c = (0, 40 + pulse, 40 + pulse)
+    cx = ANCHO // 2
+    for i in range(-10, 11):
+        offset = i * gap * 4
+        x_bottom = cx + offset * 3
+        x_top = cx + offset * 0.1
+        pygame.draw.line(surf, grid_c, (x_top, horizon), (x_bottom, ALTO), 1)
+    y = ALTO
+    depth = 0
+    while y > horizon:
+        y_screen = ALTO - (depth * depth * 3 * FACTOR) + offset_y
+        if y_screen < ALTO and y_screen > horizon:
+            pygame.draw.line(surf, grid_c, (0, y_screen), (ANCHO, y_screen), 1)
+        depth += 0.5
+        y = y_screen
+
+
+def run(draw, frames, reps=3):
+    # Sin el fill del fondo en el bucle: su coste enmascara el de la rejilla
+    surf = pygame.Surface((main.ANCHO, main.ALTO))
+    surf.fill(main.COLORES["BG"])
+    best = float("inf")
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        for f in range(frames):
+            main.AUDIO.pulse_val = 0.9 ** (f % 30)
+            draw(surf, f)
+        best = min(best, (time.perf_counter() - t0) / frames)
+    return best
+
+
+def fase(f):
+    # Scroll equivalente al de get_ticks a 60 fps, cuantizado a las fases de la cache
+    gap = 40 * main.FACTOR
+    n = len(main.GFX.grid[3])
+    return int(((f * 1000 / 60 * 0.1) % gap) * n / gap) * gap / n
+
+
+def max_diff():
+    # Misma fase y mismo pulso: las dos rutas deben producir los mismos píxeles
+    a = pygame.Surface((main.ANCHO, main.ALTO))
+    b = pygame.Surface((main.ANCHO, main.ALTO))
+    peor = 0
+    for f in range(0, 120, 7):
+        # Pulso exacto en un nivel precalculado
+        main.AUDIO.pulse_val = (f % 26) * main.GRID_PULSO_PASO / 100 + 1e-6
+        ticks = pygame.time.get_ticks
+        pygame.time.get_ticks = lambda: fase(f) / 0.1
+        try:
+            a.fill(main.COLORES["BG"]); main.GFX.draw_cyber_grid(a, 0)
+        finally:
+            pygame.time.get_ticks = ticks
+        b.fill(main.COLORES["BG"]); legacy_draw_cyber_grid(b, fase(f), main.AUDIO.pulse_val)
+        peor = max(peor, sum(1 for x in range(0, a.get_width(), 3) for y in range(0, a.get_height(), 3)
+                             if a.get_at((x, y)) != b.get_at((x, y))))
+    return peor
+
+
+if __name__ == "__main__":
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    t0 = time.perf_counter()
+    main.GFX.build_grid()
+    t_build = time.perf_counter() - t0
+    top, gap, capas, fases = main.GFX.grid
+    t_old = run(lambda s, f: legacy_draw_cyber_grid(s, (f * 1000 / 60 * 0.1) % gap, main.AUDIO.pulse_val), frames)
+    t_new = run(lambda s, f: main.GFX.draw_cyber_grid(s, 0), frames)
+    print(f"resolucion {main.ANCHO}x{main.ALTO}, {len(fases)} fases, {len(capas)} niveles de pulso, construccion {t_build * 1000:.1f} ms")
+    print(f"draw_cyber_grid original:  {t_old * 1000:7.3f} ms/frame")
+    print(f"draw_cyber_grid en cache:  {t_new * 1000:7.3f} ms/frame  (x{t_old / t_new:.1f})")
+    print(f"pixeles distintos (muestra 1/9): {max_diff()}")
@@ -0,0 +1,58 @@
+# Benchmark: simular_lanzamientos (todos los candidatos a la vez con numpy) frente a un bucle de
+# Pelota.update(sim=True) por candidato, con copias de los obstáculos avanzando tick a tick.
+# Cuenta también en cuántos candidatos coincide el resultado (meta / muerte / reposo / en vuelo);
+# los que en la referencia acaban en estrella, power-up, jefe o rotura no son comparables.
+#   python bench/bench_lanzamientos.py [niveles] [angulos] [fuerzas] [ticks]
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("MATRIX_HEADLESS", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main
+
+CODIGO = {"win": main.LOTE_META, "die": main.LOTE_MUERTE}
+
+
+def referencia(juego, fx, fy, ticks):
+    # Un candidato cada vez, con la misma física escalar que la bola real
+    obs = []
+    for o in juego.obs:
+        c = main.Obstaculo.__new__(main.Obstaculo); c.__dict__.update(o.__dict__); c.rect = o.rect.copy()
+        obs.append(c)
+    p = juego.pelota.sonda(fx, fy)
+    for _ in range(ticks):
+        res = p.update(obs, juego.stars, None, juego.portals, juego.gravs, juego.powers, [], [], [], [], None, 1.0, sim=True)
+        if res in CODIGO: return CODIGO[res]
+        if res != "nada": return None
+        if not p.moving: return main.LOTE_REPOSO
+        for o in obs:
+            if o.tipo in main.OBS_DINAMICOS or o.move_meta: o.update()
+    return main.LOTE_VUELO
+
+
+if __name__ == "__main__":
+    niveles, n_ang, n_fuerza, ticks = [int(a) for a in sys.argv[1:]] + [8, 36, 8, 300][len(sys.argv) - 1:]
+    juego = main.Partida(); juego.nueva_partida(1, 1)
+    fx, fy = main.abanico(n_ang, n_fuerza)
+    t_lote = t_ref = 0.0
+    iguales = comparables = 0
+    for nivel in range(1, niveles + 1):
+        if nivel != juego.nivel: juego.cargar_nivel(nivel)
+        t0 = time.perf_counter()
+        lote = main.simular_lanzamientos(juego.pelota, juego, fx, fy, ticks)["resultado"]
+        t_lote += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        ref = [referencia(juego, a, b, ticks) for a, b in zip(fx, fy)]
+        t_ref += time.perf_counter() - t0
+        par = [(a, b) for a, b in zip(lote, ref) if b is not None]
+        comparables += len(par); iguales += sum(a == b for a, b in par)
+        juego.prefetch.pump()
+    n = niveles * len(fx)
+    print(f"resolucion {main.ANCHO}x{main.ALTO}, {niveles} niveles x {len(fx)} candidatos, {ticks} ticks")
+    print(f"Pelota.update por candidato:  {t_ref / n * 1000:8.3f} ms/candidato")
+    print(f"simular_lanzamientos en lote: {t_lote / n * 1000:8.3f} ms/candidato  (x{t_ref / t_lote:.1f})")
+    print(f"resultado coincidente: {iguales}/{comparables} ({iguales / max(comparables, 1) * 100:.1f}%)")
@@ -4,8 +4,9 @@ package.name = matrixdunk
 package.domain = org.lecahi
 source.dir = .
 source.include_exts = py,png,jpg,json
+source.exclude_dirs = bench
 version = 0.1
-requirements = python3,pygame,android,shutil,json
+requirements = python3,pygame,numpy,android,shutil,json
 orientation = portrait
 fullscreen = 1
 android.archs = arm64-v8a, armeabi-v7a
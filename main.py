@@ -4,18 +4,35 @@ import math
 import os
 import sys
 import json
+import time
 import struct
-from collections import deque
+import zlib
+import mmap
+import hashlib
+import bisect
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import numpy as np
 
 # --- 1. INICIALIZACIÓN ---
-pygame.mixer.pre_init(44100, -16, 2, 2048) 
-pygame.init()
-pygame.mixer.init()
-pygame.mixer.set_num_channels(32) 
-
-PANTALLA = pygame.display.set_mode((0, 0), pygame.FULLSCREEN | pygame.DOUBLEBUF | pygame.HWSURFACE)
-ANCHO, ALTO = PANTALLA.get_size()
+# Modo sin pantalla: sin ventana, sin audio, resolución virtual fija (benchmarks, bots, CI)
+HEADLESS = os.environ.get("MATRIX_HEADLESS") == "1" or "--headless" in sys.argv
+
+if HEADLESS:
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.display.init()
+    pygame.font.init()
+    ANCHO, ALTO = (int(v) for v in os.environ.get("MATRIX_RES", "450x900").split("x"))
+    PANTALLA = pygame.display.set_mode((ANCHO, ALTO))
+else:
+    pygame.mixer.pre_init(44100, -16, 2, 2048) 
+    pygame.init()
+    pygame.mixer.init()
+    pygame.mixer.set_num_channels(32) 
+
+    PANTALLA = pygame.display.set_mode((0, 0), pygame.FULLSCREEN | pygame.DOUBLEBUF | pygame.HWSURFACE)
+    ANCHO, ALTO = PANTALLA.get_size()
 FACTOR = min(ANCHO / 450, ALTO / 900, 2.0)
 RELOJ = pygame.time.Clock()
 FPS = 60
@@ -72,7 +89,12 @@ CONFIG = {
     "vibra": True, 
     "vol_musica": 5, 
     "vol_sfx": 8,
-    "hardcore": False
+    "hardcore": False,
+    "dirty_rects": True,
+    "rain_density": 4,
+    "rain_glyphs": False,
+    "calidad_auto": True,
+    "debug": False
 }
 PRECIOS_MEJORAS = [10, 25, 50, 100, 200] 
 
@@ -86,17 +108,18 @@ SKINS = [
 ]
 
 LOGROS_DEF = [
-    {"id": "first_win", "t": "HACKER INICIADO", "desc": "Completa 1 nivel", "r": 5, "cond": lambda d: d["total_victorias"] >= 1},
-    {"id": "veteran", "t": "VETERANO", "desc": "Completa 10 niveles", "r": 10, "cond": lambda d: d["total_victorias"] >= 10},
-    {"id": "sniper", "t": "FRANCOTIRADOR", "desc": "Dispara 50 veces", "r": 5, "cond": lambda d: d["total_tiros"] >= 50},
-    {"id": "rich", "t": "MINERO DE DATOS", "desc": "Ten 20 estrellas", "r": 5, "cond": lambda d: d["estrellas"] >= 20},
-    {"id": "fail", "t": "ERROR DE CAPA 8", "desc": "Muere 5 veces", "r": 3, "cond": lambda d: d["total_muertes"] >= 5}
+    {"id": "first_win", "t": "HACKER INICIADO", "desc": "Completa 1 nivel", "r": 5, "stat": "total_victorias", "min": 1},
+    {"id": "veteran", "t": "VETERANO", "desc": "Completa 10 niveles", "r": 10, "stat": "total_victorias", "min": 10},
+    {"id": "sniper", "t": "FRANCOTIRADOR", "desc": "Dispara 50 veces", "r": 5, "stat": "total_tiros", "min": 50},
+    {"id": "rich", "t": "MINERO DE DATOS", "desc": "Ten 20 estrellas", "r": 5, "stat": "estrellas", "min": 20},
+    {"id": "fail", "t": "ERROR DE CAPA 8", "desc": "Muere 5 veces", "r": 3, "stat": "total_muertes", "min": 5}
 ]
 
 SHAKE_AMPLITUDE = 0
 
 def io_datos(accion="load"):
     global DATOS
+    if HEADLESS: return
     try:
         if accion == "load":
             if os.path.exists(ARCHIVO_SAVE):
@@ -107,129 +130,572 @@ def io_datos(accion="load"):
                         if "mejoras" not in DATOS: DATOS["mejoras"] = {"ammo": 0, "aim": 0, "luck": 0}
                 except (json.JSONDecodeError, ValueError): pass
         elif accion == "save":
-            with open(ARCHIVO_SAVE, "w") as f: json.dump(DATOS, f)
+            GUARDADO.mark_dirty()
     except Exception: pass
+
+class SaveWriter:
+    # Guardado diferido: cada "save" solo marca DATOS como sucio. Una ráfaga de saves se escribe una vez,
+    # pasado debounce_ms, desde un hilo aparte (archivo temporal + os.replace, nunca queda a medias)
+    def __init__(self, path, debounce_ms=500):
+        self.path = path
+        self.debounce = debounce_ms / 1000.0
+        self.dirty_since = None
+        self.last_payload = None
+        self.pending = None
+        self.pool = None
+        self.fallo = False  # lo pone el hilo de escritura; el hilo principal lo convierte en dirty_since
+        self.stats = {"requests": 0, "writes": 0, "avoided": 0, "errors": 0, "last_ms": 0.0, "max_ms": 0.0}
+
+    def mark_dirty(self):
+        self.stats["requests"] += 1
+        if self.dirty_since is None: self.dirty_since = time.perf_counter()
+        else: self.stats["avoided"] += 1
+
+    def recoger(self):
+        # Una escritura fallida vuelve a marcar los datos como sucios: el siguiente pump o flush la reintenta
+        if self.fallo and (self.pending is None or self.pending.done()):
+            self.fallo = False
+            if self.dirty_since is None: self.dirty_since = time.perf_counter()
+
+    def pump(self):
+        # Una vez por frame: escribe si pasó el debounce y no hay otra escritura en curso
+        self.recoger()
+        if self.dirty_since is None: return
+        if time.perf_counter() - self.dirty_since < self.debounce: return
+        if self.pending is not None and not self.pending.done(): return
+        self.start_write()
+
+    def start_write(self):
+        # El JSON se serializa aquí, en el hilo principal, para no leer DATOS mientras cambia
+        payload = json.dumps(DATOS)
+        self.dirty_since = None
+        if payload == self.last_payload:
+            self.stats["avoided"] += 1
+            return
+        self.last_payload = payload
+        if self.pool is None: self.pool = ThreadPoolExecutor(max_workers=1)
+        self.pending = self.pool.submit(self.write, payload)
+
+    def write(self, payload):
+        t0 = time.perf_counter()
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write(payload); f.flush(); os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self.stats["writes"] += 1
+        except OSError:
+            self.stats["errors"] += 1
+            self.last_payload = None
+            self.fallo = True
+        ms = (time.perf_counter() - t0) * 1000
+        self.stats["last_ms"] = ms
+        self.stats["max_ms"] = max(self.stats["max_ms"], ms)
+
+    def flush(self):
+        # Al salir o al pasar la app a segundo plano: escribe ya lo pendiente y espera
+        if self.pending is not None: self.pending.result()
+        self.recoger()
+        if self.dirty_since is not None:
+            self.start_write()
+            if self.pending is not None: self.pending.result()
+            self.recoger()
+
+    def close(self):
+        self.flush()
+        if self.pool is not None: self.pool.shutdown()
+
+GUARDADO = SaveWriter(ARCHIVO_SAVE)
 io_datos("load")
 
 # --- AUDIO ENGINE ---
+SAMPLE_RATE = 44100
+
+# Cache de PCM en disco (junto al save): cabecera + muestras int16 crudas
+DIR_CACHE_SFX = os.path.join(os.path.dirname(ARCHIVO_SAVE), "sfx_cache")
+SFX_CACHE_VERSION = 1
+SFX_CACHE_MAGIC = b"MDSX"
+SFX_CACHE_HEADER = struct.Struct("<4sIII")  # magic, version, bytes, crc32
+
+def sfx_cache_key(*params):
+    raw = repr((SFX_CACHE_VERSION, pygame.mixer.get_init(), SAMPLE_RATE) + params)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def sfx_cache_load(key):
+    path = os.path.join(DIR_CACHE_SFX, key + ".pcm")
+    try:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if len(mm) < SFX_CACHE_HEADER.size: return None
+                magic, version, size, crc = SFX_CACHE_HEADER.unpack_from(mm)
+                data = memoryview(mm)[SFX_CACHE_HEADER.size:]
+                try:
+                    if magic != SFX_CACHE_MAGIC or version != SFX_CACHE_VERSION or len(data) != size: return None
+                    if zlib.crc32(data) != crc: return None
+                    # Sound copia directamente desde el mapeo, sin bytes intermedios
+                    return pygame.mixer.Sound(buffer=data)
+                finally:
+                    data.release()
+    except (OSError, ValueError, pygame.error):
+        return None
+
+def sfx_cache_store(key, pcm):
+    path = os.path.join(DIR_CACHE_SFX, key + ".pcm")
+    tmp = path + ".tmp"
+    try:
+        os.makedirs(DIR_CACHE_SFX, exist_ok=True)
+        data = pcm.tobytes()
+        with open(tmp, "wb") as f:
+            f.write(SFX_CACHE_HEADER.pack(SFX_CACHE_MAGIC, SFX_CACHE_VERSION, len(data), zlib.crc32(data)))
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+def synth_pcm(freq_start, freq_end, duration, vol=0.5, type="sine", fm_mod=0, decay_factor=0.9):
+    # Genera la onda completa de una vez (numpy) y devuelve PCM int16 estéreo intercalado
+    n_samples = int(SAMPLE_RATE * duration)
+    i = np.arange(n_samples, dtype=np.float64)
+    t = i / SAMPLE_RATE
+    progress = i / n_samples if n_samples else i
+    current_freq = freq_start + (freq_end - freq_start) * progress
+    period = 2 * math.pi
+    modulator = np.sin(t * fm_mod * period) * 500 if fm_mod > 0 else 0
+    phase = t * (current_freq + modulator) * period
+    if type == "sine": val = np.sin(phase)
+    elif type == "square": val = np.where(np.sin(phase) > 0, 0.6, -0.6)
+    elif type == "saw": val = 2.0 * (t * current_freq - np.floor(t * current_freq + 0.5)) - 1.0
+    elif type == "noise": val = np.random.random(n_samples) * 2.0 - 1.0
+    elif type == "kick": val = np.sin(phase) * (1 - progress)
+    elif type == "plucky": val = np.sin(phase) * (1 - progress) ** 4
+    else: val = np.zeros(n_samples)
+    envelope = np.where(progress < 0.05, progress * 20, (1.0 - progress) ** decay_factor)
+    mono = np.clip(np.trunc(val * envelope * vol * 32767), -32767, 32767).astype(np.int16)
+    return np.repeat(mono, 2)
+
+MELODIA_FREQS = {"E5": 659, "Ds5": 622, "B4": 493, "D5": 587, "C5": 523, "A4": 440, "E4": 329}
+
+# nombre -> (freq_start, freq_end, duration, vol, type, fm_mod, decay_factor)
+SFX_SPECS = {
+    'ui': (2000, 2000, 0.05, 0.2, "sine", 0, 0.9),
+    'achieve': (800, 1200, 0.4, 0.5, "square", 20, 0.9),
+    'm_kick': (180, 50, 0.1, 0.9, "kick", 0, 3.0),
+    'm_snare': (1200, 200, 0.12, 0.5, "noise", 0, 0.9),
+    'm_hat': (8000, 9000, 0.04, 0.2, "noise", 0, 5),
+    'm_bass': (55, 55, 0.2, 0.7, "saw", 1, 0.9),
+    **{f'note_{name}': (freq, freq, 0.2, 0.4, "plucky", 0, 0.9) for name, freq in MELODIA_FREQS.items()},
+    'hit_low': (110, 110, 0.1, 0.7, "saw", 0, 1.0),
+    'hit_hi': (220, 220, 0.1, 0.6, "saw", 0, 1.0),
+    'jump': (300, 600, 0.15, 0.4, "saw", 0, 0.9),
+    'hit': (150, 100, 0.05, 0.5, "square", 0, 0.9),
+    'win': (440, 880, 0.4, 0.4, "sine", 0, 0.9),
+    'die': (100, 20, 0.5, 0.6, "noise", 0, 0.9),
+    'coin': (1200, 1800, 0.1, 0.3, "sine", 0, 0.9),
+    'warp': (200, 800, 0.3, 0.4, "sine", 0, 0.9),
+    'powerup': (600, 1200, 0.3, 0.4, "square", 0, 0.9),
+    'glass': (1000, 500, 0.1, 0.3, "square", 0, 0.9),
+    'drone': (150, 100, 0.15, 0.2, "saw", 0, 0.9),
+    'boss_hit': (100, 50, 0.2, 0.7, "saw", 0, 0.9),
+    'shoot': (400, 200, 0.15, 0.3, "square", 0, 0.9),
+    'break': (200, 50, 0.15, 0.5, "noise", 0, 0.9),
+    'timestop': (100, 0, 0.8, 0.5, "sine", 0, 0.9),
+    'alarm': (800, 600, 0.5, 0.6, "saw", 10, 0.9),
+}
+SFX_INMEDIATOS = ("ui", "achieve")
+
+# nombre -> (instancias simultáneas, prioridad, ms mínimos entre disparos)
+VOCES = {
+    'die': (1, 5, 0), 'win': (1, 5, 0), 'achieve': (1, 4, 0), 'alarm': (1, 4, 0), 'ui': (2, 4, 0),
+    'boss_hit': (2, 4, 40), 'jump': (2, 3, 0), 'coin': (3, 3, 30), 'warp': (1, 3, 0), 'powerup': (2, 3, 0),
+    'hit': (3, 2, 40), 'glass': (2, 2, 40), 'break': (2, 2, 40), 'shoot': (3, 2, 60),
+    'drone': (2, 1, 150), 'timestop': (1, 1, 250),
+}
+VOZ_DEFECTO = (4, 2, 0)
+
+MELODIA = ["E5", "Ds5", "E5", "Ds5", "E5", "B4", "D5", "C5", "A4", None, "E4", "A4", "C5", "E5", "A4", None]
+MUSIC_LATENCY_MS = 2048 * 1000.0 / SAMPLE_RATE
+
+def patron_musica(mode):
+    # Devuelve (pasos del ciclo, [(paso, muestra, volumen relativo)]); 4 pasos por pulso
+    eventos = []
+    pasos = 32 if mode == "EXPLORE" else 16
+    for paso in range(pasos):
+        step = paso % 16
+        if mode == "EXPLORE":
+            if step in [0, 8]: eventos.append((paso, 'm_kick', 1.0))
+            if step in [4, 12]: eventos.append((paso, 'm_snare', 1.0))
+            if step % 2 == 0: eventos.append((paso, 'm_hat', 0.6))
+            if step in [2, 6, 10, 14]: eventos.append((paso, 'm_bass', 0.7))
+            note = MELODIA[(paso // 2) % 16]
+            if note and step % 2 == 0: eventos.append((paso, f'note_{note}', 0.6))
+        elif mode == "BATTLE":
+            if step % 4 == 0: eventos.append((paso, 'm_kick', 1.0))
+            if step in [0, 1, 2,  4, 5, 6,  8, 9, 10,  12, 13, 14]:
+                eventos.append((paso, 'hit_low' if step < 8 else 'hit_hi', 0.8))
+            if step in [4, 12]: eventos.append((paso, 'm_snare', 0.8))
+    return pasos, eventos
+
 class AudioManager:
     def __init__(self):
         self.sounds = {}
-        self.last_beat_time = 0
-        self.beat_step = 0
-        self.melody_step = 0
         self.bpm = 120
         self.pulse_val = 0 
         self.mode = "EXPLORE" 
-        self.generate_assets()
+        self.cache_hits = 0
+        self.pool = None
+        self.pending_at_request = {}  # nombre -> assets pendientes la primera vez que se pidió
+        self.loops, self.kick_times, self.loop_ms = {}, {}, {}
+        self.playing = None; self.loop_start = 0; self.music_vol = None
+        pygame.mixer.set_reserved(1)
+        self.music_ch = pygame.mixer.Channel(0)
+        self.voices = [pygame.mixer.Channel(i) for i in range(1, pygame.mixer.get_num_channels())]
+        self.voice_info = [None] * len(self.voices)  # (nombre, prioridad, inicio) por canal
+        self.last_trigger = {}
+        self.voice_stats = {"played": 0, "dropped": 0, "stolen": 0}
+        self.load_assets()
 
     def make_sound(self, freq_start, freq_end, duration, vol=0.5, type="sine", fm_mod=0, decay_factor=0.9):
-        sample_rate = 44100
-        n_samples = int(sample_rate * duration)
-        buf = bytearray()
-        period = 2 * math.pi
-        for i in range(n_samples):
-            t = i / sample_rate
-            progress = i / n_samples
-            current_freq = freq_start + (freq_end - freq_start) * progress
-            modulator = 0
-            if fm_mod > 0: modulator = math.sin(t * fm_mod * period) * 500
-            phase = t * (current_freq + modulator) * period
-            val = 0
-            if type == "sine": val = math.sin(phase)
-            elif type == "square": val = 0.6 if math.sin(phase) > 0 else -0.6
-            elif type == "saw": val = 2.0 * (t * current_freq - math.floor(t * current_freq + 0.5)) - 1.0
-            elif type == "noise": val = random.random() * 2.0 - 1.0
-            elif type == "kick": val = math.sin(phase) * (1 - progress)
-            elif type == "plucky": val = math.sin(phase) * (1-progress)**4 
-            envelope = 1.0
-            if progress < 0.05: envelope = progress * 20 
-            else: envelope = (1.0 - progress) ** decay_factor
-            final_val = int(val * envelope * vol * 32767)
-            final_val = max(-32767, min(32767, final_val))
-            packed = struct.pack('<h', final_val)
-            buf.extend(packed); buf.extend(packed)
-        return pygame.mixer.Sound(bytes(buf))
-
-    def generate_assets(self):
-        self.sounds['jump'] = self.make_sound(300, 600, 0.15, 0.4, "saw")
-        self.sounds['hit'] = self.make_sound(150, 100, 0.05, 0.5, "square")
-        self.sounds['win'] = self.make_sound(440, 880, 0.4, 0.4, "sine")
-        self.sounds['die'] = self.make_sound(100, 20, 0.5, 0.6, "noise")
-        self.sounds['coin'] = self.make_sound(1200, 1800, 0.1, 0.3, "sine")
-        self.sounds['warp'] = self.make_sound(200, 800, 0.3, 0.4, "sine")
-        self.sounds['powerup'] = self.make_sound(600, 1200, 0.3, 0.4, "square")
-        self.sounds['achieve'] = self.make_sound(800, 1200, 0.4, 0.5, "square", fm_mod=20)
-        self.sounds['ui'] = self.make_sound(2000, 2000, 0.05, 0.2, "sine")
-        self.sounds['glass'] = self.make_sound(1000, 500, 0.1, 0.3, "square")
-        self.sounds['drone'] = self.make_sound(150, 100, 0.15, 0.2, "saw")
-        self.sounds['boss_hit'] = self.make_sound(100, 50, 0.2, 0.7, "saw")
-        self.sounds['shoot'] = self.make_sound(400, 200, 0.15, 0.3, "square")
-        self.sounds['break'] = self.make_sound(200, 50, 0.15, 0.5, "noise")
-        self.sounds['timestop'] = self.make_sound(100, 0, 0.8, 0.5, "sine")
-        self.sounds['alarm'] = self.make_sound(800, 600, 0.5, 0.6, "saw", fm_mod=10)
-        
-        self.sounds['m_kick'] = self.make_sound(180, 50, 0.1, 0.9, "kick", decay_factor=3.0)
-        self.sounds['m_snare'] = self.make_sound(1200, 200, 0.12, 0.5, "noise")
-        self.sounds['m_hat'] = self.make_sound(8000, 9000, 0.04, 0.2, "noise", decay_factor=5)
-        self.sounds['m_bass'] = self.make_sound(55, 55, 0.2, 0.7, "saw", fm_mod=1)
-        freqs = {"E5": 659, "Ds5": 622, "B4": 493, "D5": 587, "C5": 523, "A4": 440, "E4": 329}
-        for name, freq in freqs.items():
-            self.sounds[f'note_{name}'] = self.make_sound(freq, freq, 0.2, 0.4, "plucky")
-        self.sounds['hit_low'] = self.make_sound(110, 110, 0.1, 0.7, "saw", decay_factor=1.0)
-        self.sounds['hit_hi'] = self.make_sound(220, 220, 0.1, 0.6, "saw", decay_factor=1.0)
+        params = (freq_start, freq_end, duration, vol, type, fm_mod, decay_factor)
+        key = sfx_cache_key(*params)
+        snd = sfx_cache_load(key)
+        if snd is not None:
+            self.cache_hits += 1
+            return snd
+        pcm = synth_pcm(*params)
+        sfx_cache_store(key, pcm)
+        return pygame.mixer.Sound(buffer=pcm)
+
+    def generate_assets(self, names=None):
+        for name in (SFX_SPECS if names is None else names):
+            self.sounds[name] = self.make_sound(*SFX_SPECS[name])
+
+    def load_assets(self):
+        # Lo que usa el menú se genera ya; el resto en segundo plano
+        self.generate_assets(SFX_INMEDIATOS)
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        futures = [self.pool.submit(self.generate_assets, (name,)) for name in SFX_SPECS if name not in self.sounds]
+        # Los bucles van al final de la cola: cuando empiezan, sus muestras ya están en marcha
+        for mode in ("EXPLORE", "BATTLE"):
+            self.pool.submit(self.render_music_loop, mode, futures)
+
+    def pending(self):
+        return sum(1 for name in SFX_SPECS if name not in self.sounds)
+
+    def ready(self, name):
+        if name not in self.pending_at_request:
+            self.pending_at_request[name] = self.pending()
+        return name in self.sounds
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
 
     def play(self, name):
         vol_factor = CONFIG["vol_sfx"] / 10.0
-        if vol_factor > 0 and name in self.sounds:
-            snd = self.sounds[name]
-            snd.set_volume(vol_factor)
-            snd.play()
+        if vol_factor > 0 and self.ready(name):
+            idx = self.alloc_voice(name)
+            if idx is None: return
+            ch = self.voices[idx]
+            ch.set_volume(vol_factor)
+            ch.play(self.sounds[name])
+
+    def alloc_voice(self, name):
+        # Elige canal respetando límite por sonido, prioridad e intervalo de redisparo
+        cap, prio, gap = VOCES.get(name, VOZ_DEFECTO)
+        now = pygame.time.get_ticks()
+        last = self.last_trigger.get(name)
+        if last is not None and now - last < gap:
+            self.voice_stats["dropped"] += 1; return None
+        free, mine, victim = None, [], None
+        for i, ch in enumerate(self.voices):
+            info = self.voice_info[i]
+            if info is None or not ch.get_busy():
+                self.voice_info[i] = None
+                if free is None: free = i
+                continue
+            if info[0] == name: mine.append(i)
+            if info[1] <= prio and (victim is None or info[1:] < self.voice_info[victim][1:]): victim = i
+        if len(mine) >= cap:
+            idx = min(mine, key=lambda i: self.voice_info[i][2])
+            self.voice_stats["stolen"] += 1
+        elif free is not None:
+            idx = free
+        elif victim is not None:
+            idx = victim
+            self.voice_stats["stolen"] += 1
+        else:
+            self.voice_stats["dropped"] += 1; return None
+        self.voice_info[idx] = (name, prio, now)
+        self.last_trigger[name] = now
+        self.voice_stats["played"] += 1
+        return idx
+
+    def music_loop_key(self, mode):
+        pasos, eventos = patron_musica(mode)
+        specs = tuple(sorted({(name, SFX_SPECS[name]) for _, name, _ in eventos}))
+        return sfx_cache_key("loop", mode, self.bpm, pasos, tuple(eventos), specs)
+
+    def render_music_loop(self, mode, deps=()):
+        # Mezcla offline un ciclo completo del modo en un único buffer
+        key = self.music_loop_key(mode)
+        snd = sfx_cache_load(key)
+        if snd is None:
+            for f in deps: f.result()
+            pasos, eventos = patron_musica(mode)
+            step_len = SAMPLE_RATE * 60.0 / self.bpm / 4
+            total = int(round(pasos * step_len))
+            mix = np.zeros((total, 2), dtype=np.float32)
+            for paso, name, vol in eventos:
+                pcm = pygame.sndarray.array(self.sounds[name]).reshape(-1, 2) * vol
+                start = int(round(paso * step_len)); n = min(len(pcm), total)
+                first = min(n, total - start)
+                mix[start:start + first] += pcm[:first]
+                mix[:n - first] += pcm[first:n]  # la cola se solapa con el inicio del bucle
+            pcm = np.clip(mix, -32767, 32767).astype(np.int16).reshape(-1)
+            sfx_cache_store(key, pcm)
+            snd = pygame.mixer.Sound(buffer=pcm)
+        step_ms = 60000.0 / self.bpm / 4
+        pasos, eventos = patron_musica(mode)
+        self.kick_times[mode] = sorted({paso * step_ms for paso, name, _ in eventos if name == 'm_kick'})
+        self.loop_ms[mode] = pasos * step_ms
+        self.loops[mode] = snd
 
     def update_music(self):
-        self.pulse_val *= 0.9 
         vol_factor = CONFIG["vol_musica"] / 10.0
-        if vol_factor <= 0: return
+        loop = self.loops.get(self.mode)
+        if loop is None: self.pulse_val *= 0.9; return
         now = pygame.time.get_ticks()
-        step_duration = (60000 / self.bpm) / 4 
-        if now - self.last_beat_time >= step_duration:
-            self.last_beat_time = now
-            step = self.beat_step % 16
-            if self.mode == "EXPLORE":
-                if step in [0, 8]: self.play_music_sample('m_kick', vol_factor); self.pulse_val = 1.0
-                if step in [4, 12]: self.play_music_sample('m_snare', vol_factor)
-                if step % 2 == 0: self.play_music_sample('m_hat', vol_factor * 0.6)
-                if step in [2, 6, 10, 14]: self.play_music_sample('m_bass', vol_factor * 0.7)
-                melody = ["E5", "Ds5", "E5", "Ds5", "E5", "B4", "D5", "C5", "A4", None, "E4", "A4", "C5", "E5", "A4", None]
-                note = melody[self.melody_step % 16]
-                if note and step % 2 == 0:
-                    self.play_music_sample(f'note_{note}', vol_factor * 0.6)
-            elif self.mode == "BATTLE":
-                if step % 4 == 0:
-                    self.play_music_sample('m_kick', vol_factor * 1.0)
-                    self.pulse_val = 1.0
-                if step in [0, 1, 2,  4, 5, 6,  8, 9, 10,  12, 13, 14]:
-                    tone = 'hit_low' if step < 8 else 'hit_hi'
-                    self.play_music_sample(tone, vol_factor * 0.8)
-                if step in [4, 12]:
-                    self.play_music_sample('m_snare', vol_factor * 0.8)
-            self.beat_step += 1
-            if self.beat_step % 2 == 0: self.melody_step += 1
-
-    def play_music_sample(self, name, vol):
-        if name in self.sounds:
-            s = self.sounds[name]
-            s.set_volume(vol)
-            s.play()
-
-AUDIO = AudioManager()
+        if self.playing != self.mode:
+            self.music_ch.play(loop, loops=-1)
+            self.playing = self.mode; self.loop_start = now
+        if vol_factor != self.music_vol:
+            self.music_ch.set_volume(vol_factor); self.music_vol = vol_factor
+        if vol_factor <= 0: self.pulse_val = 0; return
+        # Pulso desde la línea de tiempo precalculada (compensando la latencia de salida)
+        pos = (now - self.loop_start - MUSIC_LATENCY_MS) % self.loop_ms[self.mode]
+        kicks = self.kick_times[self.mode]
+        i = bisect.bisect_right(kicks, pos)
+        last_kick = kicks[i - 1] if i > 0 else kicks[-1] - self.loop_ms[self.mode]
+        self.pulse_val = 0.9 ** ((pos - last_kick) / (1000.0 / FPS))
+
+class NullAudio:
+    # Sustituto de AudioManager en modo headless: misma interfaz, sin dispositivo
+    def __init__(self):
+        self.sounds = {}
+        self.pulse_val = 0
+        self.mode = "EXPLORE"
+        self.voice_stats = {"played": 0, "dropped": 0, "stolen": 0}
+
+    def play(self, name): pass
+    def update_music(self): pass
+    def close(self): pass
+
+AUDIO = NullAudio() if HEADLESS else AudioManager()
 
 def sound(name):
     AUDIO.play(name)
 
+GLOW_CACHE_MAX = 128
+GRID_CELDA = 80 * FACTOR
+TEXT_CACHE_MAX = 256
+TEX_CACHE_BYTES = 16 * 1024 * 1024
+ATLAS_PAGE = 1024
+ATLAS_MAX_W, ATLAS_MAX_H = 512, 128
+GRID_PULSO_PASO = 4  # niveles de brillo precalculados para el pulso de la rejilla
+
+# Niveles de calidad, de mejor a peor: fracción de columnas de lluvia, partículas por explosión,
+# brillo aditivo, puntos de estela de la bola y efectos glitch
+NIVELES_CALIDAD = [
+    {"n": "ALTA", "lluvia": 1.0, "parts": 10, "glow": True, "estela": 20, "glitch": True},
+    {"n": "MEDIA", "lluvia": 0.75, "parts": 7, "glow": True, "estela": 12, "glitch": True},
+    {"n": "BAJA", "lluvia": 0.5, "parts": 4, "glow": False, "estela": 6, "glitch": False},
+    {"n": "MINIMA", "lluvia": 0.25, "parts": 2, "glow": False, "estela": 0, "glitch": False},
+]
+CALIDAD_BAJAR = 0.9   # p90 del trabajo por frame sobre el 90% del presupuesto: baja un nivel
+CALIDAD_SUBIR = 0.55  # p90 por debajo del 55%: ventana limpia
+CALIDAD_LIMPIAS = 4   # ventanas limpias seguidas para subir un nivel
+CALIDAD_LIMPIAS_MAX = 64  # tope tras recaídas: un nivel que no aguanta se reintenta como mucho cada ~1 min
+
+class Gobernador:
+    # Mide el trabajo de cada frame (RELOJ.get_rawtime, sin la espera de tick) en ventanas de `ventana`
+    # frames y mueve el nivel de calidad. Bajar se decide en cada ventana y nunca se bloquea; subir pide
+    # varias ventanas limpias seguidas, y el doble cada vez que el nivel recuperado vuelve a pasarse enseguida.
+    def __init__(self, fps=FPS, ventana=60):
+        self.presupuesto = 1000.0 / fps
+        self.muestras = deque(maxlen=ventana)
+        self.nivel = 0
+        self.limpias = 0
+        self.requeridas = [CALIDAD_LIMPIAS] * len(NIVELES_CALIDAD)  # ventanas limpias para volver a cada nivel
+        self.desde_subida = None  # ventanas desde la última subida
+        self.p90 = 0.0
+        self.stats = {"bajadas": 0, "subidas": 0}
+
+    @property
+    def tier(self):
+        return NIVELES_CALIDAD[self.nivel]
+
+    def registrar(self, ms):
+        if not CONFIG["calidad_auto"]:
+            self.nivel = 0
+            return
+        self.muestras.append(ms)
+        if len(self.muestras) < self.muestras.maxlen: return
+        self.p90 = sorted(self.muestras)[int(len(self.muestras) * 0.9)]
+        self.muestras.clear()
+        if self.desde_subida is not None: self.desde_subida += 1
+        if self.p90 > self.presupuesto * CALIDAD_BAJAR:
+            self.limpias = 0
+            if self.nivel < len(NIVELES_CALIDAD) - 1:
+                if self.desde_subida is not None and self.desde_subida <= 2:
+                    self.requeridas[self.nivel] = min(self.requeridas[self.nivel] * 2, CALIDAD_LIMPIAS_MAX)
+                self.nivel += 1; self.stats["bajadas"] += 1
+                self.desde_subida = None
+        elif self.p90 < self.presupuesto * CALIDAD_SUBIR and self.nivel > 0:
+            self.limpias += 1
+            if self.limpias >= self.requeridas[self.nivel - 1]:
+                self.nivel -= 1; self.stats["subidas"] += 1
+                self.limpias = 0; self.desde_subida = 0
+        else:
+            self.limpias = 0
+
+GOBERNADOR = Gobernador()
+
+# Etapas del perfilador en el orden del frame; "espera" (end_frame + tick) no cuenta como trabajo
+ETAPAS_PERFIL = [
+    ("logica", (200, 200, 200)), ("fondo", (0, 90, 90)), ("eventos", (255, 0, 255)),
+    ("pelota", (0, 255, 50)), ("entidades", (0, 150, 255)),
+    ("d_gravs", (120, 0, 200)), ("d_portales", (255, 140, 0)), ("d_powers", (255, 255, 0)),
+    ("d_torretas", (150, 75, 0)), ("d_proyectiles", (255, 80, 80)), ("d_obs", (0, 200, 120)),
+    ("d_estrellas", (255, 215, 0)), ("d_drones", (255, 0, 0)), ("d_jefes", (180, 0, 60)),
+    ("d_textos", (255, 255, 255)), ("d_pelota", (100, 255, 180)), ("d_mira", (0, 255, 255)),
+    ("hud", (140, 140, 255)), ("ui", (80, 80, 200)), ("notifier", (255, 150, 200)),
+    ("particulas", (255, 100, 0)), ("overlay", (90, 90, 90)), ("presentar", (255, 0, 100)),
+    ("espera", (30, 30, 30)),
+]
+PERFIL_FRAMES = 600  # anillo de 10 s a 60 fps
+PERFIL_BARRA = 240   # frames visibles en la barra apilada
+
+class Perfilador:
+    # Cronómetro por vueltas: vuelta(etapa) suma a esa etapa el tiempo desde la vuelta anterior y
+    # frame() cierra la fila en un anillo numpy (frames x etapas, ms). Apagado, cada llamada solo
+    # comprueba self.activo.
+    def __init__(self, etapas=ETAPAS_PERFIL, frames=PERFIL_FRAMES):
+        self.nombres = [n for n, c in etapas]
+        self.indice = {n: i for i, n in enumerate(self.nombres)}
+        self.colores = np.array([c for n, c in etapas], dtype=np.uint8)
+        self.datos = np.zeros((frames, len(etapas)), dtype=np.float32)
+        self.fila = np.zeros(len(etapas), dtype=np.float32)
+        self.n = 0
+        self.activo = False
+        self.en_curso = False  # la fila actual empezó en un frame()
+        self.t = 0.0
+        self.capa, self.capa_n = None, -1
+
+    def alternar(self):
+        self.activo = not self.activo
+        self.en_curso = False
+
+    def frame(self):
+        if not self.activo: return
+        t = time.perf_counter()
+        if self.en_curso:
+            self.fila[-1] += (t - self.t) * 1000
+            self.datos[self.n % len(self.datos)] = self.fila
+            self.n += 1
+        self.fila[:] = 0
+        self.en_curso = True
+        self.t = t
+
+    def vuelta(self, etapa):
+        if not self.activo: return
+        t = time.perf_counter()
+        self.fila[self.indice[etapa]] += (t - self.t) * 1000
+        self.t = t
+
+    def ultimos(self, k=None):
+        # Filas en orden cronológico (las k más recientes)
+        total = min(self.n, len(self.datos))
+        k = total if k is None else min(k, total)
+        idx = np.arange(self.n - k, self.n) % len(self.datos)
+        return self.datos[idx]
+
+    def percentiles(self, k=None):
+        filas = self.ultimos(k)
+        if not len(filas): return (0.0, 0.0, 0.0)
+        return tuple(np.percentile(filas[:, :-1].sum(axis=1), (50, 95, 99)).tolist())
+
+    def barra(self, w, h, escala_ms):
+        # Barra apilada de los últimos w frames: cada columna un frame, cada tramo una etapa
+        filas = self.ultimos(w)
+        img = np.zeros((w, h, 3), dtype=np.uint8)
+        if len(filas):
+            techo = np.cumsum(filas[:, :-1], axis=1)  # (frames, etapas de trabajo)
+            ms_px = (h - np.arange(h) - 0.5) * (escala_ms / h)  # ms del centro de cada fila de píxeles
+            etapa = (techo[:, None, :] < ms_px[None, :, None]).sum(axis=2)
+            dentro = etapa < techo.shape[1]
+            cols = img[w - len(filas):]
+            cols[dentro] = self.colores[etapa[dentro]]
+        presupuesto = int(h - (1000.0 / FPS) * h / escala_ms)
+        if 0 <= presupuesto < h: img[:, presupuesto] = (255, 255, 255)
+        return pygame.surfarray.make_surface(img)
+
+    def draw(self, s):
+        # Se rehace cada 10 frames; entre medias se reutiliza la capa
+        if self.capa is None or self.n - self.capa_n >= 10:
+            self.capa_n = self.n
+            w, h = min(PERFIL_BARRA, ANCHO - 10), int(80 * FACTOR)
+            barra = self.barra(w, h, 2000.0 / FPS)
+            p50, p95, p99 = self.percentiles()
+            medias = self.ultimos(PERFIL_BARRA)[:, :-1].mean(axis=0) if self.n else np.zeros(len(self.nombres) - 1)
+            top = np.argsort(medias)[::-1][:4]
+            lineas = [(f"p50 {p50:.1f}  p95 {p95:.1f}  p99 {p99:.1f} ms", COLORES["BLANCO"])]
+            lineas += [(f"{self.nombres[i]} {medias[i]:.2f}", tuple(self.colores[i].tolist())) for i in top]
+            alto_txt = GFX.font_small.get_linesize()
+            capa = pygame.Surface((max(w, 200 * FACTOR), h + alto_txt * len(lineas) + 4))
+            capa.fill((0, 0, 0))
+            capa.blit(barra, (0, 0))
+            for j, (txt, c) in enumerate(lineas):
+                capa.blit(GFX.text(GFX.font_small, txt, True, c), (2, h + 2 + j * alto_txt))
+            self.capa = capa
+        r = s.blit(self.capa, (5, ALTO - self.capa.get_height() - 5))
+        PRESENTER.mark(r)
+
+    def dump_csv(self, ruta):
+        filas = self.ultimos()
+        with open(ruta, "w") as f:
+            f.write(",".join(["frame"] + self.nombres + ["total"]) + "\n")
+            base = self.n - len(filas)
+            for i, fila in enumerate(filas.tolist()):
+                f.write(",".join([str(base + i)] + [f"{v:.3f}" for v in fila] + [f"{sum(fila[:-1]):.3f}"]) + "\n")
+        return ruta
+
+PERFIL = Perfilador()
+
+def ruta_perfil():
+    # CSV junto al guardado, con resolución y fecha para comparar dispositivos
+    return os.path.join(os.path.dirname(ARCHIVO_SAVE), f"perfil_{ANCHO}x{ALTO}_{datetime.now():%Y%m%d_%H%M%S}.csv")
+
 class Visuals:
     def __init__(self):
-        self.cache = {}
+        self.cache = OrderedDict()  # clave -> (surface, bytes propios, id de página del atlas)
+        self.tex_bytes = 0
+        self.tex_stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self.atlas = None  # (página actual, x, y, alto del estante)
+        self.atlas_pages = {}
+        self.glow_cache = OrderedDict()
+        self.glow_stats = {"hits": 0, "misses": 0}
+        self.text_cache = OrderedDict()
+        self.glitch_sorteo = {}  # (texto, tamaño) -> sorteo del glitch del paso de 60 Hz actual
+        self.text_frame = [0, 0]
+        self.text_last_frame = (0, 0)
+        self.text_stats = {"hits": 0, "misses": 0}
+        self.btn_cache = {}
+        self.fill_cache = {}
+        self.dim_cache = {}
+        self.grid = None  # (fila superior, hueco, diagonales por nivel de pulso, filas por fase)
+        self.dot = pygame.Surface((5, 5), pygame.SRCALPHA)
+        pygame.draw.circle(self.dot, (255, 255, 255), (2, 2), 2)
         try:
             self.font_big = pygame.font.SysFont("Consolas", int(45*FACTOR), bold=True)
             self.font_huge = pygame.font.SysFont("Consolas", int(70*FACTOR), bold=True)
@@ -251,41 +717,173 @@ class Visuals:
 
     def draw_glitch_text(self, surf, text, x, y, color, size="big"):
         font = self.font_huge if size == "huge" else self.font_big
-        off_x = random.randint(-3, 3) if random.random() < 0.2 else 0
-        off_y = random.randint(-3, 3) if random.random() < 0.2 else 0
-        if random.random() < 0.1:
-            t_r = font.render(text, True, (255, 0, 0))
+        glitch = GOBERNADOR.tier["glitch"]
+        # El sorteo se renueva una vez por paso de 60 Hz, no por frame pintado
+        paso = pygame.time.get_ticks() * SIM_HZ // 1000
+        sorteo = self.glitch_sorteo.get((text, size))
+        if sorteo is None or sorteo[0] != paso:
+            sorteo = (paso,
+                      random.randint(-3, 3) if random.random() < 0.2 else 0,
+                      random.randint(-3, 3) if random.random() < 0.2 else 0,
+                      random.random() < 0.1,
+                      random.random() if random.random() < 0.05 else None)
+            if len(self.glitch_sorteo) >= 64: self.glitch_sorteo.clear()
+            self.glitch_sorteo[(text, size)] = sorteo
+        _, off_x, off_y, split, linea = sorteo
+        if not glitch: off_x = off_y = 0; split = False; linea = None
+        if split:
+            t_r = self.text(font, text, True, (255, 0, 0))
             surf.blit(t_r, (x - 5 + off_x, y + off_y))
-            t_b = font.render(text, True, (0, 255, 255))
+            t_b = self.text(font, text, True, (0, 255, 255))
             surf.blit(t_b, (x + 5 + off_x, y + off_y))
-        t_main = font.render(text, True, color)
+        t_main = self.text(font, text, True, color)
         surf.blit(t_main, (x + off_x, y + off_y))
-        if random.random() < 0.05:
-            ly = y + random.randint(0, t_main.get_height())
+        PRESENTER.mark((x - 10, y - 5, t_main.get_width() + 20, t_main.get_height() + 10))
+        if linea is not None:
+            ly = y + int(linea * t_main.get_height())
             pygame.draw.line(surf, color, (x, ly), (x + t_main.get_width(), ly), 2)
 
+    def text(self, font, txt, antialias, color):
+        # Igual que font.render, pero reutiliza la superficie si ya se pintó (LRU)
+        key = (font, txt, antialias, tuple(color))
+        t = self.text_cache.get(key)
+        if t is not None:
+            self.text_cache.move_to_end(key); self.text_frame[0] += 1
+            return t
+        self.text_frame[1] += 1
+        t = font.render(txt, antialias, color)
+        self.text_cache[key] = t
+        if len(self.text_cache) > TEXT_CACHE_MAX: self.text_cache.popitem(last=False)
+        return t
+
+    def end_frame(self):
+        # Contadores de texto del último frame: (renders evitados, renders hechos)
+        self.text_last_frame = tuple(self.text_frame)
+        self.text_stats["hits"] += self.text_frame[0]; self.text_stats["misses"] += self.text_frame[1]
+        self.text_frame = [0, 0]
+
     def draw_neon_rect(self, surf, rect, color, fill=False):
         c = 8 * FACTOR
         pts = [(rect.left+c, rect.top), (rect.right-c, rect.top), (rect.right, rect.top+c), (rect.right, rect.bottom-c),
                (rect.right-c, rect.bottom), (rect.left+c, rect.bottom), (rect.left, rect.bottom-c), (rect.left, rect.top+c)]
         if fill:
-            s = pygame.Surface((rect.w, rect.h), pygame.SRCALPHA)
-            pygame.draw.polygon(s, (*color, 50), [(p[0]-rect.x, p[1]-rect.y) for p in pts])
+            key = (rect.w, rect.h, tuple(color))
+            s = self.fill_cache.get(key)
+            if s is None:
+                s = pygame.Surface((rect.w, rect.h), pygame.SRCALPHA)
+                pygame.draw.polygon(s, (*color, 50), [(p[0]-rect.x, p[1]-rect.y) for p in pts])
+                self.fill_cache[key] = s
             surf.blit(s, (rect.x, rect.y))
         pygame.draw.polygon(surf, color, pts, 2)
 
-    def draw_glow_circle(self, surf, x, y, radius, color):
+    def button_sprite(self, w, h, txt, hover):
+        # Botón ya pintado (borde neón + texto), con 2px de margen para el trazo del borde
+        key = (w, h, txt, hover)
+        s = self.btn_cache.get(key)
+        if s is None:
+            s = pygame.Surface((w + 4, h + 4), pygame.SRCALPHA)
+            c = COLORES["META"] if hover else COLORES["NEON"]
+            self.draw_neon_rect(s, pygame.Rect(2, 2, w, h), c, fill=hover)
+            t = self.text(self.font_ui, txt, True, (0,0,0) if hover else c)
+            s.blit(t, (2 + w//2 - t.get_width()//2, 2 + h//2 - t.get_height()//2))
+            self.btn_cache[key] = s
+        return s
+
+    def dim(self, alpha):
+        # Velo negro a pantalla completa, uno por opacidad
+        s = self.dim_cache.get(alpha)
+        if s is None:
+            s = pygame.Surface((ANCHO, ALTO)); s.set_alpha(alpha); s.fill((0,0,0))
+            self.dim_cache[alpha] = s
+        return s
+
+    def glow_sprite(self, radius, color):
+        # Sprite de brillo pre-renderizado, por radio entero y color (LRU acotada)
+        key = (int(radius), tuple(color))
+        s = self.glow_cache.get(key)
+        if s is not None:
+            self.glow_cache.move_to_end(key); self.glow_stats["hits"] += 1
+            return s
+        self.glow_stats["misses"] += 1
+        radius = key[0]
         s = pygame.Surface((int(radius*2.5), int(radius*2.5)), pygame.SRCALPHA)
         pygame.draw.circle(s, (*color, 60), (int(radius*1.25), int(radius*1.25)), int(radius))
         pygame.draw.circle(s, (*color, 200), (int(radius*1.25), int(radius*1.25)), int(radius*0.6))
         pygame.draw.circle(s, (255, 255, 255, 255), (int(radius*1.25), int(radius*1.25)), int(radius*0.4))
-        surf.blit(s, (x - radius*1.25, y - radius*1.25), special_flags=pygame.BLEND_ADD)
+        self.glow_cache[key] = s
+        if len(self.glow_cache) > GLOW_CACHE_MAX: self.glow_cache.popitem(last=False)
+        return s
+
+    def draw_dots(self, surf, pts):
+        # Puntos de la mira en una sola llamada
+        surf.blits([(self.dot, (int(px) - 2, int(py) - 2)) for px, py in pts], False)
+
+    def draw_glow_circle(self, surf, x, y, radius, color):
+        if not GOBERNADOR.tier["glow"]:
+            # Calidad reducida: solo el núcleo, sin halo aditivo
+            pygame.draw.circle(surf, color, (int(x), int(y)), int(radius*0.6))
+            pygame.draw.circle(surf, (255, 255, 255), (int(x), int(y)), int(radius*0.4))
+            return
+        s = self.glow_sprite(radius, color)
+        r = int(radius)
+        surf.blit(s, (x - r*1.25, y - r*1.25), special_flags=pygame.BLEND_ADD)
 
     def get_texture(self, w, h, color, type="grid"):
         w, h = int(w), int(h)
         key = (w, h, color, type)
-        if key in self.cache: return self.cache[key]
-        s = pygame.Surface((w, h)); s.fill((0, 15, 0))
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.move_to_end(key); self.tex_stats["hits"] += 1
+            return entry[0]
+        self.tex_stats["misses"] += 1
+        page = None
+        if type != "glass" and w <= ATLAS_MAX_W and h <= ATLAS_MAX_H: page = self.atlas_alloc(w, h)
+        if page is not None:
+            s = page[0].subsurface(page[1])
+            entry = (s, 0, id(page[0]))
+        else:
+            s = pygame.Surface((w, h))
+            entry = (s, w * h * s.get_bytesize(), None)
+            self.tex_bytes += entry[1]
+        self.paint_texture(s, w, h, color, type)
+        self.cache[key] = entry
+        self.trim_textures()
+        return s
+
+    def atlas_alloc(self, w, h):
+        # Empaquetado por estantes en páginas ATLAS_PAGE x ATLAS_PAGE
+        if self.atlas is not None:
+            surf, x, y, shelf_h = self.atlas
+            if x + w > ATLAS_PAGE: x, y, shelf_h = 0, y + shelf_h, 0
+            if y + h <= ATLAS_PAGE:
+                self.atlas = (surf, x + w, y, max(shelf_h, h))
+                return surf, pygame.Rect(x, y, w, h)
+        surf = pygame.Surface((ATLAS_PAGE, ATLAS_PAGE))
+        self.atlas_pages[id(surf)] = surf
+        self.tex_bytes += ATLAS_PAGE * ATLAS_PAGE * surf.get_bytesize()
+        self.atlas = (surf, w, 0, h)
+        return surf, pygame.Rect(0, 0, w, h)
+
+    def trim_textures(self):
+        # Expulsa por LRU hasta caber en el presupuesto; una página del atlas sale entera
+        while self.tex_bytes > TEX_CACHE_BYTES and len(self.cache) > 1:
+            key, (s, nbytes, page_id) = self.cache.popitem(last=False)
+            self.tex_stats["evictions"] += 1
+            if page_id is None:
+                self.tex_bytes -= nbytes
+                continue
+            for k in [k for k, e in self.cache.items() if e[2] == page_id]:
+                del self.cache[k]; self.tex_stats["evictions"] += 1
+            page = self.atlas_pages.pop(page_id)
+            self.tex_bytes -= page.get_width() * page.get_height() * page.get_bytesize()
+            if self.atlas is not None and self.atlas[0] is page: self.atlas = None
+
+    def texture_stats(self):
+        return dict(self.tex_stats, entries=len(self.cache), bytes=self.tex_bytes,
+                    budget=TEX_CACHE_BYTES, atlas_pages=len(self.atlas_pages))
+
+    def paint_texture(self, s, w, h, color, type):
+        s.fill((0, 15, 0))
         if type == "grid":
             step = int(10 * FACTOR)
             c_dark = (color[0]//3, color[1]//3, color[2]//3)
@@ -315,8 +913,6 @@ class Visuals:
             pygame.draw.rect(s, COLORES["BOSS"], (0,0,w,h), 4)
             pygame.draw.line(s, COLORES["BOSS"], (0,0), (w,h), 2)
             pygame.draw.line(s, COLORES["BOSS"], (w,0), (0,h), 2)
-        self.cache[key] = s
-        return s
 
     def draw_star(self, surf, x, y, size, color, rot):
         points = []
@@ -338,26 +934,59 @@ class Visuals:
         pygame.draw.polygon(surf, COLORES["DRONE"], points, 2)
         pygame.draw.circle(surf, (255,0,0), (int(x), int(y)), 4*FACTOR)
     
-    def draw_cyber_grid(self, surf, scroll):
+    def build_grid(self):
+        # Las diagonales no se mueven: se trazan una vez en una capa de 8 bits (0 = fondo,
+        # 1 = línea). Las horizontales son filas completas; se guarda la lista de filas
+        # de cada fase de scroll (una por píxel del hueco).
         horizon = ALTO * 0.4
+        top = int(horizon)
         gap = 40 * FACTOR
-        pulse = int(AUDIO.pulse_val * 100)
-        grid_c = (0, 40 + pulse, 40 + pulse) 
         cx = ANCHO // 2
+        base = pygame.Surface((ANCHO, ALTO - top), 0, 8)
+        base.set_palette([COLORES["BG"], (0, 40, 40)] + [(0, 0, 0)] * 254)
+        base.fill(0)
         for i in range(-10, 11):
             offset = i * gap * 4
-            x_bottom = cx + offset * 3
-            x_top = cx + offset * 0.1
-            pygame.draw.line(surf, grid_c, (x_top, horizon), (x_bottom, ALTO), 1)
+            pygame.draw.line(base, 1, (cx + offset * 0.1, horizon - top), (cx + offset * 3, ALTO - top), 1)
+        # Columna de 1px para obtener las filas exactas que rasteriza draw.line
+        col = pygame.Surface((1, ALTO - top), 0, 8)
+        fases = []
+        for k in range(max(1, int(gap))):
+            col.fill(0)
+            offset_y = k * gap / max(1, int(gap))
+            y = ALTO
+            depth = 0
+            while y > horizon:
+                y_screen = ALTO - (depth * depth * 3 * FACTOR) + offset_y
+                if y_screen < ALTO and y_screen > horizon:
+                    pygame.draw.line(col, 1, (0, y_screen - top), (ANCHO, y_screen - top), 1)
+                depth += 0.5
+                y = y_screen
+            fases.append(tuple(pygame.Rect(0, top + r, ANCHO, 1) for r in range(ALTO - top) if col.get_at_mapped((0, r))))
+        # Un cambio de paleta por nivel de pulso; la copia en formato de pantalla con
+        # colorkey+RLE solo recorre los píxeles de línea al hacer blit. SDL codifica el RLE
+        # (y libera los píxeles completos) en el primer blit: se fuerza aquí contra un
+        # destino de 1px para no mantener 26 capas a tamaño de pantalla
+        capas = []
+        scratch = pygame.Surface((1, 1)).convert()
+        for pulse in range(0, 101, GRID_PULSO_PASO):
+            base.set_palette_at(1, (0, 40 + pulse, 40 + pulse))
+            capa = base.convert()
+            capa.set_colorkey(COLORES["BG"], pygame.RLEACCEL)
+            scratch.blit(capa, (0, 0))
+            capas.append(capa)
+        self.grid = (top, gap, capas, fases)
+
+    def draw_cyber_grid(self, surf, scroll):
+        if self.grid is None: self.build_grid()
+        top, gap, capas, fases = self.grid
+        nivel = min(int(AUDIO.pulse_val * 100) // GRID_PULSO_PASO, len(capas) - 1)
+        surf.blit(capas[nivel], (0, top))
+        pulse = nivel * GRID_PULSO_PASO
+        grid_c = (0, 40 + pulse, 40 + pulse)
         offset_y = (pygame.time.get_ticks() * 0.1) % gap
-        y = ALTO
-        depth = 0
-        while y > horizon:
-            y_screen = ALTO - (depth * depth * 3 * FACTOR) + offset_y
-            if y_screen < ALTO and y_screen > horizon:
-                pygame.draw.line(surf, grid_c, (0, y_screen), (ANCHO, y_screen), 1)
-            depth += 0.5
-            y = y_screen
+        for fila in fases[int(offset_y * len(fases) / gap) % len(fases)]:
+            surf.fill(grid_c, fila)
 
 GFX = Visuals()
 
@@ -369,6 +998,7 @@ class FloatingText:
         self.life = 60
         self.alpha = 255
         self.vy = -2 * FACTOR 
+        self.surf = None
 
     def update(self):
         self.y += self.vy
@@ -378,9 +1008,9 @@ class FloatingText:
 
     def draw(self, s):
         if self.life > 0:
-            t = GFX.font_ui.render(str(self.text), True, self.color)
-            t.set_alpha(self.alpha)
-            s.blit(t, (self.x, self.y))
+            if self.surf is None: self.surf = GFX.text(GFX.font_ui, str(self.text), True, self.color).copy()
+            self.surf.set_alpha(self.alpha)
+            s.blit(self.surf, (self.x, self.y))
 
 class NotificationSystem:
     def __init__(self):
@@ -391,13 +1021,15 @@ class NotificationSystem:
     def add(self, txt):
         self.queue.append(txt)
     
-    def update_draw(self, surf):
+    def update_draw(self, surf, dt=1.0):
+        # dt: tiempo del frame en frames de 60 Hz, para que el aviso dure lo mismo a cualquier fps
         if self.timer > 0:
-            self.timer -= 1
+            self.timer -= dt
             r = pygame.Rect(ANCHO//2 - 200*FACTOR, 10*FACTOR, 400*FACTOR, 40*FACTOR)
+            PRESENTER.mark(r)
             pygame.draw.rect(surf, (0,0,0), r)
             pygame.draw.rect(surf, COLORES["ACHIEVE"], r, 2)
-            t = GFX.font_small.render(self.text, True, COLORES["ACHIEVE"])
+            t = GFX.text(GFX.font_small, self.text, True, COLORES["ACHIEVE"])
             surf.blit(t, (r.centerx - t.get_width()//2, r.centery - t.get_height()//2))
         elif len(self.queue) > 0:
             self.text = self.queue.pop(0)
@@ -406,40 +1038,159 @@ class NotificationSystem:
 
 NOTIFIER = NotificationSystem()
 
-def check_achievements():
-    for l in LOGROS_DEF:
+# Logros indexados por contador: stat -> (umbrales ordenados, logros). Cambiar un contador solo
+# revisa los umbrales de ese contador que acaba de cruzar
+LOGROS_IDX = {}
+for _l in sorted(LOGROS_DEF, key=lambda l: l["min"]):
+    _mins, _defs = LOGROS_IDX.setdefault(_l["stat"], ([], []))
+    _mins.append(_l["min"]); _defs.append(_l)
+LOGROS_PROGRESO = dict.fromkeys(LOGROS_IDX, 0)  # stat -> umbrales ya superados
+
+def stat_add(name, n=1):
+    DATOS[name] += n
+    if n > 0 and name in LOGROS_IDX: check_stat(name)
+
+def check_stat(name):
+    mins, defs = LOGROS_IDX[name]
+    i = LOGROS_PROGRESO[name]
+    hasta = bisect.bisect_right(mins, DATOS[name])
+    LOGROS_PROGRESO[name] = max(i, hasta)
+    for l in defs[i:hasta]:
         if l["id"] not in DATOS["logros"]:
-            if l["cond"](DATOS):
-                DATOS["logros"].append(l["id"])
-                reward = l.get("r", 0)
-                DATOS["estrellas"] += reward
-                NOTIFIER.add(f"LOGRO: {l['t']} (+{reward} $)")
-                io_datos("save")
+            DATOS["logros"].append(l["id"])
+            reward = l.get("r", 0)
+            NOTIFIER.add(f"LOGRO: {l['t']} (+{reward} $)")
+            io_datos("save")
+            stat_add("estrellas", reward)
+
+def sync_logros():
+    # Al arrancar: pone al día los logros con los contadores del save
+    for name in LOGROS_IDX: check_stat(name)
 
 # --- MATRIX RAIN OPTIMIZADA ---
+RAIN_KATAKANA = "ｱｲｳｴｵｶｷｸｹｺｻｼｽｾｿﾀﾁﾂﾃﾄﾅﾆﾇﾈﾉﾊﾋﾌﾍﾎﾏﾐﾑﾒﾓﾔﾕﾖﾗﾘﾙﾚﾛﾜﾝ"
+RAIN_DIGITOS = "0123456789"
+RAIN_TONOS = ((180, 255, 180), (0, 200, 60), (0, 120, 40), (0, 60, 20))  # cabeza -> cola
+
+def fuente_tiene(font, ch):
+    # Un glifo ausente se pinta como el de relleno (el de U+FFFF)
+    return pygame.image.tobytes(font.render(ch, False, (255,255,255)), "RGB") != \
+           pygame.image.tobytes(font.render("\uffff", False, (255,255,255)), "RGB")
+
 class MatrixRain:
+    # Lluvia en arrays (una columna por gota) pintada con un único blits.
+    # CONFIG["rain_density"] (1-4) reparte 1/4..4/4 de las columnas; CONFIG["rain_glyphs"] usa glifos del atlas
     def __init__(self):
-        self.drops = []
-        cols = int(ANCHO / (15 * FACTOR))
+        self.cfg = None
+        self.atlas = None
+        self.sync()
+
+    def sync(self):
+        cfg = (CONFIG["rain_density"], CONFIG["rain_glyphs"])
+        if cfg == self.cfg: return
+        self.cfg = cfg
+        paso = 15 * FACTOR * 4 / cfg[0]
+        cols = int(ANCHO / paso)
+        self.x = np.arange(cols, dtype=np.float32) * paso
+        self.y = np.random.randint(-ALTO, ALTO, cols).astype(np.float32)
+        self.speed = (np.random.uniform(2, 8, cols) * FACTOR).astype(np.float32)
+        self.len = (np.random.randint(5, 16, cols) * FACTOR).astype(np.float32)
+        self.glyph = np.random.randint(0, 1 << 16, cols)
+        self.orden = np.random.permutation(cols)
         self.trail_surf = pygame.Surface((2*FACTOR, 15*FACTOR))
         self.trail_surf.set_alpha(50)
         self.trail_surf.fill((0, 255, 50))
-        for i in range(cols):
-            self.drops.append({
-                'x': i * 15 * FACTOR, 
-                'y': random.randint(-ALTO, ALTO), 
-                'speed': random.uniform(2, 8) * FACTOR,
-                'len': random.randint(5, 15) * FACTOR 
-            })
-
-    def update(self, s):
-        for d in self.drops:
-            d['y'] += d['speed']
-            if d['y'] > ALTO: 
-                d['y'] = random.randint(-100, -10)
-                d['speed'] = random.uniform(2, 8) * FACTOR
-            pygame.draw.rect(s, (0, 50, 0), (d['x'], d['y'] + d['len'], 2*FACTOR, 2*FACTOR))
-            s.blit(self.trail_surf, (d['x'], d['y']))
+        self.head_surf = pygame.Surface((2*FACTOR, 2*FACTOR))
+        self.head_surf.fill((0, 50, 0))
+        if cfg[1] and self.atlas is None: self.build_atlas()
+
+    def build_atlas(self):
+        # Una tira por tono con todos los glifos; cada glifo es una subsuperficie de la tira
+        font = GFX.font_small
+        chars = RAIN_KATAKANA if fuente_tiene(font, RAIN_KATAKANA[0]) else RAIN_DIGITOS
+        w = max(font.size(c)[0] for c in chars); h = font.get_linesize()
+        atlas = pygame.Surface((w * len(chars), h * len(RAIN_TONOS)), pygame.SRCALPHA)
+        self.glyphs = []
+        for t, color in enumerate(RAIN_TONOS):
+            fila = []
+            for i, c in enumerate(chars):
+                atlas.blit(GFX.text(font, c, True, color), (i * w, t * h))
+                fila.append(atlas.subsurface((i * w, t * h, w, h)))
+            self.glyphs.append(fila)
+        self.atlas, self.glyph_w, self.glyph_h = atlas, w, h
+
+    def update(self, s, dt=1.0):
+        # dt en frames de 60 Hz: la caída no depende de los fps
+        self.sync()
+        self.y += self.speed * dt
+        wrap = np.flatnonzero(self.y > ALTO)
+        if len(wrap):
+            self.y[wrap] = np.random.randint(-100, -10, len(wrap))
+            self.speed[wrap] = np.random.uniform(2, 8, len(wrap)) * FACTOR
+        # El gobernador de calidad apaga columnas en un orden aleatorio fijo (todas siguen cayendo)
+        vis = np.flatnonzero(self.orden < GOBERNADOR.tier["lluvia"] * len(self.orden))
+        xs = self.x[vis].tolist(); ys = self.y[vis].tolist()
+        if self.cfg[1]: self.draw_glyphs(s, xs, ys, vis, dt)
+        else:
+            heads = (self.y[vis] + self.len[vis]).tolist()
+            s.blits([(self.head_surf, (x, hy)) for x, hy in zip(xs, heads)] +
+                    [(self.trail_surf, (x, y)) for x, y in zip(xs, ys)], False)
+            alto = np.maximum(15*FACTOR, self.len[vis] + 2*FACTOR) + 1
+            PRESENTER.mark_many(zip(xs, ys, [2*FACTOR + 1] * len(xs), alto.tolist()))
+
+    def draw_glyphs(self, s, xs, ys, vis, dt=1.0):
+        # Cabeza brillante y cola que se apaga; los glifos cambian cada pocos frames (de 60 Hz)
+        cambia = np.random.random(len(self.glyph)) < 1 - 0.95 ** dt
+        self.glyph[cambia] = np.random.randint(0, 1 << 16, int(cambia.sum()))
+        n, gh = len(self.glyphs[0]), self.glyph_h
+        gl = self.glyph[vis].tolist()
+        lotes = []
+        for t, fila in enumerate(self.glyphs):
+            lotes.extend((fila[(g + t * 7) % n], (x, y - t * gh)) for x, y, g in zip(xs, ys, gl))
+        s.blits(lotes, False)
+        tonos = len(self.glyphs)
+        PRESENTER.mark_many((x, y - (tonos - 1) * gh, self.glyph_w, tonos * gh) for x, y in zip(xs, ys))
+
+SUBPASOS_MAX = 24
+PRED_MARGEN = 40 * FACTOR
+OBS_DINAMICOS = ("movil", "laser", "fantasma", "firewall")
+PRED_PASO = 0.25  # cuantización del vector de arrastre en la predicción
+PRED_HOLGURA = 20 * FACTOR  # distancia libre que permite desplazar un tramo ya simulado
+PRED_STATS = {"completo": 0, "parcial": 0, "desplazado": 0, "pasos": 0}
+SIM_HZ = 60
+
+def swept_toi(x, y, dx, dy, r, rect):
+    # Instante (0..1) en que la caja de la bola, moviéndose (dx, dy), toca rect. None si no lo toca o ya lo solapa
+    lo_x, hi_x = rect.left - r, rect.right + r
+    lo_y, hi_y = rect.top - r, rect.bottom + r
+    if lo_x < x < hi_x and lo_y < y < hi_y: return None
+    t0, t1 = 0.0, 1.0
+    for p, d, lo, hi in ((x, dx, lo_x, hi_x), (y, dy, lo_y, hi_y)):
+        if d == 0:
+            if p <= lo or p >= hi: return None
+            continue
+        a, b = (lo - p) / d, (hi - p) / d
+        if a > b: a, b = b, a
+        if a > t0: t0 = a
+        if b < t1: t1 = b
+        if t0 > t1: return None
+    return t0
+
+class RelojFijo:
+    # Paso fijo de física: acumula el tiempo real y lo reparte en ticks de 1/SIM_HZ
+    def __init__(self, hz=SIM_HZ, max_ticks=5):
+        self.paso = 1000.0 / hz
+        self.max_ticks = max_ticks
+        self.acc = 0.0
+        self.alpha = 1.0
+
+    def avanzar(self, ms):
+        self.acc += ms
+        n = int(self.acc // self.paso)
+        if n > self.max_ticks: n, self.acc = self.max_ticks, 0.0
+        else: self.acc -= n * self.paso
+        self.alpha = self.acc / self.paso
+        return n
 
 class Pelota:
     def __init__(self, x, y):
@@ -451,10 +1202,13 @@ class Pelota:
         self.timestop_max = 100.0
         self.timestop_val = 100.0
         self.timestop_recharge = 0.5
+        self.pred_cache = None
+        self.golpe_jefe = False
         self.reset()
 
     def reset(self):
         self.x, self.y = self.start
+        self.prev_x, self.prev_y = self.x, self.y
         self.vx, self.vy = 0, 0
         self.r = int(11 * FACTOR)
         self.moving = False
@@ -478,21 +1232,23 @@ class Pelota:
         self.vx, self.vy = fx * mult, fy * mult
         self.moving = True; self.grounded = False; self.trail.clear()
         self.bounces = 0; self.touched_wall = False
-        DATOS["total_tiros"] += 1
+        stat_add("total_tiros")
         sound('jump')
 
-    def update(self, obs_list, stars, parts, portals, gravs, powers, drones, bosses, turrets, projectiles, float_texts, dt):
-        global SHAKE_AMPLITUDE
-        
+    def update(self, obs_list, stars, parts, portals, gravs, powers, drones, bosses, turrets, projectiles, float_texts, dt, grid=None, sim=False):
+        # sim=True: misma física sin efectos; se detiene en el primer evento que alteraría el mundo
         if self.ability == "TimeStop":
             if self.timestop_val < self.timestop_max:
                 self.timestop_val += self.timestop_recharge
         
-        if not self.moving: return "nada"
+        if not self.moving:
+            self.prev_x, self.prev_y = self.x, self.y
+            return "nada"
         if self.portal_cd > 0: self.portal_cd -= 1
         self.grounded = False
+        self.golpe_jefe = False  # el jefe recibe como mucho un golpe por tick, no uno por subpaso
         
-        if self.ability == "Magnet":
+        if self.ability == "Magnet" and not sim:
             for s in stars:
                 if s.act:
                     dx, dy = self.x - s.rect.centerx, self.y - s.rect.centery
@@ -500,11 +1256,40 @@ class Pelota:
                     if dist < 250 * FACTOR:
                         s.rect.centerx += (dx/dist) * 5 * FACTOR
                         s.rect.centery += (dy/dist) * 5 * FACTOR
+                        if grid is not None: grid.move(s)
 
+        self.prev_x, self.prev_y = self.x, self.y
         self.vy += 0.45 * FACTOR * dt
-        self.x += self.vx * dt
-        self.y += self.vy * dt
-        
+        # Subpasos: la bola nunca avanza más de un radio sin comprobar colisiones
+        restante = dt
+        for _ in range(SUBPASOS_MAX):
+            if restante <= 1e-6 or not self.moving: break
+            h = self.subpaso(restante, obs_list, grid)
+            self.x += self.vx * h
+            self.y += self.vy * h
+            restante -= h
+            res = self.colisionar(obs_list, stars, parts, portals, gravs, powers, drones, bosses, projectiles, float_texts, h, grid, sim)
+            if res != "nada": return res
+        self.vx *= 0.99
+        return "nada"
+
+    def subpaso(self, restante, obs_list, grid):
+        # Longitud del subpaso: limitada por la velocidad y recortada al primer contacto barrido
+        speed = math.hypot(self.vx, self.vy)
+        h = restante
+        if speed * h > self.r: h = self.r / speed
+        dx, dy = self.vx * h, self.vy * h
+        zona = pygame.Rect(min(self.x, self.x+dx)-self.r, min(self.y, self.y+dy)-self.r, abs(dx)+self.r*2+2, abs(dy)+self.r*2+2)
+        toi = 1.0
+        for o in near(grid, "obs", zona, obs_list):
+            if not o.active_state and o.tipo in ("fantasma", "laser"): continue
+            t = swept_toi(self.x, self.y, dx, dy, self.r, o.rect)
+            if t is not None and t < toi: toi = t
+        if toi < 1.0: h = min(h, h * toi + 1.0 / speed)
+        return h
+
+    def colisionar(self, obs_list, stars, parts, portals, gravs, powers, drones, bosses, projectiles, float_texts, h, grid=None, sim=False):
+        global SHAKE_AMPLITUDE
         if len(self.trail) == 0 or math.hypot(self.x-self.trail[-1][0], self.y-self.trail[-1][1]) > 5*FACTOR:
             self.trail.append((self.x, self.y))
 
@@ -512,38 +1297,44 @@ class Pelota:
             dx = g.x - self.x; dy = g.y - self.y; dist = math.hypot(dx, dy)
             if dist < g.radio * 1.5: 
                 force = (g.fuerza * 2000 * FACTOR) / (dist * dist + 5)
-                self.vx += (dx/dist) * force * dt
-                self.vy += (dy/dist) * force * dt
+                self.vx += (dx/dist) * force * h
+                self.vy += (dy/dist) * force * h
 
         rect = pygame.Rect(self.x-self.r, self.y-self.r, self.r*2, self.r*2)
         if self.portal_cd == 0:
-            for p in portals:
+            for p in near(grid, "portal", rect, portals):
                 if rect.colliderect(p.rect):
                     target = p.link
                     if target:
                         self.x = target.rect.centerx; self.y = target.rect.centery
-                        sound('warp'); self.portal_cd = 30; self.vx *= 1.2; self.vy *= 1.2
-                        spawn_parts(self.x, self.y, p.color, parts)
+                        self.prev_x, self.prev_y = self.x, self.y
+                        self.portal_cd = 30; self.vx *= 1.2; self.vy *= 1.2
+                        if not sim: sound('warp'); spawn_parts(self.x, self.y, p.color, parts)
 
-        for s in stars:
+        for s in near(grid, "star", rect, stars):
             if s.act and rect.colliderect(s.rect):
+                if sim: return "star"
                 s.act = False; sound('coin')
                 spawn_parts(s.rect.centerx, s.rect.centery, COLORES["GOLD"], parts)
                 float_texts.append(FloatingText(s.rect.x, s.rect.y, "+1", COLORES["GOLD"]))
                 return "star"
         
-        for d in drones:
+        for d in near(grid, "drone", rect, drones):
             if math.hypot(self.x - d.x, self.y - d.y) < self.r + 15*FACTOR:
+                if sim: return "die"
                 sound('die'); SHAKE_AMPLITUDE = 20; spawn_parts(self.x, self.y, COLORES["PELIGRO"], parts)
                 return "die"
         
-        for proj in projectiles:
+        for proj in near(grid, "proj", rect, projectiles):
             if rect.colliderect(proj.rect):
+                 if sim: return "die"
                  sound('die'); SHAKE_AMPLITUDE = 20; spawn_parts(self.x, self.y, COLORES["PELIGRO"], parts)
                  return "die"
 
-        for b in bosses:
-            if b.rect.colliderect(rect):
+        for b in near(grid, "boss", rect, bosses):
+            if not self.golpe_jefe and b.rect.colliderect(rect):
+                 if sim: return "boss"
+                 self.golpe_jefe = True
                  if self.ability == "Ghost": pass
                  sound('boss_hit'); SHAKE_AMPLITUDE = 15
                  self.vx *= -1; self.vy *= -1
@@ -556,16 +1347,18 @@ class Pelota:
                  if b.hp <= 0:
                      bosses.remove(b)
                      obs_list.append(Obstaculo(b.rect.x, b.rect.y, b.rect.w, b.rect.h, "meta"))
+                     if grid is not None: grid.remove(b); grid.add("obs", obs_list[-1])
                      sound('win')
 
-        for p in powers:
+        for p in near(grid, "power", rect, powers):
             if p.active and rect.colliderect(p.rect):
+                if sim: return "power"
                 p.active = False; sound('powerup')
                 spawn_parts(p.rect.centerx, p.rect.centery, p.color, parts)
                 if p.type == "ammo": return "ammo"
                 if p.type == "ghost": self.ghost_mode = True; self.skin_c = COLORES["PELIGRO"]
 
-        for o in obs_list:
+        for o in near(grid, "obs", rect, obs_list):
             if o.tipo == "fantasma" and not o.active_state: continue
             
             if o.tipo == "triangle_up":
@@ -573,7 +1366,8 @@ class Pelota:
                     rel_x = self.x - o.rect.x
                     rel_y = self.y - o.rect.y
                     if rel_y > (o.rect.h - rel_x):
-                         sound('hit'); self.touched_wall = True
+                         if not sim: sound('hit')
+                         self.touched_wall = True
                          temp = self.vx
                          self.vx = -self.vy * 0.9
                          self.vy = -temp * 0.9
@@ -582,6 +1376,8 @@ class Pelota:
                          continue
 
             if rect.colliderect(o.rect):
+                if sim and o.tipo in ("meta", "muerte", "firewall"): return "win" if o.tipo == "meta" else "die"
+                if sim and o.tipo == "laser" and o.active_state: return "die"
                 if o.tipo == "meta": 
                     sound('win'); SHAKE_AMPLITUDE = 10
                     if not self.touched_wall: return "swish" 
@@ -593,9 +1389,11 @@ class Pelota:
                 
                 if o.tipo == "laser" and not o.active_state: continue
                 
+                if sim and (o.tipo in ("cristal", "destructible") or (self.ghost_mode and o.tipo in ("pared", "movil", "triangle_up"))): return "rompe"
                 if self.ghost_mode and o.tipo in ["pared", "movil", "cristal", "destructible", "triangle_up"]:
                     if o.tipo in ["cristal", "destructible"]: spawn_parts(o.rect.centerx, o.rect.centery, o.color, parts)
                     o.rect.x = -1000; 
+                    if grid is not None: grid.move(o)
                     if self.ability != "Ghost": 
                         self.ghost_mode = False; 
                         actual_skin = next((s for s in SKINS if s["id"] == DATOS["skin_act"]), SKINS[0])
@@ -607,6 +1405,7 @@ class Pelota:
                     else: sound('break')
                     spawn_parts(o.rect.centerx, o.rect.centery, o.color, parts)
                     o.rect.x = -2000
+                    if grid is not None: grid.move(o)
                     SHAKE_AMPLITUDE = 5
                     self.vx *= 0.8; self.vy *= 0.8 
                     continue
@@ -616,9 +1415,11 @@ class Pelota:
                 h_half = o.rect.h / 2 + self.r
                 
                 if abs(dx) < w_half and abs(dy) < h_half:
-                    sound('hit'); self.touched_wall = True
+                    self.touched_wall = True
                     self.bounces += 1
-                    if math.hypot(self.vx, self.vy) > 10*FACTOR: SHAKE_AMPLITUDE = 5
+                    if not sim:
+                        sound('hit')
+                        if math.hypot(self.vx, self.vy) > 10*FACTOR: SHAKE_AMPLITUDE = 5
                     bounce = 1.3 if o.tipo == "trampolin" else 0.6
                     if self.ability == "Legendary": bounce = 1.1
                     ox = w_half - abs(dx); oy = h_half - abs(dy)
@@ -638,12 +1439,14 @@ class Pelota:
         if self.x < self.r: self.x=self.r; self.vx*=-0.7; self.touched_wall=True
         if self.x > ANCHO-self.r: self.x=ANCHO-self.r; self.vx*=-0.7; self.touched_wall=True
         if self.y < self.r: self.y=self.r; self.vy*=-0.5; self.touched_wall=True
-        if self.y > ALTO+100: sound('die'); SHAKE_AMPLITUDE = 20; return "die"
-        self.vx *= 0.99
+        if self.y > ALTO+100:
+            if not sim: sound('die'); SHAKE_AMPLITUDE = 20
+            return "die"
         return "nada"
 
-    def draw(self, s):
-        points = list(self.trail)
+    def draw(self, s, alpha=1.0):
+        n = GOBERNADOR.tier["estela"]
+        points = list(self.trail)[-n:] if n else []
         if len(points) > 1:
             skin_type = self.ability
             if skin_type == "Legendary":
@@ -652,10 +1455,10 @@ class Pelota:
                     pygame.draw.line(s, color, (px, py), (px, py+5), 2)
             elif skin_type == "TimeStop":
                 for i, (px, py) in enumerate(points):
-                    alpha = int(255 * (i/len(points)))
+                    a = int(255 * (i/len(points)))
                     sz = int(self.r * (i/len(points)))
                     rect_surf = pygame.Surface((sz*2, sz*2), pygame.SRCALPHA)
-                    pygame.draw.rect(rect_surf, (*self.skin_c, alpha), (0,0,sz*2,sz*2), 1)
+                    pygame.draw.rect(rect_surf, (*self.skin_c, a), (0,0,sz*2,sz*2), 1)
                     s.blit(rect_surf, (px-sz, py-sz))
             elif skin_type == "Ghost":
                 for i, (px, py) in enumerate(points):
@@ -674,28 +1477,95 @@ class Pelota:
                     width = int(self.r * (i / len(points)))
                     pygame.draw.line(s, self.skin_c, points[i], points[i+1], width)
 
-        GFX.draw_glow_circle(s, int(self.x), int(self.y), self.r, self.skin_c)
+        # Posición interpolada entre los dos últimos ticks de física
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        y = self.prev_y + (self.y - self.prev_y) * alpha
+        GFX.draw_glow_circle(s, int(x), int(y), self.r, self.skin_c)
 
-    def predict(self, start_vx, start_vy, obstacles):
-        points = []
-        sim_x, sim_y = self.x, self.y; sim_vx, sim_vy = start_vx, start_vy
-        bounces_sim = 0
+    def sonda(self, vx, vy):
+        # Copia de la bola recién lanzada con (vx, vy), para simular sin tocar el estado real
+        p = Pelota.__new__(Pelota); p.__dict__.update(self.__dict__)
+        p.trail = deque(maxlen=1)
+        mult = 1.2 if self.ability == "Power" else 1.0
+        p.vx, p.vy = vx * mult, vy * mult
+        p.moving = True; p.grounded = False; p.bounces = 0; p.touched_wall = False
+        return p
+
+    def cerca_dinamico(self, mundo):
+        # ¿Puede algo que se mueve o cambia de estado alcanzar esta posición en el próximo tick?
+        m = PRED_MARGEN + math.hypot(self.vx, self.vy)
+        zona = pygame.Rect(self.x-self.r-m, self.y-self.r-m, (self.r+m)*2, (self.r+m)*2)
+        for o in near(mundo.grid, "obs", zona, mundo.obs):
+            if o.tipo in OBS_DINAMICOS or o.move_meta:
+                if zona.colliderect(o.rect): return True
+        for kind, items in (("drone", mundo.drones), ("boss", mundo.bosses), ("proj", mundo.projectiles)):
+            for e in near(mundo.grid, kind, zona, items):
+                if zona.colliderect(e.rect): return True
+        return False
+
+    def despejado(self, mundo, x0, y0):
+        # ¿El tramo (x0, y0) -> (x, y) pasa a más de PRED_HOLGURA de todo? Desplazado menos que eso sigue en vuelo libre
+        m = self.r + PRED_HOLGURA
+        lo_x, hi_x, lo_y, hi_y = min(self.x, x0), max(self.x, x0), min(self.y, y0), max(self.y, y0)
+        if lo_x < m or hi_x > ANCHO - m or lo_y < m or hi_y > ALTO + 100 - PRED_HOLGURA: return False
+        zona = pygame.Rect(lo_x - m, lo_y - m, hi_x - lo_x + 2*m, hi_y - lo_y + 2*m)
+        for kind, items in (("obs", mundo.obs), ("star", mundo.stars), ("portal", mundo.portals), ("power", mundo.powers),
+                            ("drone", mundo.drones), ("boss", mundo.bosses), ("proj", mundo.projectiles)):
+            for e in near(mundo.grid, kind, zona, items):
+                if zona.colliderect(e.rect): return False
+        tramo = (hi_x - lo_x) + (hi_y - lo_y)
+        return all(math.hypot(g.x - self.x, g.y - self.y) > g.radio * 1.5 + m + tramo for g in mundo.gravs)
+
+    def predict(self, vx, vy, mundo):
+        # Trayectoria de apuntado con el mismo update que la bola real (sim=True), con el arrastre cuantizado a PRED_PASO.
+        # Mismo vector y mundo: reutiliza el tramo previo al primer objeto dinámico. Vector cercano: el tramo inicial en
+        # vuelo libre (despejado) se desplaza en forma cerrada mientras el desplazamiento no supere PRED_HOLGURA
+        vx, vy = round(vx / PRED_PASO) * PRED_PASO, round(vy / PRED_PASO) * PRED_PASO
         bonus_aim = DATOS["mejoras"]["aim"] * 20
         limit = (100 if self.ability == "Legendary" else 50) + bonus_aim
-        for _ in range(limit): 
-            sim_vy += 0.45 * FACTOR; sim_x += sim_vx; sim_y += sim_vy
-            if sim_x < 0 or sim_x > ANCHO: sim_vx *= -0.7
-            points.append((sim_x, sim_y))
-            r = pygame.Rect(sim_x-5, sim_y-5, 10, 10); hit = False
-            for o in obstacles:
-                if o.tipo not in ["meta", "star", "laser", "firewall"] and r.colliderect(o.rect):
-                    if o.tipo == "fantasma" and not o.active_state: continue
-                    if abs(sim_x - o.rect.centerx) > abs(sim_y - o.rect.centery): sim_vx *= -0.8
-                    else: sim_vy *= -0.8
-                    bounces_sim += 1
-                    hit = True
-                    break 
-            if bounces_sim > (2 if self.ability == "Legendary" else 1): break
+        max_bounces = 2 if self.ability == "Legendary" else 1
+        mult = 1.2 if self.ability == "Power" else 1.0
+        base = (self.x, self.y, self.vx, self.vy, self.moving, self.ability, limit, mundo.version)
+        c = self.pred_cache
+        if c is not None and c["base"] != base: c = None
+        if c is not None and c["v"] == (vx, vy):
+            if c["fijo"] is None: return c["points"]
+            probe = Pelota.__new__(Pelota); probe.__dict__.update(c["estado"]); probe.trail = deque(maxlen=1)
+            points = c["points"][:c["fijo"]]
+            inicio, fijo, estado = c["fijo"], c["fijo"], c["estado"]
+            libre = min(c["libre"], inicio)
+            PRED_STATS["parcial"] += 1
+        else:
+            k = 0
+            if c is not None:
+                # En vuelo libre, tras i+1 ticks: dx = dvx * (1 + 0.99 + ... + 0.99^i), dy = dvy * (i+1)
+                dvx, dvy = (vx - c["v"][0]) * mult, (vy - c["v"][1]) * mult
+                tope = min(c["libre"], len(c["points"]), limit if c["fijo"] is None else c["fijo"])
+                while k < tope and math.hypot(dvx * (1 - 0.99 ** (k+1)) / 0.01, dvy * (k+1)) <= PRED_HOLGURA: k += 1
+            probe = self.sonda(vx, vy)
+            v0x, v0y, cd0 = probe.vx, probe.vy, probe.portal_cd
+            points, fijo, estado = [], None, None
+            for i, (px, py) in enumerate(c["points"][:k] if k else ()):
+                # Estado antes del tick i, para que el tramo desplazado marque también su primer objeto dinámico
+                probe.vx, probe.vy, probe.portal_cd = v0x * 0.99 ** i, v0y + 0.45 * FACTOR * i, max(0, cd0 - i)
+                if fijo is None and probe.cerca_dinamico(mundo):
+                    fijo = i; estado = dict(probe.__dict__)
+                probe.x, probe.y = px + dvx * (1 - 0.99 ** (i+1)) / 0.01, py + dvy * (i+1)
+                points.append((probe.x, probe.y))
+            probe.vx, probe.vy, probe.portal_cd = v0x * 0.99 ** k, v0y + 0.45 * FACTOR * k, max(0, cd0 - k)
+            PRED_STATS["desplazado" if k else "completo"] += 1
+            inicio, libre = k, k
+        for i in range(inicio, limit):
+            if fijo is None and probe.cerca_dinamico(mundo):
+                fijo = i; estado = dict(probe.__dict__)
+            x0, y0 = probe.x, probe.y
+            res = probe.update(mundo.obs, mundo.stars, None, mundo.portals, mundo.gravs, mundo.powers, mundo.drones,
+                               mundo.bosses, mundo.turrets, mundo.projectiles, None, 1.0, mundo.grid, sim=True)
+            points.append((probe.x, probe.y))
+            PRED_STATS["pasos"] += 1
+            if libre == i and res == "nada" and probe.moving and probe.despejado(mundo, x0, y0): libre = i + 1
+            if res != "nada" or not probe.moving or probe.bounces > max_bounces: break
+        self.pred_cache = {"base": base, "v": (vx, vy), "points": points, "fijo": fijo, "estado": estado, "libre": libre}
         return points
 
 class Obstaculo:
@@ -766,8 +1636,14 @@ class Drone:
         self.x, self.y = x, y
         self.speed = 1.5 * FACTOR
         self.timer = 0
+        self.prev = (x, y)
     
+    @property
+    def rect(self):
+        return pygame.Rect(self.x - 15*FACTOR, self.y - 15*FACTOR, 30*FACTOR, 30*FACTOR)
+
     def update(self, target_x, target_y):
+        self.prev = (self.x, self.y)
         self.timer += 1
         if self.timer % 60 == 0: sound('drone') 
         dx, dy = target_x - self.x, target_y - self.y
@@ -776,8 +1652,8 @@ class Drone:
             self.x += (dx/dist) * self.speed
             self.y += (dy/dist) * self.speed
             
-    def draw(self, s):
-        GFX.draw_drone(s, self.x, self.y)
+    def draw(self, s, alpha=1.0):
+        GFX.draw_drone(s, self.prev[0] + (self.x - self.prev[0]) * alpha, self.prev[1] + (self.y - self.prev[1]) * alpha)
 
 class Bullet:
     def __init__(self, x, y, angle):
@@ -786,14 +1662,17 @@ class Bullet:
         self.vy = math.sin(angle) * 5 * FACTOR
         self.rect = pygame.Rect(x, y, 10*FACTOR, 10*FACTOR)
         self.life = 100
+        self.prev = (x, y)
         
     def update(self):
+        self.prev = (self.x, self.y)
         self.x += self.vx; self.y += self.vy
         self.rect.x = int(self.x); self.rect.y = int(self.y)
         self.life -= 1
         
-    def draw(self, s):
-        pygame.draw.circle(s, COLORES["PELIGRO"], (self.rect.centerx, self.rect.centery), 5*FACTOR)
+    def draw(self, s, alpha=1.0):
+        ox = (self.x - self.prev[0]) * (alpha - 1.0); oy = (self.y - self.prev[1]) * (alpha - 1.0)
+        pygame.draw.circle(s, COLORES["PELIGRO"], (int(self.rect.centerx + ox), int(self.rect.centery + oy)), 5*FACTOR)
 
 class Turret:
     def __init__(self, x, y):
@@ -803,9 +1682,9 @@ class Turret:
         
     def update(self, px, py, bullets):
         self.angle = math.atan2(py - self.y, px - self.x)
-        now = pygame.time.get_ticks()
-        if now - self.last_shot > 2500: # Dispara cada 2.5s
-            self.last_shot = now
+        self.last_shot += 1
+        if self.last_shot > 150: # Dispara cada 2.5s (150 frames)
+            self.last_shot = 0
             bullets.append(Bullet(self.x, self.y, self.angle))
             sound('shoot')
             
@@ -816,8 +1695,9 @@ class Turret:
         pygame.draw.line(s, COLORES["TURRET"], (self.x, self.y), (end_x, end_y), 4)
 
 class Boss:
-    def __init__(self, level):
+    def __init__(self, level, seed=0):
         self.type = (level // 10) % 3 
+        self.rng = random.Random(seed)
         self.rect = pygame.Rect(ANCHO//2 - 60*FACTOR, 200*FACTOR, 120*FACTOR, 40*FACTOR)
         self.timer = 0
         self.dir = 1
@@ -836,8 +1716,8 @@ class Boss:
         
         if self.type == 2: 
              if self.timer % 120 == 0:
-                self.rect.x = random.randint(0, int(ANCHO - self.rect.w))
-                self.rect.y = random.randint(100, 300) * FACTOR
+                self.rect.x = self.rng.randint(0, int(ANCHO - self.rect.w))
+                self.rect.y = self.rng.randint(100, 300) * FACTOR
         else:
             target_x = player.x - self.rect.w // 2
             if self.rect.x < target_x: self.rect.x += self.speed
@@ -864,7 +1744,7 @@ class Boss:
         pygame.draw.rect(s, (50, 0, 0), (self.rect.x, self.rect.y - 10*FACTOR, bar_w, bar_h))
         pygame.draw.rect(s, COLORES["PELIGRO"], (self.rect.x, self.rect.y - 10*FACTOR, fill, bar_h))
         
-        t_name = GFX.font_small.render(self.name, True, COLORES["PELIGRO"])
+        t_name = GFX.text(GFX.font_small, self.name, True, COLORES["PELIGRO"])
         s.blit(t_name, (self.rect.centerx - t_name.get_width()//2, self.rect.y - 30*FACTOR))
 
 class PowerUp:
@@ -872,22 +1752,22 @@ class PowerUp:
         self.rect = pygame.Rect(x, y, 30*FACTOR, 30*FACTOR); self.type = type
         self.color = COLORES["POWER_AMMO"] if type == "ammo" else COLORES["POWER_GHOST"]
         self.active = True; self.anim = 0
-    def draw(self, s):
+    def draw(self, s, dt=1.0):
         if self.active:
-            self.anim += 0.1; r = 10 * FACTOR + math.sin(self.anim) * 2
+            self.anim += 0.1 * dt; r = 10 * FACTOR + math.sin(self.anim) * 2
             GFX.draw_glow_circle(s, self.rect.centerx, self.rect.centery, int(r), self.color)
 
 class Star:
     def __init__(self, x, y):
         self.rect = pygame.Rect(x, y, 30*FACTOR, 30*FACTOR); self.act = True; self.rot = 0
-    def draw(self, s):
-        if self.act: self.rot += 2; GFX.draw_star(s, self.rect.centerx, self.rect.centery, 15*FACTOR, COLORES["GOLD"], self.rot)
+    def draw(self, s, dt=1.0):
+        if self.act: self.rot += 2 * dt; GFX.draw_star(s, self.rect.centerx, self.rect.centery, 15*FACTOR, COLORES["GOLD"], self.rot)
 
 class Portal:
     def __init__(self, x, y, color):
         self.rect = pygame.Rect(x, y, 40*FACTOR, 60*FACTOR); self.color = color; self.link = None; self.anim = 0
-    def draw(self, s):
-        self.anim += 0.2
+    def draw(self, s, dt=1.0):
+        self.anim += 0.2 * dt
         cx, cy = self.rect.center
         for i in range(5):
             rad = (self.anim * 5 + i * 10) % 30
@@ -897,8 +1777,8 @@ class Portal:
 class GravityWell:
     def __init__(self, x, y):
         self.x, self.y = x, y; self.radio = 150 * FACTOR; self.fuerza = 5.0; self.anim = 0
-    def draw(self, s):
-        self.anim += 0.2
+    def draw(self, s, dt=1.0):
+        self.anim += 0.2 * dt
         for i in range(6):
             ang = (self.anim + i * 60) * 0.05
             ex = self.x + math.cos(ang) * self.radio
@@ -907,18 +1787,58 @@ class GravityWell:
         pygame.draw.circle(s, (0,0,0), (int(self.x), int(self.y)), int(20*FACTOR))
         pygame.draw.circle(s, COLORES["GRAVEDAD"], (int(self.x), int(self.y)), int(20*FACTOR), 2)
 
-class Particle:
-    def __init__(self, x, y, c, life=30):
-        self.x, self.y, self.c = x, y, c; self.life = life
-        self.vx = random.uniform(-3, 3) * FACTOR; self.vy = random.uniform(-3, 3) * FACTOR
-    def update(self): self.x += self.vx; self.y += self.vy; self.life -= 1
+PARTICULAS_MAX = 4096
+
+class ParticlePool:
+    # Partículas en arrays paralelos de capacidad fija; los huecos muertos se reciclan en O(1)
+    def __init__(self, capacity=PARTICULAS_MAX):
+        self.x = np.zeros(capacity, dtype=np.float32); self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32); self.vy = np.zeros(capacity, dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.int16)
+        self.color = np.zeros(capacity, dtype=np.int16)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))
+        self.palette = []; self.palette_idx = {}
+
+    def __len__(self):
+        return len(self.x) - len(self.free)
+
+    def spawn(self, x, y, c, n=10, life=30):
+        n = min(n, len(self.free))
+        if n <= 0: return
+        idx = self.free[-n:]; del self.free[-n:]
+        c = tuple(c)
+        if c not in self.palette_idx:
+            self.palette_idx[c] = len(self.palette); self.palette.append(c)
+        self.x[idx] = x; self.y[idx] = y
+        self.vx[idx] = np.random.uniform(-3, 3, n) * FACTOR
+        self.vy[idx] = np.random.uniform(-3, 3, n) * FACTOR
+        self.life[idx] = life; self.color[idx] = self.palette_idx[c]; self.alive[idx] = True
+
+    def update(self):
+        self.x += self.vx; self.y += self.vy
+        self.life[self.alive] -= 1
+        dead = np.flatnonzero(self.alive & (self.life <= 0))
+        if len(dead):
+            self.alive[dead] = False
+            self.free.extend(dead.tolist())
+
     def draw(self, s):
-        if self.life > 0: 
-            sz = max(1, int(2 * (self.life/30)))
-            GFX.draw_glow_circle(s, int(self.x), int(self.y), int(3*FACTOR), self.c)
+        idx = np.flatnonzero(self.alive)
+        if not len(idx): return
+        r = int(3*FACTOR)
+        sprites = [GFX.glow_sprite(r, c) for c in self.palette]
+        xs = (self.x[idx] - r*1.25).tolist(); ys = (self.y[idx] - r*1.25).tolist()
+        cs = self.color[idx].tolist()
+        s.blits([(sprites[c], (px, py), None, pygame.BLEND_ADD) for px, py, c in zip(xs, ys, cs)], doreturn=False)
+        PRESENTER.mark((min(xs), min(ys), max(xs) - min(xs) + r*2.5 + 1, max(ys) - min(ys) + r*2.5 + 1))
+
+    def clear(self):
+        self.alive[:] = False
+        self.free = list(range(len(self.x) - 1, -1, -1))
 
 def spawn_parts(x, y, c, l):
-    for _ in range(10): l.append(Particle(x, y, c))
+    l.spawn(x, y, c, GOBERNADOR.tier["parts"])
 
 class WipeEffect:
     def __init__(self):
@@ -927,12 +1847,13 @@ class WipeEffect:
     def start(self):
         self.active = True; self.timer = 0; self.phase = 0
 
-    def update_draw(self, s):
+    def update_draw(self, s, dt=1.0):
+        # dt en frames de 60 Hz: la cortina dura lo mismo a cualquier fps
         if not self.active: return False
         h_half = ALTO // 2
         
         if self.phase == 0: 
-            self.timer += 1; progress = self.timer / self.max_time
+            self.timer += dt; progress = min(1.0, self.timer / self.max_time)
             curr_h = int(h_half * progress)
             pygame.draw.rect(s, (0,0,0), (0, 0, ANCHO, curr_h))
             pygame.draw.line(s, COLORES["NEON"], (0, curr_h), (ANCHO, curr_h), 2)
@@ -941,7 +1862,7 @@ class WipeEffect:
             if progress >= 1.0: self.phase = 1; self.timer = 0; return True 
                 
         elif self.phase == 1: 
-            self.timer += 1; pygame.draw.rect(s, (0,0,0), (0,0,ANCHO,ALTO))
+            self.timer += dt; pygame.draw.rect(s, (0,0,0), (0,0,ANCHO,ALTO))
             pygame.draw.line(s, COLORES["NEON"], (0, h_half), (ANCHO, h_half), 2)
             cx, cy = ANCHO//2, h_half; angle = (pygame.time.get_ticks() * 0.5) % 360
             rect_spinner = pygame.Rect(cx - 30*FACTOR, cy - 30*FACTOR, 60*FACTOR, 60*FACTOR)
@@ -949,7 +1870,7 @@ class WipeEffect:
             if self.timer >= self.wait_time: self.phase = 2; self.timer = 0
                 
         elif self.phase == 2: 
-            self.timer += 1; progress = self.timer / self.max_time
+            self.timer += dt; progress = min(1.0, self.timer / self.max_time)
             curr_h = int(h_half * (1 - progress))
             pygame.draw.rect(s, (0,0,0), (0, 0, ANCHO, curr_h))
             pygame.draw.line(s, COLORES["NEON"], (0, curr_h), (ANCHO, curr_h), 2)
@@ -958,36 +1879,135 @@ class WipeEffect:
             if progress >= 1.0: self.active = False; return False
         return False
 
+# --- BROADPHASE (REJILLA ESPACIAL) ---
+class SpatialHash:
+    # Rejilla uniforme: celda -> {id: (orden, tipo, obj)}. Las consultas devuelven en orden de inserción
+    def __init__(self, cell):
+        self.cell = cell
+        self.cells = {}
+        self.entries = {}  # id(obj) -> [orden, tipo, obj, span, móvil]
+        self.moviles = {}  # solo las entradas móviles: refresh no recorre los obstáculos estáticos
+        self.seq = 0
+
+    def span(self, rect):
+        c = self.cell
+        return (int(rect.left // c), int(rect.top // c), int((rect.right - 1) // c), int((rect.bottom - 1) // c))
+
+    def cells_of(self, span):
+        x0, y0, x1, y1 = span
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1): yield (cx, cy)
+
+    def add(self, kind, obj, moving=False):
+        self.seq += 1
+        span = self.span(obj.rect)
+        e = [self.seq, kind, obj, span, moving]
+        self.entries[id(obj)] = e
+        if moving: self.moviles[id(obj)] = e
+        for k in self.cells_of(span): self.cells.setdefault(k, {})[id(obj)] = e
+
+    def remove(self, obj):
+        e = self.entries.pop(id(obj), None)
+        if e is None: return
+        self.moviles.pop(id(obj), None)
+        for k in self.cells_of(e[3]):
+            bucket = self.cells.get(k)
+            if bucket is not None:
+                bucket.pop(id(obj), None)
+                if not bucket: del self.cells[k]
+
+    def move(self, obj):
+        # Solo se recoloca si cambió el rango de celdas que ocupa
+        e = self.entries.get(id(obj))
+        if e is None: return
+        span = self.span(obj.rect)
+        if span == e[3]: return
+        for k in self.cells_of(e[3]):
+            bucket = self.cells.get(k)
+            if bucket is not None:
+                bucket.pop(id(obj), None)
+                if not bucket: del self.cells[k]
+        e[3] = span
+        for k in self.cells_of(span): self.cells.setdefault(k, {})[id(obj)] = e
+
+    def refresh(self, **sources):
+        # Sincroniza los objetos móviles y las listas que cambian cada frame (balas, drones, jefes).
+        # Solo recorre las entradas móviles: el coste va con lo que se mueve, no con el total
+        for e in list(self.moviles.values()):
+            self.move(e[2])
+        for kind, items in sources.items():
+            ids = set()
+            for obj in items:
+                ids.add(id(obj))
+                if id(obj) not in self.entries: self.add(kind, obj, moving=True)
+            for e in [e for e in self.moviles.values() if e[1] == kind and id(e[2]) not in ids]:
+                self.remove(e[2])
+
+    def query(self, kind, rect):
+        found = {}
+        c, cells = self.cell, self.cells
+        y0, y1 = int(rect.top // c), int((rect.bottom - 1) // c)
+        for cx in range(int(rect.left // c), int((rect.right - 1) // c) + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    for oid, e in bucket.items():
+                        if e[1] == kind: found[oid] = e
+        if len(found) < 2: return [e[2] for e in found.values()]
+        return [e[2] for e in sorted(found.values(), key=lambda e: e[0])]
+
+def near(grid, kind, rect, items):
+    return items if grid is None or not items else grid.query(kind, rect)
+
+def build_grid(obs, stars, portals, powers, drones, bosses):
+    grid = SpatialHash(GRID_CELDA)
+    for o in obs: grid.add("obs", o, moving=(o.tipo in ["movil", "firewall"] or o.move_meta))
+    for st in stars: grid.add("star", st)
+    for p in portals: grid.add("portal", p)
+    for p in powers: grid.add("power", p)
+    for d in drones: grid.add("drone", d, moving=True)
+    for b in bosses: grid.add("boss", b, moving=True)
+    return grid
+
 # --- 6. NIVELES ---
-def make_level(n):
+def level_rng(run_seed, n):
+    # Misma semilla de partida + mismo nivel => mismo trazado
+    return random.Random(f"{run_seed}:{n}")
+
+def iter_level(n, run_seed=0):
+    # Generador: cede el control tras cada objeto para poder construir el nivel por trozos
+    rng = level_rng(run_seed, n)
     obs, stars, portals, gravs, powers, drones, bosses, turrets = [], [], [], [], [], [], [], []
     
     if n % 10 == 0 or n == 50 or n == 100:
-        boss = Boss(n)
+        boss = Boss(n, rng.getrandbits(32))
         bosses.append(boss)
-        return obs, stars, portals, gravs, powers, drones, bosses, turrets
+        yield
+        return obs, stars, portals, gravs, powers, drones, bosses, turrets, build_grid(obs, stars, portals, powers, drones, bosses)
 
-    meta = Obstaculo(random.randint(50, int(ANCHO-100)), 100*FACTOR, 50*FACTOR, 50*FACTOR, "meta")
-    if n > 15 and random.random() < 0.3: meta.move_meta = True
+    meta = Obstaculo(rng.randint(50, int(ANCHO-100)), 100*FACTOR, 50*FACTOR, 50*FACTOR, "meta")
+    if n > 15 and rng.random() < 0.3: meta.move_meta = True
     obs.append(meta)
+    yield
 
-    if n >= 3 and random.random() < 0.5:
-        p1 = Portal(random.randint(50, int(ANCHO-100)), random.randint(200, int(ALTO-300)), COLORES["PORTAL_A"])
-        p2 = Portal(random.randint(50, int(ANCHO-100)), random.randint(200, int(ALTO-300)), COLORES["PORTAL_B"])
+    if n >= 3 and rng.random() < 0.5:
+        p1 = Portal(rng.randint(50, int(ANCHO-100)), rng.randint(200, int(ALTO-300)), COLORES["PORTAL_A"])
+        p2 = Portal(rng.randint(50, int(ANCHO-100)), rng.randint(200, int(ALTO-300)), COLORES["PORTAL_B"])
         p1.link, p2.link = p2, p1; portals.extend([p1, p2])
-    if n >= 5 and random.random() < 0.4: gravs.append(GravityWell(random.randint(100, int(ANCHO-100)), random.randint(200, int(ALTO-300))))
+        yield
+    if n >= 5 and rng.random() < 0.4: gravs.append(GravityWell(rng.randint(100, int(ANCHO-100)), rng.randint(200, int(ALTO-300))))
     
-    if n >= 4 and random.random() < 0.3:
-        drones.append(Drone(random.randint(50, int(ANCHO-50)), random.randint(200, int(ALTO-200))))
+    if n >= 4 and rng.random() < 0.3:
+        drones.append(Drone(rng.randint(50, int(ANCHO-50)), rng.randint(200, int(ALTO-200))))
     
-    if n >= 6 and random.random() < 0.25: 
-         turrets.append(Turret(random.randint(50, int(ANCHO-50)), random.randint(100, int(ALTO-300))))
+    if n >= 6 and rng.random() < 0.25: 
+         turrets.append(Turret(rng.randint(50, int(ANCHO-50)), rng.randint(100, int(ALTO-300))))
 
     count = 3 + n//2
     for i in range(count):
         y = 250*FACTOR + i * (120*FACTOR)
         if y > ALTO - 200*FACTOR: break
-        tipo = "pared"; rnd = random.random()
+        tipo = "pared"; rnd = rng.random()
         if n > 2 and rnd < 0.15: tipo="fantasma"
         elif n > 3 and rnd < 0.30: tipo="laser"
         elif n > 2 and rnd < 0.45: tipo="muerte"
@@ -997,37 +2017,886 @@ def make_level(n):
         elif n > 5 and rnd > 0.85: tipo="destructible" 
         elif n > 8 and rnd > 0.90: tipo="triangle_up"
         
-        w = random.randint(int(100*FACTOR), int(200*FACTOR)); h = int(30*FACTOR)
+        w = rng.randint(int(100*FACTOR), int(200*FACTOR)); h = int(30*FACTOR)
         if tipo == "laser": h = int(10*FACTOR)
         elif tipo == "triangle_up": h = w 
-        x = random.randint(20, int(ANCHO-w-20))
+        x = rng.randint(20, int(ANCHO-w-20))
         obs.append(Obstaculo(x, y, w, h, tipo))
-        if random.random() < 0.5: stars.append(Star(x+w//2-15*FACTOR, y-40*FACTOR))
-        if random.random() < 0.1:
-            ptype = "ammo" if random.random() < 0.7 else "ghost"
+        yield
+        if rng.random() < 0.5: stars.append(Star(x+w//2-15*FACTOR, y-40*FACTOR))
+        if rng.random() < 0.1:
+            ptype = "ammo" if rng.random() < 0.7 else "ghost"
             powers.append(PowerUp(x + w//2, y - 80*FACTOR, ptype))
-    return obs, stars, portals, gravs, powers, drones, bosses, turrets
+    return obs, stars, portals, gravs, powers, drones, bosses, turrets, build_grid(obs, stars, portals, powers, drones, bosses)
+
+def make_level(n, run_seed=0):
+    gen = iter_level(n, run_seed)
+    while True:
+        try: next(gen)
+        except StopIteration as fin: return fin.value
+
+class LevelPrefetch:
+    # Construye niveles por adelantado, unos pocos objetos por frame; entrar al nivel es solo un cambio de referencia
+    def __init__(self):
+        self.jobs = OrderedDict()  # (nivel, semilla) -> [generador, nivel listo o None]
+
+    def request(self, n, run_seed):
+        if (n, run_seed) not in self.jobs: self.jobs[(n, run_seed)] = [iter_level(n, run_seed), None]
+
+    def pump(self, budget=4):
+        for job in self.jobs.values():
+            if job[1] is not None: continue
+            for _ in range(budget):
+                try: next(job[0])
+                except StopIteration as fin:
+                    job[1] = fin.value; break
+            return
+
+    def ready(self, n, run_seed):
+        job = self.jobs.get((n, run_seed))
+        return job is not None and job[1] is not None
+
+    def take(self, n, run_seed):
+        job = self.jobs.pop((n, run_seed), None)
+        self.jobs.clear()
+        if job is None: return make_level(n, run_seed)
+        while job[1] is None:
+            try: next(job[0])
+            except StopIteration as fin: job[1] = fin.value
+        return job[1]
+
+# --- SIMULACION (sin pantalla) ---
+def drag_to_launch(drag_start, pos):
+    # Vector de lanzamiento desde el arrastre; None si el gesto es demasiado corto
+    fx, fy = (drag_start[0]-pos[0])/5.0, (drag_start[1]-pos[1])/5.0
+    if math.hypot(fx,fy) <= 2: return None
+    if math.hypot(fx,fy) > 30*FACTOR: s=(30*FACTOR)/math.hypot(fx,fy); fx*=s; fy*=s
+    return fx, fy
+
+class Partida:
+    # Estado jugable de una partida: nivel, bola, entidades y reglas. No dibuja ni lee input
+    def __init__(self):
+        self.start_coord = (ANCHO//2, ALTO - 150*FACTOR)
+        self.pelota = Pelota(self.start_coord[0], self.start_coord[1])
+        self.obs, self.stars, self.portals, self.gravs, self.powers, self.drones, self.bosses, self.turrets = [], [], [], [], [], [], [], []
+        self.grid = None
+        self.parts = ParticlePool()
+        self.projectiles = []
+        self.float_texts = []
+        self.nivel, self.tiros = 1, 3
+        self.level_timer = 30.0
+        self.time_scale = 1.0
+        self.prefetch = LevelPrefetch()
+        self.version = 0
+        self.asistencia = None
+        self.run_seed = None
+        self.next_run_seed = random.getrandbits(32)
+        self.rng = random.Random()
+        self.prefetch.request(1, self.next_run_seed)
+
+    def nueva_partida(self, seed=None, nivel=1):
+        # Cada partida tiene su semilla; los niveles y el azar del juego se derivan de ella
+        self.run_seed = self.next_run_seed if seed is None else seed
+        self.next_run_seed = level_rng(self.run_seed, "siguiente").getrandbits(32)
+        self.rng = random.Random(self.run_seed)
+        self.cargar_nivel(nivel)
+
+    def cargar_nivel(self, n):
+        self.nivel = n
+        self.pelota.start = self.start_coord; self.pelota.reset()
+        is_boss = (n % 10 == 0)
+        self.tiros = 3 + DATOS["mejoras"]["ammo"] + (12 if is_boss else 0)
+        self.level_timer = 90.0 if is_boss else 30.0
+        self.obs, self.stars, self.portals, self.gravs, self.powers, self.drones, self.bosses, self.turrets, self.grid = self.prefetch.take(n, self.run_seed)
+        self.projectiles = []
+        self.version += 1
+        self.preparar()
+
+    def preparar(self):
+        # Siguiente nivel y, por si se reintenta, el nivel 1 de la próxima partida
+        self.prefetch.request(self.nivel + 1, self.run_seed)
+        self.prefetch.request(1, self.next_run_seed)
+
+    def lanzar(self, fx, fy):
+        self.pelota.launch(fx, fy); self.tiros -= 1
+
+    def predecir(self, drag_start, pos):
+        v = drag_to_launch(drag_start, pos)
+        return self.pelota.predict(v[0], v[1], self) if v else []
+
+    def sugerir(self, drag_start, pos):
+        # Asistencia de apuntado: el lanzamiento ganador más parecido al arrastre actual, o None.
+        # El abanico se simula una vez por posición de la bola y versión del mundo, unos ms por frame.
+        # Solo cuentan los tiros que no cruzan la zona de ningún obstáculo móvil o intermitente: el mundo sigue
+        # avanzando mientras se apunta. Sin asistencia si hay drones, torretas o jefe, que la simulación no modela
+        p = self.pelota
+        v = drag_to_launch(drag_start, pos)
+        if v is None or p.moving or self.drones or self.turrets or self.bosses: return None
+        key = (p.x, p.y, p.ability, self.version)
+        if self.asistencia is None or self.asistencia[0] != key:
+            fx, fy = abanico(ASIST_ANGULOS, ASIST_FUERZAS)
+            self.asistencia = [key, iter_lanzamientos(p, self, fx, fy, ASIST_TICKS), (fx, fy), None]
+        a = self.asistencia
+        limite = time.perf_counter() + ASIST_PRESUPUESTO_MS / 1000
+        while a[3] is None and time.perf_counter() < limite:
+            try: next(a[1])
+            except StopIteration as fin:
+                gana = (fin.value["resultado"] == LOTE_META) & ~fin.value["dinamico"]
+                a[3] = (a[2][0][gana], a[2][1][gana]); break
+        if a[3] is None or not len(a[3][0]): return None
+        fx, fy = a[3]
+        i = int(np.argmin(np.hypot(fx - v[0], fy - v[1])))
+        return fx[i], fy[i]
+
+    def control(self, target_time, apuntando, timestop_held):
+        # Cámara lenta al apuntar en vuelo y con Matrix Time; devuelve (dt, tiempo congelado)
+        freeze_time = False
+        p = self.pelota
+        if timestop_held and p.skin_data["ab"] == "TimeStop":
+            if p.timestop_val > 0:
+                freeze_time = True
+                target_time = 0.2
+                p.timestop_val -= 1.5
+                if pygame.time.get_ticks() % 10 == 0: sound('timestop')
+        if apuntando and p.moving:
+            target_time = 0.2
+        self.time_scale += (target_time - self.time_scale) * 0.1
+        return self.time_scale, freeze_time
+
+    def step(self, dt, freeze_time=False):
+        self.grid.refresh(proj=self.projectiles, drone=self.drones, boss=self.bosses)
+        res = self.pelota.update(self.obs, self.stars, self.parts, self.portals, self.gravs, self.powers, self.drones,
+                                 self.bosses, self.turrets, self.projectiles, self.float_texts, dt, self.grid)
+        PERFIL.vuelta("pelota")
+        if res != "nada": self.version += 1
+        if not freeze_time:
+            self.level_timer -= (1.0/60.0) * dt
+            if self.level_timer <= 0:
+                sound('die')
+                res = "die"
+
+            for o in self.obs: o.update()
+            for d in self.drones: d.update(self.pelota.x, self.pelota.y)
+            for b in self.bosses: b.update(self.pelota, self.projectiles)
+            for t in self.turrets: t.update(self.pelota.x, self.pelota.y, self.projectiles)
+            for pr in self.projectiles[:]:
+                pr.update()
+                if pr.life <= 0: self.projectiles.remove(pr)
+        else:
+            # Tiempo congelado: sin esto el dibujo interpolado seguiría hacia la posición previa
+            for e in self.drones + self.projectiles: e.prev = (e.x, e.y)
+        PERFIL.vuelta("entidades")
+        return res
+
+    def resolver(self, res):
+        # Aplica el resultado del paso; devuelve el siguiente estado ("TRANSITION", "BOSS_WARN", "FAIL") o None
+        if res == "win" or res == "win_combo" or res == "swish":
+            reward_win = 0
+            if res == "win": stat_add("total_victorias")
+            elif res == "win_combo": 
+                 stat_add("total_victorias"); stat_add("estrellas", 2); reward_win = 2
+                 NOTIFIER.add("COMBO X2!")
+            elif res == "swish":
+                 stat_add("total_victorias")
+                 self.tiros += 1; NOTIFIER.add("SWISH: +1 BALA")
+            
+            luck_lvl = DATOS["mejoras"]["luck"]
+            if luck_lvl > 0 and self.rng.random() < (luck_lvl * 0.1): 
+                 stat_add("estrellas", 5)
+                 NOTIFIER.add("SUERTE: BONUS $")
+            
+            io_datos("save")
+            if self.nivel >= DATOS["record"]: DATOS["record"] = self.nivel+1
+            return "BOSS_WARN" if (self.nivel + 1) % 10 == 0 else "TRANSITION"
+        
+        elif res == "die": 
+            stat_add("total_muertes"); io_datos("save")
+            if CONFIG["hardcore"]:
+                self.nivel = 1 
+                DATOS["estrellas"] = max(0, DATOS["estrellas"] - 10)
+            return "FAIL"
+        elif res == "star": stat_add("estrellas"); io_datos("save")
+        elif res == "ammo": self.tiros += 1
+        elif not self.pelota.moving and self.tiros == 0: 
+            stat_add("total_muertes"); io_datos("save")
+            if CONFIG["hardcore"]: self.nivel = 1
+            return "FAIL"
+        return None
+
+def bot_aleatorio(seed=0):
+    # Política simple para pruebas: dispara hacia arriba con ángulo y fuerza al azar
+    rng = random.Random(seed)
+    def policy(juego):
+        if juego.pelota.moving or juego.tiros <= 0: return None
+        ang = rng.uniform(math.pi * 1.1, math.pi * 1.9)
+        fuerza = rng.uniform(10, 30) * FACTOR
+        return math.cos(ang) * fuerza, math.sin(ang) * fuerza
+    return policy
+
+def run_headless(frames, nivel=1, policy=None, seed=0):
+    # Bucle de simulación a máxima velocidad, sin ventana ni audio
+    juego = Partida(); juego.nueva_partida(seed, nivel)
+    resultados = {}
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        if policy is not None:
+            v = policy(juego)
+            if v is not None: juego.lanzar(*v)
+        dt, freeze_time = juego.control(1.0, False, False)
+        res = juego.step(dt, freeze_time)
+        if res != "nada": resultados[res] = resultados.get(res, 0) + 1
+        estado = juego.resolver(res)
+        if estado in ("TRANSITION", "BOSS_WARN"): juego.cargar_nivel(juego.nivel + 1)
+        elif estado == "FAIL": juego.nueva_partida()
+        juego.prefetch.pump()
+        juego.parts.update()
+    wall = time.perf_counter() - t0
+    return {"frames": frames, "segundos": round(wall, 4), "fps": round(frames / wall, 1) if wall else None,
+            "nivel_final": juego.nivel, "resultados": resultados, "resolucion": [ANCHO, ALTO]}
+
+# --- LANZAMIENTOS EN LOTE (numpy) ---
+LOTE_VUELO, LOTE_META, LOTE_MUERTE, LOTE_REPOSO = 0, 1, 2, 3
+LOTE_TICKS = 600
+AIM_ASISTENCIA = len(PRECIOS_MEJORAS)  # nivel de "aim" que desbloquea la asistencia de apuntado
+ASIST_ANGULOS, ASIST_FUERZAS, ASIST_TICKS = 48, 8, 240
+ASIST_PRESUPUESTO_MS = 4  # tiempo por frame para la simulación de asistencia
+ANALISIS_ANGULOS, ANALISIS_FUERZAS = 180, 24
+
+def abanico(n_ang, n_fuerza):
+    # Lanzamientos candidatos: n_ang direcciones x n_fuerza fuerzas dentro del rango de drag_to_launch
+    ang = np.linspace(0, 2 * math.pi, n_ang, endpoint=False)
+    fuerza = np.linspace(2.5, 30 * FACTOR, n_fuerza)
+    a, f = np.meshgrid(ang, fuerza)
+    return (np.cos(a) * f).ravel(), (np.sin(a) * f).ravel()
+
+def swept_toi_lote(x, y, dx, dy, r, caja, validos):
+    # swept_toi para todos los candidatos (filas) contra todas las cajas (columnas); 1.0 si no hay contacto
+    X, Y, DX, DY = x[:, None], y[:, None], dx[:, None], dy[:, None]
+    t0, t1 = np.zeros((len(x), len(caja))), np.ones((len(x), len(caja)))
+    ok = validos.copy()
+    dentro = np.ones_like(ok)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for p, d, lo, hi in ((X, DX, caja[:, 0] - r, caja[:, 0] + caja[:, 2] + r),
+                             (Y, DY, caja[:, 1] - r, caja[:, 1] + caja[:, 3] + r)):
+            entre = (lo < p) & (p < hi)
+            dentro &= entre
+            a, b = (lo - p) / d, (hi - p) / d
+            quieto = d == 0
+            ok &= ~quieto | entre
+            t0 = np.maximum(t0, np.where(quieto, 0.0, np.minimum(a, b)))
+            t1 = np.minimum(t1, np.where(quieto, 1.0, np.maximum(a, b)))
+    ok &= ~dentro & (t0 <= t1)
+    return np.where(ok, t0, 1.0).min(axis=1) if ok.size else np.ones(len(x))
+
+def zona_dinamica(o):
+    # Rectángulo (x, y, w, h) que cubre todas las posiciones que Obstaculo.update puede darle a o
+    x0, y0, x1, y1 = o.rect.left, o.rect.top, o.rect.right, o.rect.bottom
+    if o.tipo == "movil":
+        x0, x1 = min(x0, o.base_x - 104*FACTOR), max(x1, o.base_x + 104*FACTOR + o.rect.w)
+    if o.tipo == "firewall": y1 = ALTO + 200
+    if o.move_meta: x0, x1 = min(x0, 44*FACTOR), max(x1, ANCHO - 94*FACTOR + o.rect.w)
+    return x0, y0, x1 - x0, y1 - y0
+
+def iter_lanzamientos(pelota, mundo, fx, fy, ticks=LOTE_TICKS):
+    # Simula a la vez todos los lanzamientos (fx[i], fy[i]) desde la bola en reposo, con la física de Pelota.update
+    # a dt=1: gravedad, paredes, pozos de gravedad, portales, estrellas y obstáculos (los móviles, láseres y
+    # fantasmas avanzan tick a tick como en step). Subpasos de como mucho un radio, recortados al primer contacto.
+    # Ignora drones, jefes, torretas, proyectiles y power-ups. Cede tras cada tick (como iter_level) y termina
+    # devolviendo un dict de arrays, uno por candidato. "dinamico" marca los que pasan por la zona que algún
+    # obstáculo móvil o intermitente ocupa en cualquier fase, o por un power-up: su resultado depende de cuándo
+    # se lance o de algo que no se modela
+    fx = np.asarray(fx, float); fy = np.asarray(fy, float)
+    n, r = len(fx), pelota.r
+    mult = 1.2 if pelota.ability == "Power" else 1.0
+    ids = np.arange(n)
+    x, y = np.full(n, float(pelota.x)), np.full(n, float(pelota.y))
+    vx, vy = fx * mult, fy * mult
+    cd = np.full(n, pelota.portal_cd)
+    ghost = np.full(n, pelota.ghost_mode)
+    rebotes, pared = np.zeros(n, np.int32), np.zeros(n, bool)
+    dinamico = np.zeros(n, bool)
+    out = {"resultado": np.full(n, LOTE_VUELO, np.int8), "ticks": np.full(n, ticks, np.int32),
+           "estrellas": np.zeros(n, np.int32), "rebotes": rebotes.copy(), "pared": pared.copy(),
+           "dinamico": dinamico.copy(), "x": x.copy(), "y": y.copy()}
+
+    # Obstáculos en columnas; los que cambian con el tiempo se avanzan con copias de su propio update()
+    obs = mundo.obs
+    tipos = [o.tipo for o in obs]
+    es = lambda *t: np.array([tp in t for tp in tipos], bool)
+    meta, muerte, laser, fantasma = es("meta"), es("muerte", "firewall"), es("laser"), es("fantasma")
+    rompible, rampa, trampolin = es("cristal", "destructible"), es("triangle_up"), es("trampolin")
+    atravesable = es("pared", "movil", "cristal", "destructible", "triangle_up")
+    rebote = np.full(len(obs), 1.1) if pelota.ability == "Legendary" else np.where(trampolin, 1.3, 0.6)
+    caja = np.array([(o.rect.x, o.rect.y, o.rect.w, o.rect.h) for o in obs], float).reshape(-1, 4)
+    activo = np.array([o.active_state for o in obs], bool)
+    copias = []
+    for j, o in enumerate(obs):
+        if o.tipo in OBS_DINAMICOS or o.move_meta:
+            c = Obstaculo.__new__(Obstaculo); c.__dict__.update(o.__dict__); c.rect = o.rect.copy()
+            copias.append((j, c))
+    # Los power-ups no se simulan (el fantasma cambia qué paredes atraviesa): su rect también cuenta como zona dinámica
+    zonas = np.array([zona_dinamica(o) for _, o in copias] + [tuple(p.rect) for p in mundo.powers if p.active],
+                     float).reshape(-1, 4)
+    vivo = np.ones((n, len(obs)), bool)  # cristales y paredes rotos por cada candidato
+
+    estrellas = [s.rect for s in mundo.stars if s.act]
+    cogidas = np.zeros((n, len(estrellas)), bool)
+    pozos = [(g.x, g.y, g.radio * 1.5, g.fuerza * 2000 * FACTOR) for g in mundo.gravs]
+    portales = [(p.rect, p.link.rect.centerx, p.link.rect.centery) for p in mundo.portals if p.link]
+
+    def toca(bx, by, rc):
+        # Rect.colliderect de la caja de la bola (x, y truncados como en pygame.Rect) contra rc
+        return (bx < rc[0] + rc[2]) & (rc[0] < bx + 2 * r) & (by < rc[1] + rc[3]) & (rc[1] < by + 2 * r)
+
+    for t in range(ticks):
+        if not len(ids): break
+        m = len(ids)
+        cd[cd > 0] -= 1
+        vy += 0.45 * FACTOR
+        fin = np.zeros(m, np.int8)  # LOTE_META / LOTE_MUERTE, o -1 si cogió una estrella (acaba el tick)
+        quieta = np.zeros(m, bool)
+        restante = np.ones(m)
+        cx, cy = caja[:, 0] + caja[:, 2] // 2, caja[:, 1] + caja[:, 3] // 2
+        solido = activo | ~(fantasma | laser)
+        for _ in range(SUBPASOS_MAX):
+            # Cada candidato avanza como mucho un radio por subpaso, con su propia velocidad (como Pelota.subpaso)
+            sigue = (fin == 0) & ~quieta & (restante > 1e-6)
+            if not sigue.any(): break
+            speed = np.maximum(np.hypot(vx, vy), 1e-9)
+            hs = np.where(sigue, np.minimum(restante, r / speed), 0.0)
+            if len(obs):
+                toi = swept_toi_lote(x, y, vx * hs, vy * hs, r, caja, vivo & solido)
+                hs = np.where(toi < 1.0, np.minimum(hs, hs * toi + 1.0 / speed), hs)
+            restante -= hs
+            x += vx * hs; y += vy * hs
+
+            for gx, gy, alcance, f in pozos:
+                dx, dy = gx - x, gy - y
+                dist = np.maximum(np.hypot(dx, dy), 1e-9)
+                k = np.where(sigue & (dist < alcance), f / (dist * dist + 5) * hs / dist, 0.0)
+                vx += dx * k; vy += dy * k
+
+            # La caja se calcula una vez por subpaso, igual que en colisionar
+            bx, by = np.trunc(x - r), np.trunc(y - r)
+            if len(zonas): dinamico |= sigue & toca(bx[:, None], by[:, None], zonas.T).any(axis=1)
+            listos = sigue & (cd == 0)
+            for rc, tx, ty in portales:
+                k = listos & toca(bx, by, rc)
+                x[k], y[k] = tx, ty; cd[k] = 30; vx[k] *= 1.2; vy[k] *= 1.2
+
+            for s, rc in enumerate(estrellas):
+                k = sigue & (fin == 0) & ~cogidas[:, s] & toca(bx, by, rc)
+                cogidas[k, s] = True; fin[k] = -1
+
+            if len(obs):
+                choque = toca(bx[:, None], by[:, None], caja.T) & vivo & solido & sigue[:, None]
+                for j in np.nonzero(choque.any(axis=0))[0]:
+                    k = choque[:, j] & (fin == 0)
+                    if rampa[j]:
+                        sube = k & (y - caja[j, 1] > caja[j, 3] - (x - caja[j, 0]))
+                        pared[sube] = True
+                        vx[sube], vy[sube] = -vy[sube] * 0.9, -vx[sube] * 0.9
+                        x[sube] -= 5 * FACTOR; y[sube] -= 5 * FACTOR
+                        k &= ~sube
+                    if meta[j]: fin[k] = LOTE_META; continue
+                    if muerte[j] or laser[j]: fin[k] = LOTE_MUERTE; continue
+                    if atravesable[j]:
+                        g = k & ghost
+                        vivo[g, j] = False
+                        if pelota.ability != "Ghost": ghost[g] = False
+                        k &= ~g
+                    if rompible[j]:
+                        vivo[k, j] = False; vx[k] *= 0.8; vy[k] *= 0.8
+                        continue
+                    dx, dy = x - cx[j], y - cy[j]
+                    w_half, h_half = caja[j, 2] / 2 + r, caja[j, 3] / 2 + r
+                    k &= (np.abs(dx) < w_half) & (np.abs(dy) < h_half)
+                    if not k.any(): continue
+                    pared[k] = True; rebotes[k] += 1
+                    ox, oy = w_half - np.abs(dx), h_half - np.abs(dy)
+                    lado = k & (ox < oy)
+                    x[lado] += np.where(dx > 0, ox, -ox)[lado]; vx[lado] *= -rebote[j]
+                    vert = k & ~lado
+                    y[vert] += np.where(dy > 0, oy, -oy)[vert]
+                    para = vert & (dy < 0) & (vy > 0) & (vy < 3.0 * FACTOR) & (not trampolin[j])
+                    vx[para] = 0; vy[para] = 0; quieta |= para
+                    vy[vert & ~para] *= -rebote[j]
+
+            k = sigue & (fin == 0)
+            a = k & (x < r); x[a] = r; vx[a] *= -0.7; pared |= a
+            a = k & (x > ANCHO - r); x[a] = ANCHO - r; vx[a] *= -0.7; pared |= a
+            a = k & (y < r); y[a] = r; vy[a] *= -0.5; pared |= a
+            fin[k & (y > ALTO + 100)] = LOTE_MUERTE
+
+        vx[fin == 0] *= 0.99
+        hecho = (fin > 0) | quieta
+        if hecho.any():
+            i = ids[hecho]
+            out["resultado"][i] = np.where(fin[hecho] > 0, fin[hecho], LOTE_REPOSO)
+            out["ticks"][i] = t + 1
+            for clave, v in (("estrellas", cogidas[hecho].sum(axis=1)), ("rebotes", rebotes[hecho]),
+                             ("pared", pared[hecho]), ("dinamico", dinamico[hecho]), ("x", x[hecho]), ("y", y[hecho])):
+                out[clave][i] = v
+            sigue = ~hecho
+            ids, x, y, vx, vy, cd, ghost, rebotes, pared, dinamico = (
+                a[sigue] for a in (ids, x, y, vx, vy, cd, ghost, rebotes, pared, dinamico))
+            vivo, cogidas = vivo[sigue], cogidas[sigue]
+
+        for j, c in copias:
+            c.update()
+            caja[j] = c.rect.x, c.rect.y, c.rect.w, c.rect.h
+            activo[j] = c.active_state
+        yield
+
+    # Los que siguen en vuelo al agotar los ticks
+    for clave, v in (("estrellas", cogidas.sum(axis=1)), ("rebotes", rebotes), ("pared", pared),
+                     ("dinamico", dinamico), ("x", x), ("y", y)):
+        out[clave][ids] = v
+    return out
+
+def simular_lanzamientos(pelota, mundo, fx, fy, ticks=LOTE_TICKS):
+    gen = iter_lanzamientos(pelota, mundo, fx, fy, ticks)
+    while True:
+        try: next(gen)
+        except StopIteration as fin: return fin.value
+
+def analizar_niveles(desde, cuantos, seed=0, n_ang=ANALISIS_ANGULOS, n_fuerza=ANALISIS_FUERZAS, ticks=LOTE_TICKS):
+    # Resumen por nivel del abanico completo de lanzamientos desde la posición inicial
+    juego = Partida(); juego.nueva_partida(seed, desde)
+    fx, fy = abanico(n_ang, n_fuerza)
+    informe = []
+    for nivel in range(desde, desde + cuantos):
+        if nivel != juego.nivel: juego.cargar_nivel(nivel)
+        t0 = time.perf_counter()
+        r = simular_lanzamientos(juego.pelota, juego, fx, fy, ticks)
+        wall = time.perf_counter() - t0
+        res = r["resultado"]
+        fila = {"nivel": nivel, "candidatos": len(fx), "segundos": round(wall, 4),
+                "meta_estable": round(float(((res == LOTE_META) & ~r["dinamico"]).mean()), 4),
+                "estrellas": sum(1 for s in juego.stars if s.act), "estrellas_max": int(r["estrellas"].max())}
+        for nombre, code in (("meta", LOTE_META), ("muerte", LOTE_MUERTE), ("reposo", LOTE_REPOSO), ("vuelo", LOTE_VUELO)):
+            fila[nombre] = round(float((res == code).mean()), 4)
+        gana = np.nonzero(res == LOTE_META)[0]
+        if len(gana):
+            # Mejor tiro: más estrellas y, a igualdad, el que llega antes
+            i = gana[np.lexsort((r["ticks"][gana], -r["estrellas"][gana]))[0]]
+            fila["mejor"] = [round(float(fx[i]), 3), round(float(fy[i]), 3)]
+        informe.append(fila)
+        juego.prefetch.pump()
+    return informe
+
+class Grabadora:
+    # Entradas que alteran la simulación, por número de frame de main(): ticks de física de cada frame
+    # (RLE), arrastre (D/U con coordenadas), botón derecho de TimeStop (T), cambios de estado (E, incluye
+    # pausar y reanudar), partidas (S: semilla, nivel y datos que afectan a la física) y niveles (N).
+    # Los resultados de cada paso (R) y el estado final sirven para comprobar la reproducción.
+    def __init__(self):
+        self.activa = False
+
+    def iniciar(self, juego, estado):
+        self.activa = True
+        self.juego = juego
+        self.f = -1
+        self.ticks = []
+        self.eventos, self.resultados = [], []
+        self.derecho, self.estado_act = False, estado
+        self.cabecera = {"v": 1, "res": [ANCHO, ALTO], "hz": SIM_HZ, "estado": estado, "datos": datos_fisica()}
+
+    def frame(self, ticks):
+        if not self.activa: return
+        self.f += 1
+        if self.ticks and self.ticks[-1][0] == ticks: self.ticks[-1][1] += 1
+        else: self.ticks.append([ticks, 1])
+
+    def anotar(self, tipo, *datos):
+        if self.activa: self.eventos.append([self.f, tipo, *datos])
+
+    def boton(self, derecho):
+        if self.activa and derecho != self.derecho:
+            self.derecho = derecho
+            self.anotar("T", int(derecho))
+
+    def estado(self, estado):
+        if self.activa and estado != self.estado_act:
+            self.estado_act = estado
+            self.anotar("E", estado)
+
+    def partida(self, juego):
+        self.anotar("S", juego.run_seed, juego.nivel, datos_fisica())
+
+    def resultado(self, res):
+        if self.activa and res != "nada": self.resultados.append([self.f, res])
+
+    def guardar(self, ruta):
+        datos = dict(self.cabecera, ticks=self.ticks, eventos=self.eventos, resultados=self.resultados,
+                     final=estado_final(self.juego))
+        with open(ruta, "wb") as f: f.write(zlib.compress(json.dumps(datos, separators=(",", ":")).encode()))
+        return ruta
+
+GRABADORA = Grabadora()
+
+def datos_fisica():
+    # Lo guardado que cambia la simulación: munición, suerte, habilidad de la skin y modo hardcore
+    return {"mejoras": dict(DATOS["mejoras"]), "skin": DATOS["skin_act"], "hardcore": CONFIG["hardcore"]}
+
+def estado_final(juego):
+    p = juego.pelota
+    return {"nivel": juego.nivel, "tiros": juego.tiros, "x": p.x, "y": p.y, "vx": p.vx, "vy": p.vy,
+            "timer": juego.level_timer}
+
+def ruta_grabacion():
+    return os.path.join(os.path.dirname(ARCHIVO_SAVE), f"replay_{datetime.now():%Y%m%d_%H%M%S}.mdr")
+
+def run_replay(ruta):
+    # Repite una grabación sin pantalla con el mismo orden que main(): controles de todos los ticks del
+    # frame, arrastre, pasos de física hasta el primer cambio de estado y, al final, partidas/niveles/estado
+    with open(ruta, "rb") as f: datos = json.loads(zlib.decompress(f.read()))
+    if datos["res"] != [ANCHO, ALTO]:
+        raise ValueError(f"grabación a {datos['res'][0]}x{datos['res'][1]}; usar MATRIX_RES={datos['res'][0]}x{datos['res'][1]}")
+    def aplicar(d):
+        DATOS["mejoras"].update(d["mejoras"]); DATOS["skin_act"] = d["skin"]; CONFIG["hardcore"] = d["hardcore"]
+    aplicar(datos["datos"])
+    juego = Partida()
+    por_frame = {}
+    for ev in datos["eventos"]: por_frame.setdefault(ev[0], []).append(ev[1:])
+    estado, drag, derecho = datos["estado"], None, False
+    resultados = []
+    f = 0
+    t0 = time.perf_counter()
+    for ticks, veces in datos["ticks"]:
+        for _ in range(veces):
+            evs = por_frame.get(f, ())
+            for ev in evs:
+                if ev[0] == "T": derecho = bool(ev[1])
+            pasos = []
+            if estado != "PAUSA":
+                objetivo = 0.1 if estado in ("WIN", "FAIL") else 1.0
+                pasos = [juego.control(objetivo, estado == "JUEGO" and drag, derecho) for _ in range(ticks)]
+            for ev in evs:
+                if ev[0] == "D": drag = (ev[1], ev[2])
+                elif ev[0] == "U":
+                    v = drag_to_launch(drag, (ev[1], ev[2]))
+                    if v: juego.lanzar(*v)
+                    drag = None
+            if estado == "JUEGO":
+                for dt, freeze in pasos:
+                    res = juego.step(dt, freeze)
+                    if res != "nada": resultados.append([f, res])
+                    siguiente = juego.resolver(res)
+                    if siguiente: estado = siguiente; break
+            for ev in evs:
+                if ev[0] == "S": aplicar(ev[3]); juego.nueva_partida(ev[1], ev[2])
+                elif ev[0] == "N": juego.cargar_nivel(ev[1])
+                elif ev[0] == "E": estado = ev[1]
+            juego.prefetch.pump()
+            f += 1
+    wall = time.perf_counter() - t0
+    esperados = datos["resultados"]
+    divergencia = next(([i, a, b] for i, (a, b) in enumerate(zip(esperados, resultados)) if a != b), None)
+    if divergencia is None and len(esperados) != len(resultados):
+        n = min(len(esperados), len(resultados))
+        divergencia = [n, esperados[n] if n < len(esperados) else None, resultados[n] if n < len(resultados) else None]
+    final = estado_final(juego)
+    return {"frames": f, "ticks": sum(t * v for t, v in datos["ticks"]), "segundos": round(wall, 4),
+            "resultados": len(resultados), "identico": divergencia is None and final == datos["final"],
+            "divergencia": divergencia, "final": final, "final_grabado": datos["final"]}
 
 # --- 7. UI ---
+class DirtyPresenter:
+    # Pantallas casi estáticas: la rejilla de fondo se congela en una copia y solo se suben a pantalla
+    # los rectángulos que cambian (lluvia, títulos glitch, hover, avisos, partículas)
+    ESTATICAS = ("MENU", "STATS", "INFO", "TIENDA", "UPGRADES", "AJUSTES")
+
+    def __init__(self):
+        self.fondo = None
+        self.estado = None
+        self.rects, self.prev = [], []
+        self.hover = {}
+        self.parcial = False
+        self.stats = {"full": 0, "parcial": 0}
+
+    def activo(self, estado):
+        return CONFIG["dirty_rects"] and estado in self.ESTATICAS
+
+    def begin(self, estado, surf):
+        # True si el fondo sale de la copia congelada; False si hay que pintarlo (y luego capture)
+        self.rects = []
+        self.estado = estado
+        if not self.activo(estado):
+            self.fondo = None
+            return False
+        if self.fondo is None: return False
+        surf.blit(self.fondo, (0, 0))
+        return True
+
+    def capture(self, surf, estado):
+        if self.activo(estado): self.fondo = surf.copy()
+
+    def mark(self, rect):
+        self.rects.append(rect)
+
+    def mark_many(self, rects):
+        self.rects.extend(rects)
+
+    def mark_hover(self, r, hover):
+        key = (r.x, r.y, r.w, r.h)
+        if self.hover.get(key) != hover:
+            self.hover[key] = hover
+            self.mark(r.inflate(4, 4))
+
+    def present(self, surf, pantalla, offset, estado, forzar):
+        # Volcado completo al cambiar de pantalla, con clic o temblor; si no, solo los rectángulos sucios
+        if self.parcial and not forzar and self.activo(estado) and self.fondo is not None:
+            rects = [pantalla.blit(surf, r, r) for r in self.rects + self.prev]
+            pygame.display.update(rects)
+            self.stats["parcial"] += 1
+        else:
+            pantalla.fill((0,0,0))
+            pantalla.blit(surf, offset)
+            pygame.display.flip()
+            self.stats["full"] += 1
+        self.prev = self.rects
+        # El siguiente frame solo puede ser parcial si este no fue forzado (un clic dibuja botones dos
+        # veces), no movió la pantalla y no cambió de estado a mitad
+        self.parcial = not forzar and self.activo(estado) and self.fondo is not None and estado == self.estado
+
+PRESENTER = DirtyPresenter()
+
+def draw_debug(s):
+    # Capa de depuración (F3): nivel de calidad del gobernador y carga del frame
+    g = GOBERNADOR
+    lineas = [f"CALIDAD: {g.tier['n']}{'' if CONFIG['calidad_auto'] else ' (FIJA)'}",
+              f"p90 {g.p90:.1f}/{g.presupuesto:.1f} ms  FPS {RELOJ.get_fps():.0f}"]
+    y = 5
+    for txt in lineas:
+        t = GFX.text(GFX.font_small, txt, True, COLORES["NEON"])
+        s.blit(t, (5, y)); PRESENTER.mark((5, y, t.get_width(), t.get_height()))
+        y += t.get_height()
+
 def btn(s, r, txt):
     hover = r.collidepoint(pygame.mouse.get_pos())
-    c = COLORES["META"] if hover else COLORES["NEON"]
-    GFX.draw_neon_rect(s, r, c, fill=hover)
-    t = GFX.font_ui.render(txt, True, (0,0,0) if hover else c)
-    s.blit(t, (r.centerx-t.get_width()//2, r.centery-t.get_height()//2))
+    PRESENTER.mark_hover(r, hover)
+    s.blit(GFX.button_sprite(r.w, r.h, txt, hover), (r.x - 2, r.y - 2))
     return r
 
+class Pantalla:
+    # Pantalla retenida. El contenido estático se pinta una vez en una capa recortada y solo se rehace
+    # cuando cambia clave(); los botones salen de sprites cacheados y hit() resuelve el clic sin dibujar.
+    # botones: (id, rect, texto); texto None = zona clicable sin dibujo propio
+    def __init__(self, botones, estatico=None, clave=None):
+        self.botones = [(bid, pygame.Rect(r), txt) for bid, r, txt in botones]
+        self.estatico = estatico
+        self.clave = clave
+        self.capa, self.capa_rect, self.capa_key = None, None, None
+
+    def draw(self, surf):
+        if self.estatico is not None:
+            key = self.clave() if self.clave else None
+            if self.capa is None or key != self.capa_key:
+                self.rebuild(key)
+            surf.blit(self.capa, self.capa_rect)
+        for bid, r, txt in self.botones:
+            if txt is not None: btn(surf, r, txt)
+
+    def rebuild(self, key):
+        capa = pygame.Surface((ANCHO, ALTO), pygame.SRCALPHA)
+        self.estatico(capa)
+        r = capa.get_bounding_rect()
+        if self.capa_rect is not None: PRESENTER.mark(self.capa_rect)
+        PRESENTER.mark(r)
+        self.capa, self.capa_rect, self.capa_key = capa.subsurface(r).copy(), r, key
+        UI_STATS["rebuilds"] += 1
+
+    def hit(self, pos):
+        for bid, r, txt in self.botones:
+            if r.collidepoint(pos): return bid
+        return None
+
+UI_STATS = {"rebuilds": 0}
+MEJORAS_UI = [
+    ("ammo", "CARGADOR", "Balas extra al iniciar"),
+    ("aim", "LASER", "Mejor prediccion (MAX: asistencia)"),
+    ("luck", "SUERTE", "Chance de doble recompensa")
+]
+
+def construir_pantallas(tut_texts, tut):
+    # Layout de los menús, calculado una vez. tut["actual"] es la página visible del tutorial
+    cx, cy = ANCHO//2, ALTO//2
+    F = FACTOR
+    volver_60 = ("VOLVER", (cx-60*F, ALTO-60*F, 120*F, 50*F), "VOLVER")
+    volver_80 = ("VOLVER", (cx-60*F, ALTO-80*F, 120*F, 50*F), "VOLVER")
+    r_hc = pygame.Rect(cx + 120*F, cy-80*F, 80*F, 50*F)
+
+    def menu_estatico(s):
+        hc_col = COLORES["PELIGRO"] if CONFIG["hardcore"] else (50,50,50)
+        pygame.draw.rect(s, hc_col, r_hc, border_radius=5)
+        t_hc = GFX.text(GFX.font_small, "HARD", True, COLORES["BLANCO"])
+        s.blit(t_hc, (r_hc.centerx-t_hc.get_width()//2, r_hc.centery-t_hc.get_height()//2))
+
+    def tutorial_estatico(s):
+        t = GFX.text(GFX.font_big, "TUTORIAL", True, COLORES["NEON"]); s.blit(t, (cx-t.get_width()//2, 30*F))
+        r_text = pygame.Rect(cx-150*F, 380*F, 300*F, 200*F)
+        pygame.draw.rect(s, (0,20,20), r_text, border_radius=5)
+        pygame.draw.rect(s, COLORES["NEON"], r_text, 2, border_radius=5)
+        for i, l in enumerate(tut_texts[tut["actual"]]):
+            txt = GFX.text(GFX.font_small, l, True, COLORES["BLANCO"])
+            s.blit(txt, (r_text.centerx - txt.get_width()//2, r_text.y + 20*F + i*30*F))
+
+    def r_compra(i):
+        r = pygame.Rect(cx-180*F, 120*F + i*100*F, 360*F, 80*F)
+        return r, pygame.Rect(r.right-100*F, r.centery-20*F, 80*F, 40*F)
+
+    def mejoras_estatico(s):
+        t = GFX.text(GFX.font_big, "SISTEMA", True, COLORES["NEON"]); s.blit(t, (cx-t.get_width()//2, 30*F))
+        t2 = GFX.text(GFX.font_ui, f"CREDITOS: {DATOS['estrellas']}", True, COLORES["GOLD"]); s.blit(t2, (cx-t2.get_width()//2, 70*F))
+        for i, (key, name, desc) in enumerate(MEJORAS_UI):
+            lvl = DATOS["mejoras"][key]
+            cost = PRECIOS_MEJORAS[lvl] if lvl < len(PRECIOS_MEJORAS) else "MAX"
+            r, r_btn = r_compra(i)
+            pygame.draw.rect(s, (0,20,20), r, border_radius=5)
+            pygame.draw.rect(s, COLORES["PORTAL_B"], r, 2, border_radius=5)
+            t_name = GFX.text(GFX.font_ui, f"{name} [LVL {lvl}]", True, COLORES["BLANCO"])
+            s.blit(t_name, (r.x+20*F, r.y+10*F))
+            t_desc = GFX.text(GFX.font_small, desc, True, (150,150,150))
+            s.blit(t_desc, (r.x+20*F, r.y+40*F))
+            btn_txt = "MAX" if cost == "MAX" else f"${cost}"
+            col_btn = COLORES["GOLD"] if cost != "MAX" and DATOS["estrellas"] >= cost else (100,100,100)
+            pygame.draw.rect(s, col_btn, r_btn, border_radius=5)
+            t_cost = GFX.text(GFX.font_ui, str(btn_txt), True, (0,0,0))
+            s.blit(t_cost, (r_btn.centerx-t_cost.get_width()//2, r_btn.centery-t_cost.get_height()//2))
+
+    def r_skin(i):
+        return pygame.Rect(cx-180*F, 120*F + i*75*F, 360*F, 65*F)
+
+    def tienda_estatico(s):
+        t = GFX.text(GFX.font_big, "TIENDA", True, COLORES["META"]); s.blit(t, (cx-t.get_width()//2, 30*F))
+        t2 = GFX.text(GFX.font_ui, f"CREDITOS: {DATOS['estrellas']}", True, COLORES["GOLD"]); s.blit(t2, (cx-t2.get_width()//2, 70*F))
+        for i, sk in enumerate(SKINS[:6]):
+            r = r_skin(i)
+            owned = sk["id"] in DATOS["skins"]; usando = sk["id"] == DATOS["skin_act"]
+            pygame.draw.rect(s, (0,30,0), r, border_radius=5)
+            color_borde = COLORES["NEON"] if owned else COLORES["PELIGRO"]
+            if sk["id"] == 99: color_borde = (255, 255, 255)
+            pygame.draw.rect(s, color_borde, r, 2, border_radius=5)
+            GFX.draw_glow_circle(s, r.x+35*F, r.centery, 15*F, sk["c"])
+            name = sk["n"]
+            if sk["id"] == 99: name = "???" if not owned else "THE ONE"
+            t_name = GFX.text(GFX.font_ui, name, True, COLORES["BLANCO"])
+            s.blit(t_name, (r.x+70*F, r.y + 10*F))
+            desc = sk["desc"]
+            if sk["id"] == 99 and not owned: desc = "Recompensa dia 7"
+            t_desc = GFX.text(GFX.font_small, desc, True, (150,150,150))
+            s.blit(t_desc, (r.x+70*F, r.y + 35*F))
+            status = "USANDO" if usando else ("TIENES" if owned else f"${sk['p']}")
+            t_stat = GFX.text(GFX.font_ui, status, True, COLORES["GOLD"] if not owned else COLORES["META"])
+            s.blit(t_stat, (r.right - t_stat.get_width() - 10, r.centery - t_stat.get_height()//2))
+
+    y_mus, y_sfx, y_rain, y_glif = 120*F, 200*F, 280*F, 350*F
+    r_glif = pygame.Rect(cx + 50*F, y_glif, 90*F, 30*F)
+
+    def ajustes_estatico(s):
+        t = GFX.text(GFX.font_big, "AJUSTES", True, COLORES["NEON"]); s.blit(t, (cx-t.get_width()//2, 30*F))
+        for y, nombre, key, col in ((y_mus, "MUSICA", "vol_musica", COLORES["PORTAL_B"]), (y_sfx, "EFECTOS", "vol_sfx", COLORES["PORTAL_A"])):
+            t_v = GFX.text(GFX.font_ui, f"{nombre}: {CONFIG[key]}", True, COLORES["BLANCO"])
+            s.blit(t_v, (cx - 150*F, y))
+            pygame.draw.rect(s, (50,50,50), (cx-150*F, y+35*F, 290*F, 10*F))
+            pygame.draw.rect(s, col, (cx-150*F, y+35*F, 29*F*CONFIG[key], 10*F))
+        t_r = GFX.text(GFX.font_ui, f"LLUVIA: {CONFIG['rain_density']*25}%", True, COLORES["BLANCO"])
+        s.blit(t_r, (cx - 150*F, y_rain))
+        t_g = GFX.text(GFX.font_ui, "GLIFOS", True, COLORES["BLANCO"])
+        s.blit(t_g, (cx - 150*F, y_glif))
+        pygame.draw.rect(s, COLORES["NEON"] if CONFIG["rain_glyphs"] else (50,50,50), r_glif, border_radius=5)
+        t_on = GFX.text(GFX.font_small, "ON" if CONFIG["rain_glyphs"] else "OFF", True, COLORES["BLANCO"])
+        s.blit(t_on, (r_glif.centerx-t_on.get_width()//2, r_glif.centery-t_on.get_height()//2))
+
+    def pausa_estatico(s):
+        t = GFX.text(GFX.font_big, "PAUSA", True, COLORES["BLANCO"]); s.blit(t, (cx-t.get_width()//2, cy-80*F))
+
+    def fin_estatico(ok):
+        def draw(s):
+            msg = "HACKEO COMPLETADO" if ok else "ERROR SISTEMA"
+            c = COLORES["NEON"] if ok else COLORES["PELIGRO"]
+            GFX.draw_neon_rect(s, pygame.Rect(cx-150*F, cy-100*F, 300*F, 250*F), c, True)
+            t = GFX.text(GFX.font_big, msg, True, COLORES["BLANCO"]); s.blit(t, (cx-t.get_width()//2, cy-80*F))
+        return draw
+
+    r_medio = (cx-100*F, cy, 200*F, 50*F); r_medio2 = (cx-100*F, cy+60*F, 200*F, 50*F)
+    return {
+        "MENU": Pantalla([
+            ("JUGAR", (cx-100*F, cy-80*F, 200*F, 50*F), "JUGAR"),
+            ("TIENDA", (cx-100*F, cy-10*F, 200*F, 50*F), "TIENDA"),
+            ("UPGRADES", (cx-100*F, cy+60*F, 200*F, 50*F), "MEJORAS"),
+            ("STATS", (cx-100*F, cy+130*F, 95*F, 50*F), "STATS"),
+            ("AJUSTES", (cx+5*F, cy+130*F, 95*F, 50*F), "AJUSTES"),
+            ("CALENDAR_VIEW", (cx-100*F, cy+200*F, 95*F, 50*F), "DIARIO"),
+            ("TUTORIAL", (cx+5*F, cy+200*F, 95*F, 50*F), "TUTORIAL"),
+            ("SALIR", (cx-100*F, cy+270*F, 200*F, 50*F), "SALIR"),
+            ("INFO", (ANCHO-60*F, ALTO-60*F, 40*F, 40*F), "i"),
+            ("HARD", r_hc, None)], menu_estatico, lambda: CONFIG["hardcore"]),
+        "TUTORIAL": Pantalla([
+            ("BASICO", (cx-100*F, 150*F, 200*F, 50*F), "BASICO"),
+            ("OBSTACULOS", (cx-100*F, 220*F, 200*F, 50*F), "OBSTACULOS"),
+            ("JEFES", (cx-100*F, 290*F, 200*F, 50*F), "JEFES"),
+            volver_80], tutorial_estatico, lambda: tut["actual"]),
+        "UPGRADES": Pantalla([(key, r_compra(i)[1], None) for i, (key, _, _) in enumerate(MEJORAS_UI)] + [volver_60],
+            mejoras_estatico, lambda: (DATOS["estrellas"], tuple(DATOS["mejoras"].values()))),
+        "STATS": Pantalla([volver_80], draw_stats,
+            lambda: (DATOS["total_victorias"], DATOS["total_muertes"], DATOS["total_tiros"], DATOS["record"], DATOS["estrellas"])),
+        "INFO": Pantalla([volver_80], draw_info),
+        "TIENDA": Pantalla([(sk["id"], r_skin(i), None) for i, sk in enumerate(SKINS[:6])] + [volver_60],
+            tienda_estatico, lambda: (DATOS["estrellas"], tuple(DATOS["skins"]), DATOS["skin_act"])),
+        "AJUSTES": Pantalla([
+            ("mus-", (cx + 50*F, y_mus, 40*F, 30*F), "-"), ("mus+", (cx + 100*F, y_mus, 40*F, 30*F), "+"),
+            ("sfx-", (cx + 50*F, y_sfx, 40*F, 30*F), "-"), ("sfx+", (cx + 100*F, y_sfx, 40*F, 30*F), "+"),
+            ("rain-", (cx + 50*F, y_rain, 40*F, 30*F), "-"), ("rain+", (cx + 100*F, y_rain, 40*F, 30*F), "+"),
+            ("glifos", r_glif, None),
+            volver_80], ajustes_estatico, lambda: (CONFIG["vol_musica"], CONFIG["vol_sfx"], CONFIG["rain_density"], CONFIG["rain_glyphs"])),
+        "CALENDAR_VIEW": Pantalla([volver_80]),
+        "PAUSA": Pantalla([("SEGUIR", r_medio, "SEGUIR"), ("MENU", r_medio2, "MENU")], pausa_estatico),
+        "WIN": Pantalla([("SIGUIENTE", r_medio, "SIGUIENTE"), ("MENU", r_medio2, "MENU")], fin_estatico(True)),
+        "FAIL": Pantalla([("REINTENTAR", r_medio, "REINTENTAR"), ("MENU", r_medio2, "MENU")], fin_estatico(False)),
+    }
+
+def dibujar_partida(s, juego, alpha, ticks, dt=1.0):
+    # Entidades del nivel y la bola, interpoladas con alpha; los textos flotantes avanzan un paso por tick
+    # y las animaciones decorativas con dt (tiempo del frame en frames de 60 Hz)
+    for g in juego.gravs: g.draw(s, dt)
+    PERFIL.vuelta("d_gravs")
+    for p in juego.portals: p.draw(s, dt)
+    PERFIL.vuelta("d_portales")
+    for p in juego.powers: p.draw(s, dt)
+    PERFIL.vuelta("d_powers")
+    for t in juego.turrets: t.draw(s)
+    PERFIL.vuelta("d_torretas")
+    for pr in juego.projectiles: pr.draw(s, alpha)
+    PERFIL.vuelta("d_proyectiles")
+    for o in juego.obs: o.draw(s)
+    PERFIL.vuelta("d_obs")
+    for st in juego.stars: st.draw(s, dt)
+    PERFIL.vuelta("d_estrellas")
+    for d in juego.drones: d.draw(s, alpha)
+    PERFIL.vuelta("d_drones")
+    for b in juego.bosses: b.draw(s)
+    PERFIL.vuelta("d_jefes")
+    for ft in juego.float_texts[:]:
+        for _ in range(ticks): ft.update()
+        ft.draw(s)
+        if ft.life <= 0: juego.float_texts.remove(ft)
+    PERFIL.vuelta("d_textos")
+    juego.pelota.draw(s, alpha)
+    PERFIL.vuelta("d_pelota")
+
 def draw_stats(s):
-    t_title = GFX.font_big.render("HACKER STATS", True, COLORES["META"])
+    t_title = GFX.text(GFX.font_big, "HACKER STATS", True, COLORES["META"])
     s.blit(t_title, (ANCHO//2 - t_title.get_width()//2, 80*FACTOR))
     stats = [f"VICTORIAS: {DATOS['total_victorias']}", f"MUERTES: {DATOS['total_muertes']}",
              f"TIROS: {DATOS['total_tiros']}", f"RECORD NIVEL: {DATOS['record']}", f"ESTRELLAS: {DATOS['estrellas']}"]
     for i, stat in enumerate(stats):
-        t = GFX.font_ui.render(stat, True, COLORES["BLANCO"])
+        t = GFX.text(GFX.font_ui, stat, True, COLORES["BLANCO"])
         s.blit(t, (ANCHO//2 - t.get_width()//2, 200*FACTOR + i*50*FACTOR))
 
 def draw_info(s):
-    t_title = GFX.font_big.render("INFORMACION", True, COLORES["NEON"])
+    t_title = GFX.text(GFX.font_big, "INFORMACION", True, COLORES["NEON"])
     s.blit(t_title, (ANCHO//2 - t_title.get_width()//2, 50*FACTOR))
     
     lines = ["CREADOR: LECAHI", "CO-PILOT: GROK", 
@@ -1035,13 +2904,13 @@ def draw_info(s):
              "MUSIC PRODUCED BY GEMINI", "VER: V56.2 FINAL HUD FIX"]
     for i, l in enumerate(lines):
         c = COLORES["GOLD"] if "LECAHI" in l or "GEMINI" in l else COLORES["BLANCO"]
-        t = GFX.font_ui.render(l, True, c)
+        t = GFX.text(GFX.font_ui, l, True, c)
         s.blit(t, (ANCHO//2 - t.get_width()//2, 150*FACTOR + i*40*FACTOR))
 
     r_msg = pygame.Rect(ANCHO//2 - 180*FACTOR, ALTO - 200*FACTOR, 360*FACTOR, 60*FACTOR)
     pygame.draw.rect(s, (0, 30, 0), r_msg)
     pygame.draw.rect(s, COLORES["META"], r_msg, 2)
-    msg = GFX.font_small.render("MUCHAS GRACIAS POR PROBAR MI JUEGO", True, COLORES["META"])
+    msg = GFX.text(GFX.font_small, "MUCHAS GRACIAS POR PROBAR MI JUEGO", True, COLORES["META"])
     s.blit(msg, (r_msg.centerx - msg.get_width()//2, r_msg.centery - msg.get_height()//2))
 
 def check_daily_reward():
@@ -1066,6 +2935,7 @@ def check_daily_reward():
 def main():
     global SHAKE_AMPLITUDE
     estado = "MENU"
+    sync_logros()
     
     daily_status = check_daily_reward()
     if daily_status["active"]:
@@ -1074,28 +2944,34 @@ def main():
 
     rain = MatrixRain()
     wipe = WipeEffect()
-    start_coord = (ANCHO//2, ALTO - 150*FACTOR)
-    pelota = Pelota(start_coord[0], start_coord[1])
-    obs, stars, parts, portals, gravs, powers, drones, bosses, turrets = [], [], [], [], [], [], [], [], []
-    projectiles = []
-    float_texts = []
-    nivel, tiros, drag_start = 1, 3, None
-    time_scale = 1.0
+    GFX.build_grid()
+    juego = Partida()
+    pelota = juego.pelota
+    drag_start = None
     timer_warn = 0 
-    level_timer = 30.0
     
     tut_texts = {
         "BASICO": ["Arrastra el mouse/dedo para apuntar", "Suelta para disparar", "Llega a la meta (Azul)"],
         "OBSTACULOS": ["Verde: Rebote", "Rojo: Muerte", "Cristal: Se rompe", "Triangulo: Rampa", "Portal: Teletransporte"],
         "JEFES": ["Aparecen cada 10 niveles", "Tienen mucha vida", "Te disparan", "Municion extra en combate"]
     }
-    current_tut = "BASICO"
+    tut = {"actual": "BASICO"}
+    ui = construir_pantallas(tut_texts, tut)
     
     GAME_SURF = pygame.Surface((ANCHO, ALTO))
+    reloj_sim = RelojFijo()
+    if "--grabar" in sys.argv or os.environ.get("MATRIX_GRABAR") == "1": GRABADORA.iniciar(juego, estado)
     
+    if os.environ.get("MATRIX_PERFIL") == "1": PERFIL.alternar()
     running = True
     while running:
+        PERFIL.frame()
+        ticks = reloj_sim.avanzar(RELOJ.get_time())
+        dt_anim = min(RELOJ.get_time(), 100) / reloj_sim.paso  # animaciones decorativas, en frames de 60 Hz
+        GRABADORA.frame(ticks)
         AUDIO.update_music()
+        GUARDADO.pump()
+        juego.prefetch.pump(4 if estado == "TRANSITION" else 1)
         
         target_time = 1.0
         if estado == "WIN" or estado == "FAIL":
@@ -1103,48 +2979,48 @@ def main():
         
         freeze_time = False
         is_paused = (estado == "PAUSA")
-        
+        pasos = []
+        derecho = pygame.mouse.get_pressed()[2]
+        GRABADORA.boton(derecho)
         if not is_paused:
-             if pygame.mouse.get_pressed()[2] and pelota.skin_data["ab"] == "TimeStop":
-                if pelota.timestop_val > 0: 
-                    freeze_time = True
-                    target_time = 0.2
-                    pelota.timestop_val -= 1.5 
-                    if pygame.time.get_ticks() % 10 == 0: sound('timestop')
-        
-             if estado == "JUEGO" and drag_start and pelota.moving:
-                target_time = 0.2 
-        
-             time_scale += (target_time - time_scale) * 0.1 
-        
-        dt = time_scale if not is_paused else 0
-
-        GAME_SURF.fill(COLORES["BG"])
-        
-        if not is_paused: 
-            GFX.draw_cyber_grid(GAME_SURF, pelota.y) 
-            rain.update(GAME_SURF)
+            for _ in range(ticks):
+                pasos.append(juego.control(target_time, estado == "JUEGO" and drag_start, derecho))
+            if pasos: freeze_time = pasos[-1][1]
+        PERFIL.vuelta("logica")
+
+        if not PRESENTER.begin(estado, GAME_SURF):
+            GAME_SURF.fill(COLORES["BG"])
+            if not is_paused: GFX.draw_cyber_grid(GAME_SURF, pelota.y)
+            PRESENTER.capture(GAME_SURF, estado)
+        if not is_paused: rain.update(GAME_SURF, dt_anim)
+        PERFIL.vuelta("fondo")
 
         mx, my = pygame.mouse.get_pos()
         click = False
         for e in pygame.event.get():
             if e.type == pygame.QUIT: running = False
+            if e.type == pygame.APP_WILLENTERBACKGROUND:
+                GUARDADO.flush()
+                if GRABADORA.activa: GRABADORA.guardar(ruta_grabacion())
+            if e.type == pygame.KEYDOWN and e.key == pygame.K_F3: CONFIG["debug"] = not CONFIG["debug"]
+            if e.type == pygame.KEYDOWN and e.key == pygame.K_F4: PERFIL.alternar()
+            if e.type == pygame.KEYDOWN and e.key == pygame.K_F5 and PERFIL.n:
+                NOTIFIER.add("PERFIL: " + os.path.basename(PERFIL.dump_csv(ruta_perfil())))
             if e.type == pygame.MOUSEBUTTONDOWN:
                 if e.button == 1: 
                     click = True
-                    if estado == "JUEGO" and not pelota.moving and tiros > 0: drag_start = (mx, my)
-                    elif estado == "JUEGO" and pelota.moving and tiros > 0: drag_start = (mx, my)
+                    if estado == "JUEGO" and not pelota.moving and juego.tiros > 0: drag_start = (mx, my); GRABADORA.anotar("D", mx, my)
+                    elif estado == "JUEGO" and pelota.moving and juego.tiros > 0: drag_start = (mx, my); GRABADORA.anotar("D", mx, my)
 
             if e.type == pygame.MOUSEBUTTONUP:
                 if e.button == 1 and estado == "JUEGO" and drag_start:
-                    fx, fy = (drag_start[0]-mx)/5.0, (drag_start[1]-my)/5.0
-                    if math.hypot(fx,fy) > 2:
-                        if math.hypot(fx,fy) > 30*FACTOR: s=(30*FACTOR)/math.hypot(fx,fy); fx*=s; fy*=s
-                        pelota.launch(fx, fy); tiros -= 1
+                    GRABADORA.anotar("U", mx, my)
+                    v = drag_to_launch(drag_start, (mx, my))
+                    if v: juego.lanzar(*v)
                     drag_start = None
+        PERFIL.vuelta("eventos")
 
         cx, cy = ANCHO//2, ALTO//2
-        check_achievements()
         
         if estado == "BOSS_WARN":
             GAME_SURF.fill((0,0,0))
@@ -1153,8 +3029,9 @@ def main():
             
             GFX.draw_glitch_title(GAME_SURF, "WARNING: BOSS", cx-200*FACTOR, cy-50*FACTOR, color=(255,0,0))
             
-            if timer_warn % 60 == 0: sound('alarm')
-            timer_warn -= 1
+            for _ in range(ticks):
+                if timer_warn % 60 == 0: sound('alarm')
+                timer_warn -= 1
             if timer_warn <= 0:
                 wipe.start()
                 estado = "TRANSITION"
@@ -1178,253 +3055,107 @@ def main():
 
                 pygame.draw.rect(GAME_SURF, c_bg, r_box, border_radius=int(5*FACTOR))
                 pygame.draw.rect(GAME_SURF, c_b, r_box, 2, border_radius=int(5*FACTOR))
-                t_day = GFX.font_small.render(f"DIA {dia}", True, COLORES["BLANCO"])
+                t_day = GFX.text(GFX.font_small, f"DIA {dia}", True, COLORES["BLANCO"])
                 GAME_SURF.blit(t_day, (r_box.centerx - t_day.get_width()//2, r_box.y + 10*FACTOR))
                 
                 rew_txt = "SKIN+50" if dia == 7 else f"+{dia+1} $"
                 col_rew = COLORES["PELIGRO"] if dia==7 else COLORES["GOLD"]
-                t_rew = GFX.font_ui.render(rew_txt, True, col_rew)
+                t_rew = GFX.text(GFX.font_ui, rew_txt, True, col_rew)
                 GAME_SURF.blit(t_rew, (r_box.centerx - t_rew.get_width()//2, r_box.centery))
 
                 if estado == "REWARD" and dia == streak and click and r_box.collidepoint((mx, my)):
                     DATOS["last_login"] = datetime.now().strftime("%Y-%m-%d")
-                    if streak == 7: DATOS["estrellas"] += 50; 
+                    if streak == 7: stat_add("estrellas", 50)
                     if 99 not in DATOS["skins"]: DATOS["skins"].append(99)
-                    else: DATOS["estrellas"] += (streak + 1)
+                    else: stat_add("estrellas", streak + 1)
                     io_datos("save"); sound('achieve'); estado = "MENU"
             
             if estado == "CALENDAR_VIEW":
-                 if click and btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-80*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER").collidepoint((mx,my)): estado="MENU"; sound('ui')
-                 else: btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-80*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER")
+                 ui["CALENDAR_VIEW"].draw(GAME_SURF)
+                 if click and ui["CALENDAR_VIEW"].hit((mx,my)) == "VOLVER": estado="MENU"; sound('ui')
 
 
         elif estado == "MENU":
             GFX.draw_glitch_title(GAME_SURF, "MATRIX DUNK", cx-200*FACTOR, 50*FACTOR)
-            r_play = pygame.Rect(cx-100*FACTOR, cy-80*FACTOR, 200*FACTOR, 50*FACTOR)
-            r_shop = pygame.Rect(cx-100*FACTOR, cy-10*FACTOR, 200*FACTOR, 50*FACTOR)
-            r_upg = pygame.Rect(cx-100*FACTOR, cy+60*FACTOR, 200*FACTOR, 50*FACTOR)
-            
-            r_stat = pygame.Rect(cx-100*FACTOR, cy+130*FACTOR, 95*FACTOR, 50*FACTOR)
-            r_conf = pygame.Rect(cx+5*FACTOR, cy+130*FACTOR, 95*FACTOR, 50*FACTOR)
-            
-            r_daily = pygame.Rect(cx-100*FACTOR, cy+200*FACTOR, 95*FACTOR, 50*FACTOR)
-            r_tut = pygame.Rect(cx+5*FACTOR, cy+200*FACTOR, 95*FACTOR, 50*FACTOR)
-
-            r_exit = pygame.Rect(cx-100*FACTOR, cy+270*FACTOR, 200*FACTOR, 50*FACTOR)
-            r_info = pygame.Rect(ANCHO-60*FACTOR, ALTO-60*FACTOR, 40*FACTOR, 40*FACTOR)
-            
-            r_hc = pygame.Rect(cx + 120*FACTOR, cy-80*FACTOR, 80*FACTOR, 50*FACTOR)
-            hc_col = COLORES["PELIGRO"] if CONFIG["hardcore"] else (50,50,50)
-            pygame.draw.rect(GAME_SURF, hc_col, r_hc, border_radius=5)
-            t_hc = GFX.font_small.render("HARD", True, COLORES["BLANCO"])
-            GAME_SURF.blit(t_hc, (r_hc.centerx-t_hc.get_width()//2, r_hc.centery-t_hc.get_height()//2))
-            if click and r_hc.collidepoint((mx,my)):
+            ui["MENU"].draw(GAME_SURF)
+            hit = ui["MENU"].hit((mx,my)) if click else None
+            if hit == "HARD":
                 CONFIG["hardcore"] = not CONFIG["hardcore"]
                 sound('ui')
-
-            if click:
-                if btn(GAME_SURF, r_play, "JUGAR").collidepoint((mx,my)):
-                    estado="JUEGO"; nivel=1; 
-                    tiros = 3 + DATOS["mejoras"]["ammo"]
-                    level_timer = 30.0
-                    pelota.start=start_coord; pelota.reset(); 
-                    obs, stars, portals, gravs, powers, drones, bosses, turrets = make_level(nivel); 
-                    projectiles = []
-                    AUDIO.mode = "EXPLORE"
-                    sound('ui')
-                if btn(GAME_SURF, r_shop, "TIENDA").collidepoint((mx,my)): estado="TIENDA"; sound('ui')
-                if btn(GAME_SURF, r_upg, "MEJORAS").collidepoint((mx,my)): estado="UPGRADES"; sound('ui')
-                if btn(GAME_SURF, r_stat, "STATS").collidepoint((mx,my)): estado="STATS"; sound('ui')
-                if btn(GAME_SURF, r_conf, "AJUSTES").collidepoint((mx,my)): estado="AJUSTES"; sound('ui')
-                if btn(GAME_SURF, r_daily, "DIARIO").collidepoint((mx,my)): estado="CALENDAR_VIEW"; sound('ui')
-                if btn(GAME_SURF, r_tut, "TUTORIAL").collidepoint((mx,my)): estado="TUTORIAL"; sound('ui')
-                if btn(GAME_SURF, r_exit, "SALIR").collidepoint((mx,my)): running=False
-                if btn(GAME_SURF, r_info, "i").collidepoint((mx,my)): estado="INFO"; sound('ui')
-            else:
-                btn(GAME_SURF, r_play, "JUGAR"); btn(GAME_SURF, r_shop, "TIENDA")
-                btn(GAME_SURF, r_upg, "MEJORAS"); 
-                btn(GAME_SURF, r_stat, "STATS"); btn(GAME_SURF, r_conf, "AJUSTES")
-                btn(GAME_SURF, r_daily, "DIARIO"); btn(GAME_SURF, r_tut, "TUTORIAL")
-                btn(GAME_SURF, r_exit, "SALIR")
-                btn(GAME_SURF, r_info, "i")
+            elif hit == "JUGAR":
+                estado="JUEGO"
+                juego.nueva_partida(); GRABADORA.partida(juego)
+                AUDIO.mode = "EXPLORE"
+                sound('ui')
+            elif hit == "SALIR": running=False
+            elif hit is not None: estado=hit; sound('ui')
 
         elif estado == "TUTORIAL":
-            t = GFX.font_big.render("TUTORIAL", True, COLORES["NEON"]); GAME_SURF.blit(t, (cx-t.get_width()//2, 30*FACTOR))
-            
-            if click:
-                if btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, 150*FACTOR, 200*FACTOR, 50*FACTOR), "BASICO").collidepoint((mx,my)): current_tut = "BASICO"
-                if btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, 220*FACTOR, 200*FACTOR, 50*FACTOR), "OBSTACULOS").collidepoint((mx,my)): current_tut = "OBSTACULOS"
-                if btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, 290*FACTOR, 200*FACTOR, 50*FACTOR), "JEFES").collidepoint((mx,my)): current_tut = "JEFES"
-            else:
-                btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, 150*FACTOR, 200*FACTOR, 50*FACTOR), "BASICO")
-                btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, 220*FACTOR, 200*FACTOR, 50*FACTOR), "OBSTACULOS")
-                btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, 290*FACTOR, 200*FACTOR, 50*FACTOR), "JEFES")
-
-            r_text = pygame.Rect(cx-150*FACTOR, 380*FACTOR, 300*FACTOR, 200*FACTOR)
-            pygame.draw.rect(GAME_SURF, (0,20,20), r_text, border_radius=5)
-            pygame.draw.rect(GAME_SURF, COLORES["NEON"], r_text, 2, border_radius=5)
-            
-            lines = tut_texts[current_tut]
-            for i, l in enumerate(lines):
-                txt = GFX.font_small.render(l, True, COLORES["BLANCO"])
-                GAME_SURF.blit(txt, (r_text.centerx - txt.get_width()//2, r_text.y + 20*FACTOR + i*30*FACTOR))
-
-            if click and btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-80*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER").collidepoint((mx,my)): estado="MENU"; sound('ui')
-            else: btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-80*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER")
+            ui["TUTORIAL"].draw(GAME_SURF)
+            hit = ui["TUTORIAL"].hit((mx,my)) if click else None
+            if hit == "VOLVER": estado="MENU"; sound('ui')
+            elif hit is not None: tut["actual"] = hit
 
         elif estado == "UPGRADES":
-            t = GFX.font_big.render("SISTEMA", True, COLORES["NEON"]); GAME_SURF.blit(t, (cx-t.get_width()//2, 30*FACTOR))
-            t2 = GFX.font_ui.render(f"CREDITOS: {DATOS['estrellas']}", True, COLORES["GOLD"]); GAME_SURF.blit(t2, (cx-t2.get_width()//2, 70*FACTOR))
-
-            upgrades_list = [
-                ("ammo", "CARGADOR", "Balas extra al iniciar"),
-                ("aim", "LASER", "Mejor prediccion de tiro"),
-                ("luck", "SUERTE", "Chance de doble recompensa")
-            ]
-            
-            start_y = 120 * FACTOR
-            for i, (key, name, desc) in enumerate(upgrades_list):
-                lvl = DATOS["mejoras"][key]
+            ui["UPGRADES"].draw(GAME_SURF)
+            hit = ui["UPGRADES"].hit((mx,my)) if click else None
+            if hit == "VOLVER": estado="MENU"; sound('ui')
+            elif hit is not None:
+                lvl = DATOS["mejoras"][hit]
                 cost = PRECIOS_MEJORAS[lvl] if lvl < len(PRECIOS_MEJORAS) else "MAX"
-                r = pygame.Rect(cx-180*FACTOR, start_y + i*100*FACTOR, 360*FACTOR, 80*FACTOR)
-                pygame.draw.rect(GAME_SURF, (0,20,20), r, border_radius=5)
-                pygame.draw.rect(GAME_SURF, COLORES["PORTAL_B"], r, 2, border_radius=5)
-                
-                t_name = GFX.font_ui.render(f"{name} [LVL {lvl}]", True, COLORES["BLANCO"])
-                GAME_SURF.blit(t_name, (r.x+20*FACTOR, r.y+10*FACTOR))
-                t_desc = GFX.font_small.render(desc, True, (150,150,150))
-                GAME_SURF.blit(t_desc, (r.x+20*FACTOR, r.y+40*FACTOR))
-                
-                btn_txt = "MAX" if cost == "MAX" else f"${cost}"
-                r_btn = pygame.Rect(r.right-100*FACTOR, r.centery-20*FACTOR, 80*FACTOR, 40*FACTOR)
-                col_btn = COLORES["GOLD"] if cost != "MAX" and DATOS["estrellas"] >= cost else (100,100,100)
-                pygame.draw.rect(GAME_SURF, col_btn, r_btn, border_radius=5)
-                t_cost = GFX.font_ui.render(str(btn_txt), True, (0,0,0))
-                GAME_SURF.blit(t_cost, (r_btn.centerx-t_cost.get_width()//2, r_btn.centery-t_cost.get_height()//2))
-                
-                if click and r_btn.collidepoint((mx,my)) and cost != "MAX" and DATOS["estrellas"] >= cost:
+                if cost != "MAX" and DATOS["estrellas"] >= cost:
                     DATOS["estrellas"] -= cost
-                    DATOS["mejoras"][key] += 1
+                    DATOS["mejoras"][hit] += 1
                     io_datos("save")
                     sound('powerup')
 
-            if click and btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-60*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER").collidepoint((mx,my)): estado="MENU"; sound('ui')
-            else: btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-60*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER")
-
-        elif estado == "STATS":
-            draw_stats(GAME_SURF)
-            if click and btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-80*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER").collidepoint((mx,my)): estado="MENU"; sound('ui')
-            else: btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-80*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER")
-
-        elif estado == "INFO":
-            draw_info(GAME_SURF)
-            if click and btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-80*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER").collidepoint((mx,my)): estado="MENU"; sound('ui')
-            else: btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-80*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER")
+        elif estado in ("STATS", "INFO"):
+            ui[estado].draw(GAME_SURF)
+            if click and ui[estado].hit((mx,my)) == "VOLVER": estado="MENU"; sound('ui')
 
         elif estado == "TRANSITION":
             # TRANSICION SHUTTER
-            if wipe.update_draw(GAME_SURF):
-                nivel += 1; pelota.start = start_coord; pelota.reset(); 
-                
-                base_ammo = 3 + DATOS["mejoras"]["ammo"]
-                is_boss = (nivel % 10 == 0)
-                
-                if is_boss: 
-                    tiros = base_ammo + 12 
-                    level_timer = 90.0 
-                else:
-                    tiros = base_ammo
-                    level_timer = 30.0
-                
-                obs, stars, portals, gravs, powers, drones, bosses, turrets = make_level(nivel)
-                projectiles = []
+            if wipe.update_draw(GAME_SURF, dt_anim):
+                juego.cargar_nivel(juego.nivel + 1); GRABADORA.anotar("N", juego.nivel)
                 estado = "JUEGO"
 
         elif estado == "JUEGO":
-            res = pelota.update(obs, stars, parts, portals, gravs, powers, drones, bosses, turrets, projectiles, float_texts, dt)
-            
-            if not freeze_time and not is_paused:
-                level_timer -= (1.0/60.0) * dt
-                if level_timer <= 0:
-                    sound('die')
-                    res = "die"
-
-                for o in obs: o.update()
-                for d in drones: d.update(pelota.x, pelota.y)
-                for b in bosses: b.update(pelota, projectiles)
-                for t in turrets: t.update(pelota.x, pelota.y, projectiles)
-                for pr in projectiles[:]:
-                    pr.update()
-                    if pr.life <= 0: projectiles.remove(pr)
-            
-            if res == "win" or res == "win_combo" or res == "swish":
-                reward_win = 0
-                if res == "win": DATOS["total_victorias"] += 1; 
-                elif res == "win_combo": 
-                     DATOS["total_victorias"] += 1; DATOS["estrellas"] += 2; reward_win = 2
-                     NOTIFIER.add("COMBO X2!")
-                elif res == "swish":
-                     DATOS["total_victorias"] += 1; 
-                     tiros += 1; NOTIFIER.add("SWISH: +1 BALA")
-                
-                luck_lvl = DATOS["mejoras"]["luck"]
-                if luck_lvl > 0 and random.random() < (luck_lvl * 0.1): 
-                     DATOS["estrellas"] += 5
-                     NOTIFIER.add("SUERTE: BONUS $")
-                
-                io_datos("save")
-                if nivel >= DATOS["record"]: DATOS["record"] = nivel+1
-                
-                if (nivel + 1) % 10 == 0:
-                    estado = "BOSS_WARN"
-                    timer_warn = 180 
-                else:
-                    AUDIO.mode = "EXPLORE"
-                    wipe.start()
-                    estado = "TRANSITION"
-            
-            elif res == "die": 
-                DATOS["total_muertes"] += 1; io_datos("save"); 
-                if CONFIG["hardcore"]:
-                    nivel = 1 
-                    DATOS["estrellas"] = max(0, DATOS["estrellas"] - 10)
-                estado = "FAIL"
-            elif res == "star": DATOS["estrellas"] += 1; io_datos("save")
-            elif res == "ammo": tiros += 1
-            elif not pelota.moving and tiros == 0: 
-                DATOS["total_muertes"] += 1; io_datos("save"); 
-                if CONFIG["hardcore"]: nivel = 1
+            siguiente = None
+            for dt, freeze_step in pasos:
+                res = juego.step(dt, freeze_step)
+                GRABADORA.resultado(res)
+                siguiente = juego.resolver(res)
+                PERFIL.vuelta("logica")
+                if siguiente: break
+            if siguiente == "BOSS_WARN":
+                estado = "BOSS_WARN"
+                timer_warn = 180 
+            elif siguiente == "TRANSITION":
+                AUDIO.mode = "EXPLORE"
+                wipe.start()
+                estado = "TRANSITION"
+            elif siguiente == "FAIL":
                 estado = "FAIL"
             
-            for g in gravs: g.draw(GAME_SURF)
-            for p in portals: p.draw(GAME_SURF)
-            for p in powers: p.draw(GAME_SURF)
-            for t in turrets: t.draw(GAME_SURF)
-            for pr in projectiles: pr.draw(GAME_SURF)
-            for o in obs: o.draw(GAME_SURF)
-            for s in stars: s.draw(GAME_SURF)
-            for d in drones: d.draw(GAME_SURF)
-            for b in bosses: b.draw(GAME_SURF)
-            for ft in float_texts[:]:
-                ft.update(); ft.draw(GAME_SURF)
-                if ft.life <= 0: float_texts.remove(ft)
-            
-            pelota.draw(GAME_SURF)
+            dibujar_partida(GAME_SURF, juego, reloj_sim.alpha, ticks, dt_anim)
             
             if drag_start:
                 # Linea eliminada a petición
-                pts = pelota.predict((drag_start[0]-mx)/5.0, (drag_start[1]-my)/5.0, obs)
-                for px, py in pts: pygame.draw.circle(GAME_SURF, (255, 255, 255), (int(px), int(py)), 2)
+                GFX.draw_dots(GAME_SURF, juego.predecir(drag_start, (mx, my)))
+                if DATOS["mejoras"]["aim"] >= AIM_ASISTENCIA:
+                    v = juego.sugerir(drag_start, (mx, my))
+                    if v: GFX.draw_glow_circle(GAME_SURF, int(drag_start[0] - v[0]*5), int(drag_start[1] - v[1]*5), int(8*FACTOR), COLORES["META"])
+            PERFIL.vuelta("d_mira")
 
             # --- UI CORREGIDA (HUD FINAL) ---
             # 1. STATS (Izquierda)
-            t = GFX.font_ui.render(f"LVL:{nivel}  BALAS:{tiros}  $: {DATOS['estrellas']}", True, COLORES["BLANCO"])
+            t = GFX.text(GFX.font_ui, f"LVL:{juego.nivel}  BALAS:{juego.tiros}  $: {DATOS['estrellas']}", True, COLORES["BLANCO"])
             GAME_SURF.blit(t, (20, 10*FACTOR))
             
             # 2. TIMER (Derecha, separado)
-            c_time = COLORES["NEON"] if level_timer > 10 else COLORES["PELIGRO"]
-            t_str = f"TIME: {int(level_timer)}"
-            t_timer = GFX.font_ui.render(t_str, True, c_time)
+            c_time = COLORES["NEON"] if juego.level_timer > 10 else COLORES["PELIGRO"]
+            t_str = f"TIME: {int(juego.level_timer)}"
+            t_timer = GFX.text(GFX.font_ui, t_str, True, c_time)
             
             # Fondo para timer
             r_timer_bg = pygame.Rect(ANCHO - 140*FACTOR, 10*FACTOR, 120*FACTOR, 35*FACTOR)
@@ -1432,7 +3163,7 @@ def main():
             GAME_SURF.blit(t_timer, (r_timer_bg.centerx - t_timer.get_width()//2, r_timer_bg.centery - t_timer.get_height()//2))
             
             if pelota.ability:
-                ab_txt = GFX.font_small.render(f"HABILIDAD: {pelota.ability}", True, COLORES["ACHIEVE"])
+                ab_txt = GFX.text(GFX.font_small, f"HABILIDAD: {pelota.ability}", True, COLORES["ACHIEVE"])
                 GAME_SURF.blit(ab_txt, (20, 40*FACTOR))
                 if pelota.ability == "TimeStop":
                     bar_w, bar_h = 200 * FACTOR, 10 * FACTOR
@@ -1442,7 +3173,7 @@ def main():
                     c_bar = COLORES["PORTAL_B"] if not freeze_time else COLORES["GOLD"]
                     pygame.draw.rect(GAME_SURF, c_bar, (bx, by, fill, bar_h))
                     if freeze_time:
-                        warn = GFX.font_ui.render("TIEMPO DETENIDO", True, COLORES["PORTAL_B"])
+                        warn = GFX.text(GFX.font_ui, "TIEMPO DETENIDO", True, COLORES["PORTAL_B"])
                         GAME_SURF.blit(warn, (cx-warn.get_width()//2, by - 30*FACTOR))
 
             # 3. BOTÓN PAUSA (Grande y con símbolo ||)
@@ -1460,131 +3191,96 @@ def main():
             pygame.draw.rect(GAME_SURF, COLORES["NEON"], (r_p.centerx + 4*FACTOR, r_p.centery - bar_h//2, bar_w, bar_h))
             
             if click and r_p.collidepoint((mx,my)): estado="PAUSA"; sound('ui')
+            PERFIL.vuelta("hud")
 
         elif estado == "PAUSA":
-            for o in obs: o.draw(GAME_SURF)
+            for o in juego.obs: o.draw(GAME_SURF)
             pelota.draw(GAME_SURF)
-            s = pygame.Surface((ANCHO, ALTO)); s.set_alpha(180); s.fill((0,0,0)); GAME_SURF.blit(s,(0,0))
-            t = GFX.font_big.render("PAUSA", True, COLORES["BLANCO"]); GAME_SURF.blit(t, (cx-t.get_width()//2, cy-80*FACTOR))
-            if click:
-                if btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, cy, 200*FACTOR, 50*FACTOR), "SEGUIR").collidepoint((mx,my)): estado="JUEGO"
-                if btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, cy+60*FACTOR, 200*FACTOR, 50*FACTOR), "MENU").collidepoint((mx,my)): estado="MENU"
-            else:
-                btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, cy, 200*FACTOR, 50*FACTOR), "SEGUIR")
-                btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, cy+60*FACTOR, 200*FACTOR, 50*FACTOR), "MENU")
+            GAME_SURF.blit(GFX.dim(180), (0,0))
+            ui["PAUSA"].draw(GAME_SURF)
+            hit = ui["PAUSA"].hit((mx,my)) if click else None
+            if hit == "SEGUIR": estado="JUEGO"
+            elif hit == "MENU": estado="MENU"
 
         elif estado == "TIENDA":
-            t = GFX.font_big.render("TIENDA", True, COLORES["META"]); GAME_SURF.blit(t, (cx-t.get_width()//2, 30*FACTOR))
-            t2 = GFX.font_ui.render(f"CREDITOS: {DATOS['estrellas']}", True, COLORES["GOLD"]); GAME_SURF.blit(t2, (cx-t2.get_width()//2, 70*FACTOR))
-            
-            start_y = 120*FACTOR
-            for i, s in enumerate(SKINS):
-                if i > 5: break
-                r = pygame.Rect(cx-180*FACTOR, start_y + i*75*FACTOR, 360*FACTOR, 65*FACTOR)
-                owned = s["id"] in DATOS["skins"]; usando = s["id"] == DATOS["skin_act"]
-                
-                pygame.draw.rect(GAME_SURF, (0,30,0), r, border_radius=5)
-                color_borde = COLORES["NEON"] if owned else COLORES["PELIGRO"]
-                if s["id"] == 99: color_borde = (255, 255, 255)
-                
-                pygame.draw.rect(GAME_SURF, color_borde, r, 2, border_radius=5)
-                GFX.draw_glow_circle(GAME_SURF, r.x+35*FACTOR, r.centery, 15*FACTOR, s["c"])
-                
-                name = s["n"]
-                if s["id"] == 99: name = "???" if not owned else "THE ONE"
-                
-                t_name = GFX.font_ui.render(name, True, COLORES["BLANCO"])
-                GAME_SURF.blit(t_name, (r.x+70*FACTOR, r.y + 10*FACTOR))
-                
-                desc = s["desc"]
-                if s["id"] == 99 and not owned: desc = "Recompensa dia 7"
-                t_desc = GFX.font_small.render(desc, True, (150,150,150))
-                GAME_SURF.blit(t_desc, (r.x+70*FACTOR, r.y + 35*FACTOR))
-                
-                status = "USANDO" if usando else ("TIENES" if owned else f"${s['p']}")
-                t_stat = GFX.font_ui.render(status, True, COLORES["GOLD"] if not owned else COLORES["META"])
-                GAME_SURF.blit(t_stat, (r.right - t_stat.get_width() - 10, r.centery - t_stat.get_height()//2))
-
-                if click and r.collidepoint((mx,my)):
-                    if owned: DATOS["skin_act"] = s["id"]; io_datos("save"); sound('ui')
-                    elif DATOS["estrellas"] >= s["p"] and s["id"] != 99:
-                        DATOS["estrellas"] -= s["p"]; DATOS["skins"].append(s["id"]); DATOS["skin_act"] = s["id"]
-                        io_datos("save"); sound('win')
-
-            if click and btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-60*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER").collidepoint((mx,my)): estado="MENU"; sound('ui')
-            else: btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-60*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER")
+            ui["TIENDA"].draw(GAME_SURF)
+            hit = ui["TIENDA"].hit((mx,my)) if click else None
+            if hit == "VOLVER": estado="MENU"; sound('ui')
+            elif hit is not None:
+                sk = next(sk for sk in SKINS if sk["id"] == hit)
+                if sk["id"] in DATOS["skins"]: DATOS["skin_act"] = sk["id"]; io_datos("save"); sound('ui')
+                elif DATOS["estrellas"] >= sk["p"] and sk["id"] != 99:
+                    DATOS["estrellas"] -= sk["p"]; DATOS["skins"].append(sk["id"]); DATOS["skin_act"] = sk["id"]
+                    io_datos("save"); sound('win')
 
         elif estado == "AJUSTES":
-            t = GFX.font_big.render("AJUSTES", True, COLORES["NEON"]); GAME_SURF.blit(t, (cx-t.get_width()//2, 30*FACTOR))
-            
-            y_mus = 120 * FACTOR
-            t_mus = GFX.font_ui.render(f"MUSICA: {CONFIG['vol_musica']}", True, COLORES["BLANCO"])
-            GAME_SURF.blit(t_mus, (cx - 150*FACTOR, y_mus))
-            if click and btn(GAME_SURF, pygame.Rect(cx + 50*FACTOR, y_mus, 40*FACTOR, 30*FACTOR), "-").collidepoint((mx,my)):
-                CONFIG["vol_musica"] = max(0, CONFIG["vol_musica"] - 1); sound('ui')
-            else: btn(GAME_SURF, pygame.Rect(cx + 50*FACTOR, y_mus, 40*FACTOR, 30*FACTOR), "-")
-            if click and btn(GAME_SURF, pygame.Rect(cx + 100*FACTOR, y_mus, 40*FACTOR, 30*FACTOR), "+").collidepoint((mx,my)):
-                CONFIG["vol_musica"] = min(10, CONFIG["vol_musica"] + 1); sound('ui')
-            else: btn(GAME_SURF, pygame.Rect(cx + 100*FACTOR, y_mus, 40*FACTOR, 30*FACTOR), "+")
-            pygame.draw.rect(GAME_SURF, (50,50,50), (cx-150*FACTOR, y_mus+35*FACTOR, 290*FACTOR, 10*FACTOR))
-            pygame.draw.rect(GAME_SURF, COLORES["PORTAL_B"], (cx-150*FACTOR, y_mus+35*FACTOR, 29*FACTOR*CONFIG["vol_musica"], 10*FACTOR))
-
-            y_sfx = 200 * FACTOR
-            t_sfx = GFX.font_ui.render(f"EFECTOS: {CONFIG['vol_sfx']}", True, COLORES["BLANCO"])
-            GAME_SURF.blit(t_sfx, (cx - 150*FACTOR, y_sfx))
-            if click and btn(GAME_SURF, pygame.Rect(cx + 50*FACTOR, y_sfx, 40*FACTOR, 30*FACTOR), "-").collidepoint((mx,my)):
-                CONFIG["vol_sfx"] = max(0, CONFIG["vol_sfx"] - 1); sound('ui')
-            else: btn(GAME_SURF, pygame.Rect(cx + 50*FACTOR, y_sfx, 40*FACTOR, 30*FACTOR), "-")
-            if click and btn(GAME_SURF, pygame.Rect(cx + 100*FACTOR, y_sfx, 40*FACTOR, 30*FACTOR), "+").collidepoint((mx,my)):
-                CONFIG["vol_sfx"] = min(10, CONFIG["vol_sfx"] + 1); sound('ui')
-            else: btn(GAME_SURF, pygame.Rect(cx + 100*FACTOR, y_sfx, 40*FACTOR, 30*FACTOR), "+")
-            pygame.draw.rect(GAME_SURF, (50,50,50), (cx-150*FACTOR, y_sfx+35*FACTOR, 290*FACTOR, 10*FACTOR))
-            pygame.draw.rect(GAME_SURF, COLORES["PORTAL_A"], (cx-150*FACTOR, y_sfx+35*FACTOR, 29*FACTOR*CONFIG["vol_sfx"], 10*FACTOR))
-
-            if click and btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-80*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER").collidepoint((mx,my)): estado="MENU"; sound('ui')
-            else: btn(GAME_SURF, pygame.Rect(cx-60*FACTOR, ALTO-80*FACTOR, 120*FACTOR, 50*FACTOR), "VOLVER")
+            ui["AJUSTES"].draw(GAME_SURF)
+            hit = ui["AJUSTES"].hit((mx,my)) if click else None
+            if hit == "VOLVER": estado="MENU"; sound('ui')
+            elif hit == "glifos": CONFIG["rain_glyphs"] = not CONFIG["rain_glyphs"]; sound('ui')
+            elif hit is not None and hit.startswith("rain"):
+                CONFIG["rain_density"] = min(4, CONFIG["rain_density"] + 1) if hit.endswith("+") else max(1, CONFIG["rain_density"] - 1)
+                sound('ui')
+            elif hit is not None:
+                key = "vol_musica" if hit.startswith("mus") else "vol_sfx"
+                CONFIG[key] = min(10, CONFIG[key] + 1) if hit.endswith("+") else max(0, CONFIG[key] - 1)
+                sound('ui')
 
         elif estado in ["WIN", "FAIL"]:
-            s = pygame.Surface((ANCHO,ALTO)); s.set_alpha(200); s.fill((0,0,0)); GAME_SURF.blit(s,(0,0))
-            msg = "HACKEO COMPLETADO" if estado == "WIN" else "ERROR SISTEMA"
-            c = COLORES["NEON"] if estado == "WIN" else COLORES["PELIGRO"]
-            GFX.draw_neon_rect(GAME_SURF, pygame.Rect(cx-150*FACTOR, cy-100*FACTOR, 300*FACTOR, 250*FACTOR), c, True)
-            t = GFX.font_big.render(msg, True, COLORES["BLANCO"]); GAME_SURF.blit(t, (cx-t.get_width()//2, cy-80*FACTOR))
-            b_txt = "SIGUIENTE" if estado == "WIN" else "REINTENTAR"
-            if click:
-                if btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, cy, 200*FACTOR, 50*FACTOR), b_txt).collidepoint((mx,my)):
-                    if estado == "WIN": nivel+=1; pelota.start = start_coord
-                    else: nivel=1; pelota.start = start_coord
-                    tiros=3 + DATOS["mejoras"]["ammo"]; pelota.reset(); 
-                    obs, stars, portals, gravs, powers, drones, bosses, turrets = make_level(nivel); 
-                    projectiles = []
-                    if nivel % 10 == 0: level_timer = 90.0 
-                    else: level_timer = 30.0
-                    estado="JUEGO"
-                if btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, cy+60*FACTOR, 200*FACTOR, 50*FACTOR), "MENU").collidepoint((mx,my)): estado="MENU"
-            else:
-                btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, cy, 200*FACTOR, 50*FACTOR), b_txt)
-                btn(GAME_SURF, pygame.Rect(cx-100*FACTOR, cy+60*FACTOR, 200*FACTOR, 50*FACTOR), "MENU")
-
-        NOTIFIER.update_draw(GAME_SURF)
-        for p in parts[:]:
-            p.update(); p.draw(GAME_SURF)
-            if p.life <= 0: parts.remove(p)
+            GAME_SURF.blit(GFX.dim(200), (0,0))
+            ui[estado].draw(GAME_SURF)
+            hit = ui[estado].hit((mx,my)) if click else None
+            if hit in ("SIGUIENTE", "REINTENTAR"):
+                if estado == "WIN": juego.cargar_nivel(juego.nivel + 1); GRABADORA.anotar("N", juego.nivel)
+                else: juego.nueva_partida(); GRABADORA.partida(juego)
+                estado="JUEGO"
+            elif hit == "MENU": estado="MENU"
+
+        PERFIL.vuelta("ui")
+        NOTIFIER.update_draw(GAME_SURF, dt_anim)
+        PERFIL.vuelta("notifier")
+        for _ in range(ticks): juego.parts.update()
+        juego.parts.draw(GAME_SURF)
+        PERFIL.vuelta("particulas")
+        if CONFIG["debug"]: draw_debug(GAME_SURF)
+        if PERFIL.activo: PERFIL.draw(GAME_SURF)
+        PERFIL.vuelta("overlay")
             
         render_x, render_y = 0, 0
-        if SHAKE_AMPLITUDE > 0:
+        temblor = SHAKE_AMPLITUDE > 0
+        if temblor:
             render_x = random.randint(-SHAKE_AMPLITUDE, SHAKE_AMPLITUDE)
             render_y = random.randint(-SHAKE_AMPLITUDE, SHAKE_AMPLITUDE)
             SHAKE_AMPLITUDE -= 1
         
-        PANTALLA.fill((0,0,0))
-        PANTALLA.blit(GAME_SURF, (render_x, render_y))
-
-        pygame.display.flip()
+        GRABADORA.estado(estado)
+        PRESENTER.present(GAME_SURF, PANTALLA, (render_x, render_y), estado, click or temblor)
+        PERFIL.vuelta("presentar")
+        GFX.end_frame()
         RELOJ.tick(FPS)
+        GOBERNADOR.registrar(RELOJ.get_rawtime())
 
+    if PERFIL.activo and PERFIL.n: PERFIL.dump_csv(ruta_perfil())
+    if GRABADORA.activa: GRABADORA.guardar(ruta_grabacion())
+    GUARDADO.close()
+    AUDIO.close()
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
-    main()
+    if HEADLESS:
+        # python main.py --headless [--frames N] [--level L] [--seed S] [--bot SEMILLA]
+        # python main.py --headless --replay partida.mdr   (grabada con --grabar o MATRIX_GRABAR=1)
+        # python main.py --headless --analizar N [--level L] [--seed S]   (N niveles desde L, abanico de tiros en lote)
+        args = sys.argv[1:]
+        if "--replay" in args:
+            print(json.dumps(run_replay(args[args.index("--replay") + 1])))
+            sys.exit(0)
+        opt = lambda name, default: int(args[args.index(name) + 1]) if name in args else default
+        if "--analizar" in args:
+            print(json.dumps(analizar_niveles(opt("--level", 1), opt("--analizar", 1), opt("--seed", 0))))
+            sys.exit(0)
+        policy = bot_aleatorio(opt("--bot", 0)) if "--bot" in args else None
+        print(json.dumps(run_headless(opt("--frames", 3600), opt("--level", 1), policy, opt("--seed", 0))))
+    else:
+        main()
@@ -0,0 +1,47 @@
+# python -m pytest tests
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("MATRIX_HEADLESS", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main
+
+
+def correr(g, coste, frames):
+    # coste[nivel] = ms de trabajo por frame en ese nivel; devuelve el nivel de cada frame
+    niveles = []
+    for _ in range(frames):
+        niveles.append(g.nivel)
+        g.registrar(coste[g.nivel])
+    return niveles
+
+
+def test_nivel_sobre_presupuesto_queda_bajado(monkeypatch):
+    # ALTA se pasa siempre (20 ms > 16.7) y MEDIA va holgada: no debe oscilar entre las dos
+    monkeypatch.setitem(main.CONFIG, "calidad_auto", True)
+    g = main.Gobernador(fps=60, ventana=60)
+    niveles = correr(g, [20.0, 6.0, 4.0, 3.0], 3600)
+    assert niveles[60:60 + 4 * 60] == [1] * (4 * 60)  # la primera bajada no se deshace antes de 4 ventanas
+    en_alta = sum(1 for n in niveles[60:] if n == 0)
+    assert en_alta / len(niveles[60:]) < 0.1
+    assert g.stats["subidas"] <= 5
+
+
+def test_bajar_nunca_se_bloquea_tras_subir(monkeypatch):
+    monkeypatch.setitem(main.CONFIG, "calidad_auto", True)
+    g = main.Gobernador(fps=60, ventana=60)
+    correr(g, [20.0, 6.0, 4.0, 3.0], 60 + 4 * 60)  # baja y, tras 4 ventanas limpias, vuelve a subir
+    assert g.nivel == 0
+    niveles = correr(g, [20.0, 6.0, 4.0, 3.0], 61)
+    assert niveles[-1] == 1  # una sola ventana sobre presupuesto basta para bajar otra vez
+
+
+def test_todo_sobre_presupuesto_llega_a_minima(monkeypatch):
+    monkeypatch.setitem(main.CONFIG, "calidad_auto", True)
+    g = main.Gobernador(fps=60, ventana=60)
+    niveles = correr(g, [30.0] * 4, 1200)
+    assert niveles[-1] == len(main.NIVELES_CALIDAD) - 1
+    assert g.stats["subidas"] == 0
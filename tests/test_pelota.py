@@ -0,0 +1,25 @@
+# python -m pytest tests
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("MATRIX_HEADLESS", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pygame
+import main
+
+
+def test_draw_timestop_con_estela_interpola(monkeypatch):
+    # La estela de PLASMA no debe pisar el factor de interpolación de la posición
+    monkeypatch.setitem(main.DATOS, "skin_act", 3)
+    p = main.Pelota(200, 400)
+    assert p.ability == "TimeStop"
+    for i in range(10): p.trail.append((200 + i, 400 - i * 5))
+    p.prev_x, p.prev_y = 200, 400
+    p.x, p.y = 210, 380
+    dibujado = []
+    monkeypatch.setattr(main.GFX, "draw_glow_circle", lambda s, x, y, r, c: dibujado.append((x, y)))
+    p.draw(pygame.Surface((main.ANCHO, main.ALTO)), 0.5)
+    assert dibujado == [(205, 390)]
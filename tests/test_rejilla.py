@@ -0,0 +1,36 @@
+# python -m pytest tests
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("MATRIX_HEADLESS", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pygame
+import main
+
+
+class Caja:
+    def __init__(self, x, y): self.rect = pygame.Rect(x, y, 20, 20)
+
+
+def test_refresh_solo_recoloca_los_moviles(monkeypatch):
+    grid = main.SpatialHash(100)
+    fijos = [Caja(i * 30, 500) for i in range(200)]
+    for c in fijos: grid.add("obs", c)
+    movil = Caja(0, 0); grid.add("obs", movil, moving=True)
+    bala = Caja(50, 50)
+    assert len(grid.moviles) == 1
+    movidos = []
+    mover = grid.move
+    monkeypatch.setattr(grid, "move", lambda obj: (movidos.append(obj), mover(obj)))
+    movil.rect.topleft = (350, 250)
+    grid.refresh(proj=[bala])
+    assert movidos == [movil]
+    assert grid.query("obs", pygame.Rect(340, 240, 40, 40)) == [movil]
+    assert grid.query("obs", pygame.Rect(0, 0, 30, 30)) == []
+    assert grid.query("proj", bala.rect) == [bala]
+    grid.refresh(proj=[])
+    assert grid.query("proj", bala.rect) == [] and len(grid.moviles) == 1
+    assert len(grid.entries) == len(fijos) + 1